@@ -19,6 +19,7 @@ class LogManager:
         if self.globalLogLevel not in self.logLevels:
             print(f"Error: Invalid global log level '{globalLogLevel}'.  Defaulting to 'disabled'.")
             self.globalLogLevel = "disabled"
+        self.captured = None  # list of (level, message) while capturing, None otherwise
 
     def log(self, message_log_level, message):
         """
@@ -33,5 +34,38 @@ class LogManager:
             print(f"Error: Invalid message log level '{message_log_level}'.  Message not logged.")
             return  # Important: Exit if the level is invalid
 
+        if self.captured is not None:
+            self.captured.append((message_log_level, message))
+            return
+
         if self.logLevels.get(message_log_level, 0) >= self.logLevels.get(self.globalLogLevel, 0):
-            print(message)
\ No newline at end of file
+            print(message)
+
+    def start_capture(self):
+        """
+        Starts buffering messages instead of printing them. Every message is
+        kept together with its level so it can be replayed later with
+        replay(), e.g. by another process with its own global log level.
+        """
+        self.captured = []
+
+    def stop_capture(self):
+        """
+        Stops buffering and returns the captured messages.
+
+        Returns:
+            list[tuple[str, str]]: The captured (level, message) pairs.
+        """
+        captured = self.captured or []
+        self.captured = None
+        return captured
+
+    def replay(self, captured):
+        """
+        Logs previously captured (level, message) pairs in their original order.
+
+        Args:
+            captured (list[tuple[str, str]]): Messages returned by stop_capture().
+        """
+        for message_log_level, message in captured:
+            self.log(message_log_level, message)
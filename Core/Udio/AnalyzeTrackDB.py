@@ -2,49 +2,111 @@ import os
 import sys
 import io
 import json
-import hashlib
 import time
-from mutagen.mp3 import MP3
+from concurrent.futures import ThreadPoolExecutor
+
+# Add Core to path so we can import ConfigManager and the track catalog
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from Core.ConfigManager import ConfigManager
+from Core.Udio.TrackCatalog import TrackCatalog, TrackRecord
+from Core.Udio.DuplicateFinder import DuplicateFinder
+try:
+    from Core.Udio.NearDuplicateFinder import NearDuplicateFinder, DecoderUnavailableError
+    from Core.Udio.TrackTable import TrackTable, table_path
+except ImportError:  # NumPy is optional, only needed by the near-duplicate check and the track table
+    NearDuplicateFinder = None
+    TrackTable = None
+from Core.Udio.Mp3Duration import mp3_duration
+
+UNKNOWN_DURATION = -1.0  # cached duration of an unreadable MP3
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+
+def read_mp3_length(path):
+    """Returns the length of an MP3 in seconds (from its frame headers, see Mp3Duration), UNKNOWN_DURATION if it can't be read."""
+    try:
+        length = mp3_duration(path)
+    except Exception:
+        length = None
+    return length if length is not None else UNKNOWN_DURATION  # cached too, an unreadable file isn't parsed again until it changes
+
+
 class AnalyzeTrackDB:
     def __init__(self, look_folders, estimate_bitrates):
         self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))  # project root
         self.look_folders = [os.path.join(self.project_root, folder) for folder in look_folders]
         self.estimate_bitrates = estimate_bitrates
         self.track_data = []
+        # Catalog of the track folders shared with MixTracks and ExportTracks; it caches the parsed JSONs,
+        # MD5s and durations per file state (size, mtime, inode), so unchanged tracks are only stat'ed
+        config = ConfigManager().load_config()
+        self.catalog = TrackCatalog.from_config(self.project_root, config)
+        self.table_path = table_path(self.project_root, config) if TrackTable is not None else None
+        # The near-duplicate check decodes every new MP3 with ffmpeg, so it is opt-in
+        self.near_duplicate_check = config.get("near_duplicate_check", False)
+        self.near_duplicate_similarity = config.get("near_duplicate_similarity")
+        self.new_durations = []  # (CatalogFile, seconds) read from the MP3s this run, stored in the catalog
 
     def log(self, message):
         print(message)  # Output directly to console
 
-    def get_mp3_duration(self, file_path):
-        try:
-            audio = MP3(file_path)
-            duration = int(audio.info.length)
-            minutes = duration // 60
-            seconds = duration % 60
-            return duration, f"{minutes}:{seconds:02d}"
-        except Exception:
+    def read_mp3_durations(self, mp3s):
+        """
+        Reads the durations the catalog doesn't have yet, in a thread pool (as many threads as the
+        catalog scan), so the header reads overlap on network shares. The MP3s keep their order.
+        """
+        missing = [mp3 for mp3 in mp3s if mp3.duration is None]
+        if not missing:
+            return
+        with ThreadPoolExecutor(max_workers=self.catalog.workers, thread_name_prefix="AnalyzeTrackDB") as executor:
+            for mp3, length in zip(missing, executor.map(read_mp3_length, [mp3.path for mp3 in missing])):
+                mp3.duration = length
+                self.new_durations.append((mp3, length))
+
+    @staticmethod
+    def format_duration(length):
+        """Returns (whole seconds, "m:ss") of a length in seconds, (0, "Unknown") for UNKNOWN_DURATION."""
+        if length == UNKNOWN_DURATION:
             return 0, "Unknown"
+        duration = int(length)
+        minutes = duration // 60
+        seconds = duration % 60
+        return duration, f"{minutes}:{seconds:02d}"
+
+    def get_file_duration(self, mp3):
+        """Returns (seconds, "m:ss") of a CatalogFile, reading its duration only if the catalog has none."""
+        if mp3.duration is None:
+            self.read_mp3_durations([mp3])
+        return self.format_duration(mp3.duration)
+
+    def get_mp3_duration(self, file_path):
+        """Returns (seconds, "m:ss") of an MP3 by path, from the catalog if the file is unchanged since its last refresh."""
+        mp3 = self.catalog.current_file(file_path)
+        if mp3 is None or mp3.duration is None:
+            return self.format_duration(read_mp3_length(file_path))
+        return self.format_duration(mp3.duration)
 
     def read_track_metadata_from_json(self, json_file):
+        """Returns the metadata of a track JSON by path, from the catalog if the JSON is unchanged since its last refresh."""
+        if not os.path.exists(json_file):
+            return self.read_track_metadata(TrackRecord(json_file, {}, None))
+        return self.read_track_metadata(self.catalog.read_track(json_file))
+
+    def read_track_metadata(self, track):
         metadata = {"energy": None, "mood": None, "pop": None, "stars": None, "export": False}
-        if os.path.exists(json_file):
-            try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if "tags" in data:
-                        metadata.update({
-                            "energy": data["tags"].get("energy"),
-                            "mood": data["tags"].get("mood"),
-                            "pop": data["tags"].get("pop"),
-                            "stars": data["tags"].get("stars")
-                        })
-                    if "export_parameters" in data:
-                        metadata["export"] = data["export_parameters"].get("export", False)
-            except Exception as e:
-                self.log(f"⚠️ Error reading {json_file}: {e}")
+        if track.error is not None:
+            self.log(f"⚠️ Error reading {track.json_path}: {track.error}")
+            return metadata
+        if track.tags is not None:
+            metadata.update({
+                "energy": track.tags.get("energy"),
+                "mood": track.tags.get("mood"),
+                "pop": track.tags.get("pop"),
+                "stars": track.tags.get("stars")
+            })
+        if track.export_parameters is not None:
+            metadata["export"] = track.export_parameters.get("export", False)
         return metadata
 
     def estimate_size(self, total_duration):
@@ -55,74 +117,129 @@ class AnalyzeTrackDB:
             sizes[bitrate] = mb
         return sizes
 
+    def report_near_duplicates(self, mp3s):
+        """
+        Logs the tracks that sound the same although their files differ (re-encodes, re-mixes,
+        cut copies), found by NearDuplicateFinder from acoustic fingerprints cached in the catalog.
+        Only runs if near_duplicate_check is set in the config.
+        """
+        if not self.near_duplicate_check:
+            self.log("\n🎧 Near-duplicate check skipped: set near_duplicate_check to enable it")
+            return
+        if NearDuplicateFinder is None:
+            self.log("\n🎧 Near-duplicate check skipped: NumPy is not installed")
+            return
+        finder = NearDuplicateFinder(self.catalog, min_similarity=self.near_duplicate_similarity)
+        try:
+            clusters = finder.find(mp3s)
+        except DecoderUnavailableError as e:
+            self.log(f"\n🎧 Near-duplicate check failed: {e}")
+            return
+        for file_path, error in finder.errors:
+            self.log(f"⚠️ Could not decode {file_path} for the near-duplicate check: {error}")
+        stats = finder.stats
+        self.log(f"\n🎧 Near-duplicate check: {stats['fingerprinted']} fingerprinted ({stats['reused']} cached), "
+                 f"{stats['candidates']} of {stats['all_pairs']} pairs compared, {stats['matches']} matched")
+        if clusters:
+            self.log("\n🎶 **Near-Duplicate Tracks Found:**")
+            for count, cluster in enumerate(clusters, 1):
+                self.log(f"{count}. " + ", ".join(f"\"{path}\"" for path in cluster["files"]))
+                for first, second, similarity, offset in cluster["pairs"]:
+                    self.log(f"   ~ \"{os.path.basename(first)}\" and \"{os.path.basename(second)}\": "
+                             f"similarity {similarity:.2f}, offset {offset:+.1f} s")
+
+    def save_track_table(self):
+        """Saves track_data as the columnar TrackTable the TrackTable CLI queries without scanning the library."""
+        if TrackTable is None:
+            self.log("\n🗃️ Track table skipped: NumPy is not installed")
+            return
+        folders = [os.path.relpath(folder, self.project_root) for folder in self.look_folders]
+        try:
+            TrackTable.from_records(self.track_data, folders).save(self.table_path)
+        except OSError as e:
+            self.log(f"⚠️ Could not save the track table {self.table_path}: {e}")
+            return
+        self.log(f"\n🗃️ Track table: {len(self.track_data)} tracks saved to {self.table_path}")
+
     def run(self):
         start_time = time.time()
 
         total_size = 0
         total_duration = 0
         mp3_count = 0
-        md5_hashes = {}
+        analyzed_mp3s = []
         name_duplicates = {}
 
         self.log("🔍 Searching for MP3 files with corresponding JSON metadata...\n")
 
+        self.new_durations = []
+        self.track_data = []
+        self.catalog.refresh(self.look_folders)
         for folder in self.look_folders:
             if not os.path.isdir(folder):
                 self.log(f"⚠️ Folder not found: {folder}")
                 continue
 
             self.log(f"📂 Searching in: {folder}")
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    if not file.lower().endswith(".mp3"):
-                        continue
-
-                    file_path = os.path.join(root, file)
-                    json_file = os.path.splitext(file_path)[0] + ".json"
-                    file_name = os.path.splitext(file)[0]
-                    has_json = os.path.exists(json_file)
-                    json_emoji = " 📄" if has_json else " 📄❌"
-
-                    if not has_json:
-                        self.log(f"⚠️ Warning: JSON metadata not found for {file}")
-                        continue
-
-                    metadata = self.read_track_metadata_from_json(json_file)
-                    energy = metadata["energy"]
-                    mood = metadata["mood"]
-                    pop = metadata["pop"]
-                    stars = metadata["stars"]
-                    export = metadata["export"]
-
-                    duration_seconds, duration_str = self.get_mp3_duration(file_path)
-
-                    md5 = hashlib.md5(open(file_path, 'rb').read()).hexdigest()
-                    md5_hashes.setdefault(md5, []).append(file_path)
-                    name_duplicates.setdefault(file, []).append(file_path)
-
-                    # Format and log metadata
-                    line = f"+ {file} [{duration_str}]{json_emoji}" if export else f"- {file} [{duration_str}]{json_emoji}"
-                    if energy is not None: line += f" 🔥{energy:.1f}"
-                    if mood is not None:    line += f" 😊{mood:.1f}"
-                    if pop is not None:     line += f" 🎵{pop:.1f}"
-                    if stars is not None:   line += f" ✨{int(stars)}"
-
-                    self.log(line)
-
-                    self.track_data.append({
-                        "name": file_name,
-                        "stars": int(stars) if stars is not None else None,
-                        "mood": mood,
-                        "energy": energy,
-                        "pop": pop,
-                    })
-
-                    total_size += os.path.getsize(file_path)
-                    total_duration += duration_seconds
-                    mp3_count += 1
+            tracks = {track.json_path: track for track in self.catalog.tracks([folder])}
+            mp3s = self.catalog.files([folder], ".mp3")
+            self.read_mp3_durations([mp3 for mp3 in mp3s if os.path.splitext(mp3.path)[0] + ".json" in tracks])
+            for mp3 in mp3s:
+                file_path = mp3.path
+                file = os.path.basename(file_path)
+                json_file = os.path.splitext(file_path)[0] + ".json"
+                file_name = os.path.splitext(file)[0]
+                track = tracks.get(json_file)
+                has_json = track is not None
+                json_emoji = " 📄" if has_json else " 📄❌"
+
+                if not has_json:
+                    self.log(f"⚠️ Warning: JSON metadata not found for {file}")
+                    continue
+
+                metadata = self.read_track_metadata(track)
+                energy = metadata["energy"]
+                mood = metadata["mood"]
+                pop = metadata["pop"]
+                stars = metadata["stars"]
+                export = metadata["export"]
+
+                duration_seconds, duration_str = self.get_file_duration(mp3)
+
+                analyzed_mp3s.append(mp3)
+                name_duplicates.setdefault(file, []).append(file_path)
+
+                # Format and log metadata
+                line = f"+ {file} [{duration_str}]{json_emoji}" if export else f"- {file} [{duration_str}]{json_emoji}"
+                if energy is not None: line += f" 🔥{energy:.1f}"
+                if mood is not None:    line += f" 😊{mood:.1f}"
+                if pop is not None:     line += f" 🎵{pop:.1f}"
+                if stars is not None:   line += f" ✨{int(stars)}"
+
+                self.log(line)
+
+                self.track_data.append({
+                    "name": file_name,
+                    "stars": int(stars) if stars is not None else None,
+                    "mood": mood,
+                    "energy": energy,
+                    "pop": pop,
+                    "export": bool(export),
+                    "duration": mp3.duration if mp3.duration != UNKNOWN_DURATION else None,
+                    "size": mp3.size,
+                    "path": file_path,
+                })
+
+                total_size += mp3.size
+                total_duration += duration_seconds
+                mp3_count += 1
+
+        if self.new_durations:
+            self.catalog.store_durations(self.new_durations)
 
         self.log("\n=== Summary ===")
         self.log(f"🎼 Total MP3 files analyzed (with JSON metadata): {mp3_count}")
+        self.log(f"🗄️ Durations read from MP3s: {len(self.new_durations)} (the others were cached)")
         self.log(f"💾 Total Space Occupied: {total_size / (1024 * 1024):.2f} MB")
         self.log(f"⏱️ Total Duration: {total_duration // 3600:02d}:{(total_duration % 3600) // 60:02d}:{total_duration % 60:02d}")
 
@@ -130,7 +247,15 @@ class AnalyzeTrackDB:
         for bitrate, size in self.estimate_size(total_duration).items():
             self.log(f"📡 {bitrate}: {size:.2f} MB")
 
-        md5_duplicates = [v for v in md5_hashes.values() if len(v) > 1]
+        # Only files sharing their size, then their head/tail sample, are hashed completely
+        duplicate_finder = DuplicateFinder(self.catalog)
+        md5_duplicates = duplicate_finder.find(analyzed_mp3s)
+        for file_path, error in duplicate_finder.errors:
+            self.log(f"⚠️ Could not read {file_path} for the duplicate check: {error}")
+        stats = duplicate_finder.stats
+        self.log(f"\n🔎 Duplicate check: {stats['same_size']} of {stats['files']} files share a size, "
+                 f"{stats['sampled']} sampled, {stats['hashed']} hashed in full ({stats['reused']} cached), "
+                 f"{stats['bytes_read'] / (1024 * 1024):.2f} MB read")
         name_duplicates_filtered = [v for v in name_duplicates.values() if len(v) > 1]
 
         if md5_duplicates or name_duplicates_filtered:
@@ -145,6 +270,9 @@ class AnalyzeTrackDB:
                     self.log(f"{count}. \"{group[i]}\" and \"{group[i+1]}\" (Same Name)")
                     count += 1
 
+        self.report_near_duplicates(analyzed_mp3s)
+        self.save_track_table()
+
         elapsed = time.time() - start_time
         self.log(f"\n🕒 Execution Time: {int(elapsed // 3600):02d}:{int((elapsed % 3600) // 60):02d}:{int(elapsed % 60):02d}")
         self.log("\n✅ Finished analyzing files.")
@@ -0,0 +1,78 @@
+class EffectContext:
+    """
+    What a buffer effect knows about the samples it gets: the sample rate, the length of
+    the whole audio it is applied to (after the previous effects) and where the buffer
+    starts in it. Streamable effects are called once per block with the same `state`
+    dict, so they can carry filter tails or other state from one block to the next.
+    """
+    def __init__(self, frame_rate, frame_count, first_frame=0, state=None):
+        """
+        Args:
+            frame_rate (int): Sample rate of the audio.
+            frame_count (int): Frames of the whole audio the effect is applied to.
+            first_frame (int): Position of the buffer's first frame in that audio.
+            state (dict, optional): Per-stem state shared by all blocks of a streamable effect.
+        """
+        self.frame_rate = frame_rate
+        self.frame_count = frame_count
+        self.first_frame = first_frame
+        self.state = state if state is not None else {}
+
+    def __len__(self):
+        """Length of the whole audio in milliseconds, rounded like len(AudioSegment)."""
+        return round(1000 * self.frame_count / self.frame_rate)
+
+    def ms_to_frame(self, ms):
+        """Returns the frame of the whole audio at `ms`, like AudioSegment slicing does."""
+        return int(ms * self.frame_rate / 1000.0)
+
+
+class BufferEffect:
+    """
+    Second-generation effect: works on a float32 NumPy buffer of shape (frames, channels)
+    in the range [-1.0, 1.0) instead of an AudioSegment. The function is called as
+    function(samples, context, **params) with an EffectContext.
+
+    The declarations tell the mixer how cheaply the effect can run:
+    - in_place: the function modifies `samples` and returns None (or `samples`), so no
+      new buffer is allocated. Otherwise it returns a new array.
+    - streamable: the effect can run block by block (it keeps the frame count and only
+      needs `context` to know where a block is). It is then applied to each chunk while
+      the stems are mixed, and works in streaming mode. Otherwise it needs the whole
+      signal at once and may change its length.
+    """
+    def __init__(self, function, in_place=False, streamable=False):
+        """
+        Args:
+            function (callable): function(samples, context, **params) -> np.ndarray | None.
+            in_place (bool): See class docstring.
+            streamable (bool): See class docstring.
+        """
+        self.function = function
+        self.in_place = in_place
+        self.streamable = streamable
+
+    def process(self, samples, context, params):
+        """
+        Runs the effect on a buffer and returns the resulting buffer.
+
+        Raises:
+            ValueError: If the effect returned nothing without being in-place, or a
+                        streamable effect changed the frame count or channel count.
+        """
+        result = self.function(samples, context, **params)
+        if result is None:
+            if not self.in_place:
+                raise ValueError(f"{self.function.__name__} returned no samples and is not declared in_place")
+            return samples
+        if self.streamable and result.shape != samples.shape:
+            raise ValueError(f"streamable effect {self.function.__name__} changed the block shape "
+                             f"from {samples.shape} to {result.shape}")
+        return result
+
+    def apply_segment(self, audio, **params):
+        """AudioSegment form of the effect, for mix paths that work on AudioSegments (e.g. the pydub engine)."""
+        from Core.Udio.MixEngine import segment_to_array, array_to_segment
+
+        samples = self.process(segment_to_array(audio), EffectContext(audio.frame_rate, int(audio.frame_count())), params)
+        return array_to_segment(samples.astype("float32", copy=False), audio.frame_rate, audio.sample_width)
@@ -0,0 +1,146 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from Core.Udio.TrackCatalog import HASH_CHUNK_SIZE
+
+SAMPLE_SIZE = 64 * 1024  # bytes hashed at the head and at the tail of a file in the sample stage
+DEFAULT_HASH_WORKERS = 8  # hashing is I/O bound and hashlib releases the GIL, so threads overlap well
+
+
+def sample_digest(path, size):
+    """
+    Returns (digest, (size, mtime_ns, inode)) of the first and last SAMPLE_SIZE bytes of a file
+    (of all of it if it is smaller than two samples), see full_md5().
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if size <= 2 * SAMPLE_SIZE:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(SAMPLE_SIZE))
+            f.seek(size - SAMPLE_SIZE)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest(), (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def full_md5(path):
+    """
+    Returns (MD5 hex digest, (size, mtime_ns, inode)) of a file, hashed in chunks. The file state
+    is read from the open file, so the caller can tell whether the file changed since it was catalogued.
+    """
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest(), (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class DuplicateFinder:
+    """
+    Finds files with identical content in stages, so only files that can still have a
+    duplicate are read, and only as far as needed:
+    1. Files are grouped by size (no I/O, the sizes come from the catalog). A file with a
+       unique size has no duplicate.
+    2. In each size group, the head and tail of every file are hashed. Files no larger than
+       the two samples skip this stage, they are hashed completely right away.
+    3. Files whose samples still match are hashed completely (MD5, in chunks, in a thread
+       pool).
+    Samples and MD5s stored in the track catalog are reused and new ones are stored, so
+    files that didn't change since the last run are compared without reading anything.
+
+    After a run, `stats` holds the number of files each stage looked at and the bytes read.
+    """
+    def __init__(self, catalog=None, workers=None):
+        """
+        Args:
+            catalog (TrackCatalog, optional): Catalog the files come from, used to reuse and store digests.
+            workers (int, optional): Threads hashing in parallel. Defaults to DEFAULT_HASH_WORKERS.
+        """
+        self.catalog = catalog
+        self.workers = workers or DEFAULT_HASH_WORKERS
+        self.stats = {}
+        self.errors = []  # (path, error) of files that couldn't be read; they are left out of the groups
+
+    def _digests(self, executor, function, files):
+        """Runs function(file) for every file in the thread pool. Returns {path: result} of the files it succeeded for."""
+        results = {}
+        futures = {executor.submit(function, file): file for file in files}
+        for future, file in futures.items():
+            try:
+                results[file.path] = future.result()
+            except OSError as e:
+                self.errors.append((file.path, e))
+        return results
+
+    def _store(self, files, digests, store):
+        """Stores the digests of files that didn't change since they were catalogued. Returns {path: digest}."""
+        entries = [(file, digests[file.path][0]) for file in files
+                   if file.path in digests and digests[file.path][1] == (file.size, file.mtime_ns, file.inode)]
+        if self.catalog is not None and entries:
+            store(entries)
+        return {path: digest for path, (digest, _) in digests.items()}
+
+    def find(self, files):
+        """
+        Returns the groups of files with identical content.
+
+        Args:
+            files (list[CatalogFile]): Files to compare (path, size, mtime_ns, inode and, if known,
+                                       md5 and sample).
+
+        Returns:
+            list[list[str]]: Paths of each group of duplicates, in the order of `files`; the
+                             groups are ordered by their first file.
+        """
+        self.errors = []
+        order = {file.path: index for index, file in enumerate(files)}
+        by_size = {}
+        for file in files:
+            by_size.setdefault(file.size, []).append(file)
+        candidates = [file for group in by_size.values() if len(group) > 1 for file in group]
+        md5s = {file.path: file.md5 for file in candidates if file.md5}
+
+        to_sample, to_hash = [], []
+        for size, group in by_size.items():
+            if len(group) < 2 or all(file.md5 for file in group):
+                continue
+            if size <= 2 * SAMPLE_SIZE:
+                to_hash.extend(file for file in group if not file.md5)  # a sample would read the whole file anyway
+            else:
+                to_sample.extend(group)
+        samples = {file.path: file.sample for file in to_sample if file.sample}
+        missing_samples = [file for file in to_sample if not file.sample]
+        self.stats = {"files": len(files), "same_size": len(candidates), "sampled": len(missing_samples),
+                      "hashed": 0, "reused": len(md5s) + len(samples), "bytes_read": 0}
+
+        store_samples = self.catalog.store_samples if self.catalog is not None else None
+        store_md5s = self.catalog.store_md5s if self.catalog is not None else None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="DuplicateFinder") as executor:
+            # --- Stage 2: head and tail samples ---
+            sampled = self._digests(executor, lambda file: sample_digest(file.path, file.size), missing_samples)
+            self.stats["bytes_read"] += 2 * SAMPLE_SIZE * len(sampled)
+            samples.update(self._store(missing_samples, sampled, store_samples))
+            by_sample = {}
+            for file in to_sample:
+                if file.path in samples:
+                    by_sample.setdefault((file.size, samples[file.path]), []).append(file)
+            for group in by_sample.values():
+                if len(group) > 1:
+                    to_hash.extend(file for file in group if not file.md5)
+
+            # --- Stage 3: full MD5 of the remaining candidates ---
+            hashed = self._digests(executor, lambda file: full_md5(file.path), to_hash)
+            self.stats["hashed"] = len(hashed)
+            self.stats["bytes_read"] += sum(state[0] for _, state in hashed.values())
+
+        md5s.update(self._store(to_hash, hashed, store_md5s))
+
+        # Files ruled out by their sample have no MD5 (or a unique one), so they end up alone
+        groups = {}
+        for file in candidates:
+            if file.path in md5s:
+                groups.setdefault(md5s[file.path], []).append(file.path)
+        duplicates = [sorted(group, key=order.get) for group in groups.values() if len(group) > 1]
+        return sorted(duplicates, key=lambda group: order[group[0]])
@@ -0,0 +1,236 @@
+import time
+import numpy as np
+from Core.Udio.BufferEffect import EffectContext
+
+def db_to_gain(db):
+    """Converts a gain in dB to a linear amplitude factor."""
+    return 10 ** (db / 20.0)
+
+
+class GainRamp:
+    """
+    A linear gain change over a range of source frames. With step boundaries the gain
+    changes once per 1 ms step instead of once per frame, which is how pydub renders
+    fades longer than 100 ms.
+    """
+    def __init__(self, start_frame, end_frame, from_gain, to_gain, step_boundaries=None):
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.from_gain = from_gain
+        self.to_gain = to_gain
+        self.step_boundaries = step_boundaries  # absolute first frame of every 1 ms step, or None
+
+    def apply(self, envelope, first_frame):
+        """Multiplies the part of `envelope` (covering frames first_frame...) that overlaps this ramp."""
+        lo = max(self.start_frame, first_frame)
+        hi = min(self.end_frame, first_frame + len(envelope))
+        if lo >= hi:
+            return
+        target = envelope[lo - first_frame:hi - first_frame]
+        if self.from_gain == self.to_gain:
+            target *= np.float32(self.from_gain)
+            return
+        frames = np.arange(lo, hi)
+        if self.step_boundaries is not None:
+            steps = len(self.step_boundaries)
+            step_index = np.searchsorted(self.step_boundaries, frames, side="right") - 1
+            gains = self.from_gain + (self.to_gain - self.from_gain) / steps * step_index
+        else:
+            length = self.end_frame - self.start_frame
+            gains = self.from_gain + (self.to_gain - self.from_gain) / length * (frames - self.start_frame)
+        target *= gains.astype(np.float32)
+
+
+class EffectChain:
+    """
+    Compiled form of all effects applied to one stem: a trim range plus a list of
+    gain ramps, all in frames of the original stem. Effect envelope functions build
+    it up with cut() and ramp(), using milliseconds relative to the audio as it
+    looks after the previous effects, exactly like the AudioSegment effects do.
+    """
+    def __init__(self, frame_rate, frame_count):
+        """
+        Args:
+            frame_rate (int): Sample rate of the stem.
+            frame_count (int): Number of frames of the (untrimmed) stem.
+        """
+        self.frame_rate = frame_rate
+        self.frame_count = frame_count
+        self.start = 0
+        self.end = frame_count
+        self.ramps = []
+
+    def __len__(self):
+        """Length of the current audio in milliseconds, rounded like len(AudioSegment)."""
+        return round(1000 * (self.end - self.start) / self.frame_rate)
+
+    @property
+    def is_identity(self):
+        """True if the chain leaves the stem unchanged."""
+        return not self.ramps and self.start == 0 and self.end == self.frame_count
+
+    def frame_at(self, ms):
+        """Returns the absolute source frame at a position (ms) of the current audio, like AudioSegment slicing."""
+        length = len(self)
+        ms = min(ms, length)
+        if ms < 0:
+            ms = max(length - abs(ms), 0)
+        return min(self.start + int(ms * self.frame_rate / 1000.0), self.end)
+
+    def cut(self, start_ms=None, end_ms=None):
+        """Keeps only [start_ms, end_ms) of the current audio, like audio[start_ms:end_ms]."""
+        new_start = self.frame_at(start_ms) if start_ms is not None else self.start
+        new_end = self.frame_at(end_ms) if end_ms is not None else self.end
+        self.start, self.end = new_start, max(new_start, new_end)
+
+    def ramp(self, start_ms, end_ms, from_gain, to_gain, per_ms=False):
+        """
+        Changes the gain linearly from from_gain to to_gain (linear factors) over
+        [start_ms, end_ms) of the current audio.
+
+        Args:
+            per_ms (bool): Step the gain once per millisecond instead of once per frame.
+        """
+        start_ms, end_ms = max(start_ms, 0), max(end_ms, 0)  # ramps never count from the end
+        start_frame = self.frame_at(start_ms)
+        end_frame = self.frame_at(end_ms)
+        if end_frame <= start_frame:
+            return
+        step_boundaries = None
+        if per_ms and from_gain != to_gain:
+            step_boundaries = np.array([self.start + int((start_ms + i) * self.frame_rate / 1000.0)
+                                        for i in range(int(end_ms - start_ms))], dtype=np.int64)
+        self.ramps.append(GainRamp(start_frame, end_frame, from_gain, to_gain, step_boundaries))
+
+    def gain(self, start_ms, end_ms, gain):
+        """Multiplies [start_ms, end_ms) of the current audio by a constant linear gain."""
+        self.ramp(start_ms, end_ms, gain, gain)
+
+    def fade(self, start_ms, end_ms, from_db, to_db):
+        """Fades between two dB levels over [start_ms, end_ms), rendered like AudioSegment.fade."""
+        duration = end_ms - start_ms
+        self.ramp(start_ms, end_ms, db_to_gain(from_db), db_to_gain(to_db), per_ms=duration > 100)
+
+    def envelope(self, first_frame, frame_count):
+        """Returns the float32 gain of the source frames [first_frame, first_frame + frame_count)."""
+        envelope = np.ones(frame_count, dtype=np.float32)
+        for ramp in self.ramps:
+            ramp.apply(envelope, first_frame)
+        return envelope
+
+
+def compile_effects(effect_calls, envelope_functions, frame_rate, frame_count):
+    """
+    Compiles the effect calls of one stem into a single EffectChain.
+
+    Args:
+        effect_calls (list[tuple[str, dict]]): (effect name, parameters) in application order.
+        envelope_functions (dict): Effect name -> envelope function, from the effects' 'effect_envelope' dicts.
+        frame_rate (int): Sample rate of the stem.
+        frame_count (int): Number of frames of the stem.
+
+    Returns:
+        EffectChain | None: The compiled chain, or None if an effect has no envelope form
+                            (the stem then has to go through the AudioSegment effects).
+    """
+    if any(name not in envelope_functions for name, _ in effect_calls):
+        return None
+    chain = EffectChain(frame_rate, frame_count)
+    for name, params in effect_calls:
+        envelope_functions[name](chain, **params)
+    return chain
+
+
+class EffectPlan:
+    """
+    Cheapest way to run the effect calls of one stem, chosen by plan_effects() from the
+    forms and declarations of the effects:
+    - "compiled": the calls are a trim range and gain envelope (chain), optionally followed
+      by streamable buffer effects (block_effects) that run on every chunk while mixing.
+      No full-length copy of the stem is made, and the stem can be streamed.
+    - "buffer": the stem is converted once into a float32 buffer and run() applies the
+      calls to it in order; in-place buffer effects and envelope effects modify it
+      without new allocations. Envelope effects after the last buffer effect are left
+      as a chain for the mix.
+    """
+    def __init__(self, kind, chain=None, block_effects=None, steps=None, tail_calls=None):
+        self.kind = kind
+        self.chain = chain
+        self.block_effects = block_effects or []
+        self.steps = steps or []  # ("envelope", [(function, params)]) or ("buffer", name, BufferEffect, params)
+        self.tail_calls = tail_calls or []  # (envelope function, params) compiled against the final buffer
+
+    def run(self, samples, frame_rate, on_effect=None):
+        """
+        Applies the steps of a "buffer" plan.
+
+        Args:
+            samples (np.ndarray): Float32 (frames, channels) buffer in [-1.0, 1.0), owned by the caller.
+            frame_rate (int): Sample rate of the stem.
+            on_effect (callable, optional): Called as on_effect(name, seconds) after every buffer effect.
+
+        Returns:
+            tuple[np.ndarray, EffectChain]: The processed buffer and the chain of the trailing envelope effects.
+        """
+        for step in self.steps:
+            if step[0] == "envelope":
+                chain = _compile_calls(step[1], frame_rate, len(samples))
+                samples = samples[chain.start:chain.end]  # a view, trimming copies nothing
+                if chain.ramps:
+                    samples *= chain.envelope(chain.start, len(samples))[:, None]
+                continue
+            _, name, effect, params = step
+            start_time = time.perf_counter()
+            try:
+                samples = effect.process(samples, EffectContext(frame_rate, len(samples)), params)
+            finally:
+                if on_effect is not None:
+                    on_effect(name, time.perf_counter() - start_time)
+        samples = np.asarray(samples, dtype=np.float32)
+        return samples, _compile_calls(self.tail_calls, frame_rate, len(samples))
+
+
+def _compile_calls(calls, frame_rate, frame_count):
+    chain = EffectChain(frame_rate, frame_count)
+    for function, params in calls:
+        function(chain, **params)
+    return chain
+
+
+def plan_effects(effect_calls, envelope_functions, buffer_effects, frame_rate, frame_count):
+    """
+    Picks the cheapest execution path for the effect calls of one stem, see EffectPlan.
+    Envelope forms are preferred, then streamable buffer effects, then the others.
+
+    Args:
+        effect_calls (list[tuple[str, dict]]): (effect name, parameters) in application order.
+        envelope_functions (dict): Effect name -> envelope function ('effect_envelope' dicts).
+        buffer_effects (dict): Effect name -> BufferEffect ('effect_buffer' dicts).
+        frame_rate (int): Sample rate of the stem.
+        frame_count (int): Number of frames of the stem.
+
+    Returns:
+        EffectPlan | None: The plan, or None if an effect only has an AudioSegment form
+                           (the stem then has to go through the AudioSegment effects).
+    """
+    if any(name not in envelope_functions and name not in buffer_effects for name, _ in effect_calls):
+        return None
+    leading = 0
+    while leading < len(effect_calls) and effect_calls[leading][0] in envelope_functions:
+        leading += 1
+    rest = effect_calls[leading:]
+    if all(name in buffer_effects and buffer_effects[name].streamable for name, _ in rest):
+        chain = compile_effects(effect_calls[:leading], envelope_functions, frame_rate, frame_count)
+        return EffectPlan("compiled", chain=chain,
+                          block_effects=[(buffer_effects[name], params) for name, params in rest])
+
+    steps = []
+    for name, params in effect_calls:
+        if name in envelope_functions:
+            if not steps or steps[-1][0] != "envelope":
+                steps.append(("envelope", []))
+            steps[-1][1].append((envelope_functions[name], params))
+        else:
+            steps.append(("buffer", name, buffer_effects[name], params))
+    tail_calls = steps.pop()[1] if steps[-1][0] == "envelope" else []
+    return EffectPlan("buffer", steps=steps, tail_calls=tail_calls)
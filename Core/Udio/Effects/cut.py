@@ -8,7 +8,20 @@ def apply_cut_end(input_audio, time):
     """Removes the last `time` milliseconds of the audio."""
     return input_audio[:-time]
 
+def cut_beginning_envelope(chain, time):
+    """Compiled form of apply_cut_beginning (see EffectCompiler)."""
+    chain.cut(time, None)
+
+def cut_end_envelope(chain, time):
+    """Compiled form of apply_cut_end (see EffectCompiler). Like input_audio[:-0], time=0 leaves nothing."""
+    chain.cut(None, -time if time else 0)
+
 effect_name = {
     "cut_beginning": apply_cut_beginning,
     "cut_end": apply_cut_end
 }
+
+effect_envelope = {
+    "cut_beginning": cut_beginning_envelope,
+    "cut_end": cut_end_envelope
+}
@@ -8,7 +8,20 @@ def apply_fade_out(input_audio, time):
     """Applies fade-out effect to the audio."""
     return input_audio.fade_out(time)
 
+def fade_in_envelope(chain, time):
+    """Compiled form of apply_fade_in (see EffectCompiler)."""
+    chain.fade(0, time, -120, 0)
+
+def fade_out_envelope(chain, time):
+    """Compiled form of apply_fade_out (see EffectCompiler)."""
+    chain.fade(len(chain) - time, len(chain), 0, -120)
+
 effect_name = {
     "fade_in": apply_fade_in,
     "fade_out": apply_fade_out
 }
+
+effect_envelope = {
+    "fade_in": fade_in_envelope,
+    "fade_out": fade_out_envelope
+}
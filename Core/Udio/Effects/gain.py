@@ -43,4 +43,26 @@ def apply_gain(input_audio, amount, start_time=None, end_time=None, in_crossfade
 
     return modified_audio
 
+def gain_envelope(chain, amount, start_time=None, end_time=None, in_crossfade=0, out_crossfade=0):
+    """
+    Compiled form of apply_gain (see EffectCompiler).
+
+    The crossfades ramp the gain from 0 dB to `amount` over the first `in_crossfade` ms
+    of the range and back over the last `out_crossfade` ms. Unlike apply_gain, which
+    splices the crossfades with AudioSegment.append, no audio is dropped and the track
+    keeps its length.
+    """
+    amount = max(min(amount, 30), -30)
+    if start_time is None:
+        start_time = 0
+    if end_time is None or end_time > len(chain):
+        end_time = len(chain)
+
+    gain = 10 ** (amount / 20.0)
+    chain.ramp(start_time, start_time + in_crossfade, 1.0, gain)
+    chain.gain(start_time + in_crossfade, end_time - out_crossfade, gain)
+    chain.ramp(end_time - out_crossfade, end_time, gain, 1.0)
+
 effect_name = {"gain": apply_gain}
+
+effect_envelope = {"gain": gain_envelope}
@@ -1,55 +1,203 @@
 import os
 import subprocess
+import tempfile
 from pydub import AudioSegment
+from Core.Udio.BufferEffect import BufferEffect
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, without it the reverb is rendered by Sox
+    np = None
 
-def apply_reverb(input_audio, amount, start_time=None, end_time=None, in_crossfade=0, out_crossfade=0):
+# Native reverb: convolution with a synthetic, exponentially decaying noise impulse response
+MIN_DECAY_SECONDS = 0.3  # RT60 at amount 0
+MAX_DECAY_SECONDS = 3.0  # RT60 at amount 100
+DAMPING_CUTOFF_HZ = 6000  # the tail loses its highs above this frequency
+WET_GAIN_DB = -3
+OUTPUT_GAIN_DB = -5  # same make-up gain as the sox command
+IMPULSE_SEED = 1234  # fixed, so the same input always renders the same output
+CONVOLUTION_BLOCK_FRAMES = 1 << 16
+
+def apply_reverb(input_audio, amount, start_time=None, end_time=None, in_crossfade=0, out_crossfade=0, backend="native"):
     """
-    Applies reverb using Sox (external processing).
+    Applies reverb.
     - amount: Reverb intensity (0-100)
     - start_time: When the reverb starts (in milliseconds) (default: entire track)
     - end_time: When the reverb stops (in milliseconds) (default: entire track)
     - in_crossfade: Smoothly enters the reverb effect (milliseconds)
     - out_crossfade: Smoothly exits the reverb effect (milliseconds)
+    - backend: "native" renders the reverb in-process with NumPy, "sox" uses the external
+               Sox tool. Falls back to "sox" when NumPy is not installed.
+
+    Outside [start_time, end_time) the audio stays dry; the track keeps its length.
     """
-    temp_input = "temp_input.wav"
-    temp_output = "temp_output.wav"
+    if backend == "native":
+        reverb_audio = _native_reverb(input_audio, amount) if np is not None else _sox_reverb(input_audio, amount)
+    elif backend == "sox":
+        reverb_audio = _sox_reverb(input_audio, amount)
+    else:
+        print(f"Error applying reverb: unknown backend '{backend}'")
+        return input_audio
+
+    if reverb_audio is None:
+        return input_audio  # Return original audio if error
+    return _blend_window(input_audio, reverb_audio, start_time, end_time, in_crossfade, out_crossfade)
 
-    input_audio.export(temp_input, format="wav")  # Save temp file
+def _blend_window(dry_audio, wet_audio, start_time, end_time, in_crossfade, out_crossfade):
+    """Replaces [start_time, end_time) of the dry audio by the wet audio, with linear crossfades at both edges."""
+    # Set default start_time and end_time
+    if start_time is None:
+        start_time = 0  # Default: Start at beginning
+    if end_time is None or end_time > len(dry_audio):
+        end_time = len(dry_audio)  # Default: Apply to entire track
+    if end_time <= start_time:
+        return dry_audio
+    in_crossfade = min(in_crossfade, end_time - start_time)
+    out_crossfade = min(out_crossfade, end_time - start_time - in_crossfade)
 
-    sox_command = [
-        "sox", temp_input, temp_output,
-        "reverb", str(amount),  
-        "gain", "-5"
-    ]
+    wet_part = wet_audio[start_time:end_time]
+    if in_crossfade > 0:
+        wet_part = wet_part.fade_in(in_crossfade)
+    if out_crossfade > 0:
+        wet_part = wet_part.fade_out(out_crossfade)
 
-    try:
-        subprocess.run(sox_command, check=True)
-        reverb_audio = AudioSegment.from_wav(temp_output)
+    # The dry signal fades out while the wet one fades in, and back at the end
+    dry_part = dry_audio[start_time:end_time]
+    middle_end = len(dry_part) - out_crossfade
+    dry_in = dry_part[:in_crossfade]
+    dry_middle = dry_part[in_crossfade:middle_end] - 120  # silenced, but keeps the exact frame count
+    dry_out = dry_part[middle_end:]
+    if in_crossfade > 0:
+        dry_in = dry_in.fade_out(in_crossfade)
+    if out_crossfade > 0:
+        dry_out = dry_out.fade_in(out_crossfade)
+    dry_part = dry_in + dry_middle + dry_out
+    window = dry_part.overlay(wet_part)
 
-        # Set default start_time and end_time
-        if start_time is None:
-            start_time = 0  # Default: Start at beginning
-        if end_time is None or end_time > len(reverb_audio):
-            end_time = len(reverb_audio)  # Default: Apply to entire track
+    return dry_audio[:start_time] + window + dry_audio[end_time:]
 
-        # Trim reverb effect within the given time range
-        reverb_audio = reverb_audio[start_time:end_time]
+def _sox_reverb(input_audio, amount):
+    """Renders the reverb with the external Sox tool. Returns None on error."""
+    # Unique temp files, so concurrent mixes never share them
+    with tempfile.TemporaryDirectory(prefix="reverb_") as temp_folder:
+        temp_input = os.path.join(temp_folder, "input.wav")
+        temp_output = os.path.join(temp_folder, "output.wav")
 
-        # Apply crossfades if specified
-        if in_crossfade > 0:
-            reverb_audio = reverb_audio.fade_in(in_crossfade)
-        if out_crossfade > 0:
-            reverb_audio = reverb_audio.fade_out(out_crossfade)
+        input_audio.export(temp_input, format="wav")  # Save temp file
 
-        return reverb_audio
+        sox_command = [
+            "sox", temp_input, temp_output,
+            "reverb", str(amount),
+            "gain", str(OUTPUT_GAIN_DB)
+        ]
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error applying reverb: {e}")
-        return input_audio  # Return original audio if error
+        try:
+            subprocess.run(sox_command, check=True)
+            return AudioSegment.from_wav(temp_output)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Error applying reverb: {e}")
+            return None
+
+def _native_reverb(input_audio, amount):
+    """Renders the reverb in-process with NumPy."""
+    from Core.Udio.MixEngine import segment_to_array, array_to_segment
+
+    wet = _reverb_array(segment_to_array(input_audio), amount, input_audio.frame_rate)
+    return array_to_segment(wet, input_audio.frame_rate, input_audio.sample_width)
+
+def _reverb_array(dry, amount, frame_rate):
+    """Renders the reverb of a float32 (frames, channels) array into a new array."""
+    impulse = _impulse_response(amount, frame_rate, dry.shape[1])
+    wet = _convolve(dry, impulse)
+    wet *= np.float32(10 ** (WET_GAIN_DB / 20.0))
+    wet += dry
+    wet *= np.float32(10 ** (OUTPUT_GAIN_DB / 20.0))
+    return wet
+
+def reverb_buffer(samples, context, amount, start_time=None, end_time=None, in_crossfade=0, out_crossfade=0, backend="native"):
+    """
+    Buffer form of apply_reverb (see BufferEffect). Needs the whole signal and returns a
+    new buffer; the crossfades are rendered like the AudioSegment fades of apply_reverb.
+    """
+    if backend != "native":
+        from Core.Udio.MixEngine import segment_to_array, array_to_segment
 
-    finally:
-        os.remove(temp_input)
-        if os.path.exists(temp_output):
-            os.remove(temp_output)
+        audio = array_to_segment(samples.copy(), context.frame_rate, 4)
+        return segment_to_array(apply_reverb(audio, amount, start_time, end_time, in_crossfade, out_crossfade, backend))
+    wet = _reverb_array(samples, amount, context.frame_rate)
+    return _blend_window_array(samples, wet, context, start_time, end_time, in_crossfade, out_crossfade)
+
+def _blend_window_array(dry, wet, context, start_time, end_time, in_crossfade, out_crossfade):
+    """Array counterpart of _blend_window: blends `dry` into `wet` outside and at the edges of the window."""
+    from Core.Udio.EffectCompiler import EffectChain, db_to_gain
+
+    if start_time is None:
+        start_time = 0
+    if end_time is None or end_time > len(context):
+        end_time = len(context)
+    if end_time <= start_time:
+        return dry
+    in_crossfade = min(in_crossfade, end_time - start_time)
+    out_crossfade = min(out_crossfade, end_time - start_time - in_crossfade)
+
+    # Gains of the wet and dry signals inside the window, in the same 1 ms steps as the AudioSegment fades
+    wet_gain = EffectChain(context.frame_rate, context.frame_count)
+    dry_gain = EffectChain(context.frame_rate, context.frame_count)
+    for chain in (wet_gain, dry_gain):
+        chain.cut(start_time, end_time)
+    window = len(wet_gain)
+    if in_crossfade > 0:
+        wet_gain.fade(0, in_crossfade, -120, 0)
+        dry_gain.fade(0, in_crossfade, 0, -120)
+    if out_crossfade > 0:
+        wet_gain.fade(window - out_crossfade, window, 0, -120)
+        dry_gain.fade(window - out_crossfade, window, -120, 0)
+    dry_gain.gain(in_crossfade, window - out_crossfade, db_to_gain(-120))
+
+    start, end = wet_gain.start, wet_gain.end
+    wet[:start] = dry[:start]
+    wet[end:] = dry[end:]
+    if wet_gain.ramps:
+        wet[start:end] *= wet_gain.envelope(start, end - start)[:, None]
+    wet[start:end] += dry[start:end] * dry_gain.envelope(start, end - start)[:, None]
+    return wet
+
+def _impulse_response(amount, frame_rate, channels):
+    """Builds a decaying, high-damped noise impulse response (one decorrelated channel per audio channel)."""
+    amount = max(min(amount, 100), 0)
+    decay_seconds = MIN_DECAY_SECONDS + (MAX_DECAY_SECONDS - MIN_DECAY_SECONDS) * amount / 100.0
+    length = int(decay_seconds * frame_rate)
+    rng = np.random.default_rng(IMPULSE_SEED)
+    noise = rng.standard_normal((length, channels))
+
+    # -60 dB after decay_seconds
+    time = np.arange(length) / frame_rate
+    noise *= np.exp(-6.907755 * time / decay_seconds)[:, None]
+
+    # Damp the highs, then normalize to unit energy so the wet level doesn't depend on amount
+    spectrum = np.fft.rfft(noise, axis=0)
+    frequencies = np.fft.rfftfreq(length, 1.0 / frame_rate)
+    spectrum *= (1.0 / (1.0 + (frequencies / DAMPING_CUTOFF_HZ) ** 2))[:, None]
+    impulse = np.fft.irfft(spectrum, n=length, axis=0)
+    impulse /= np.sqrt(np.sum(impulse ** 2, axis=0, keepdims=True)) + 1e-12
+    return impulse.astype(np.float32)
+
+def _convolve(signal, impulse):
+    """FFT overlap-add convolution of (frames, channels) audio, truncated to the input length."""
+    frame_count, channels = signal.shape
+    impulse_length = len(impulse)
+    fft_size = 1
+    while fft_size < CONVOLUTION_BLOCK_FRAMES + impulse_length - 1:
+        fft_size <<= 1
+    block_frames = fft_size - impulse_length + 1
+    impulse_spectrum = np.fft.rfft(impulse, n=fft_size, axis=0)
+
+    output = np.zeros((frame_count + fft_size, channels), dtype=np.float32)
+    for start in range(0, frame_count, block_frames):
+        block = signal[start:start + block_frames]
+        result = np.fft.irfft(np.fft.rfft(block, n=fft_size, axis=0) * impulse_spectrum, n=fft_size, axis=0)
+        output[start:start + fft_size] += result
+    return output[:frame_count]
 
 effect_name = { "reverb": apply_reverb }
+
+effect_buffer = { "reverb": BufferEffect(reverb_buffer, in_place=False, streamable=False) }
@@ -7,6 +7,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from Core.ConfigManager import ConfigManager
 from Core.LogManager import LogManager
+from Core.Udio.TrackCatalog import TrackCatalog
 
 
 class ExportTracks:
@@ -58,50 +59,42 @@ class ExportTracks:
         self.unity_dest_path = os.path.join(self.unity_project_root, unity_dest_path)
         os.makedirs(self.unity_dest_path, exist_ok=True)  # Ensure destination directory exists
 
+        # Catalog of the track folders shared with MixTracks and AnalyzeTrackDB (parsed JSONs, file sizes and mtimes)
+        self.catalog = TrackCatalog.from_config(self.project_root, self.config, self.log_manager)
+
     def _find_track_files(self):
-        """Finds all track JSON files within the look_folders."""
-        track_files = []
+        """Finds all track JSON files within the look_folders. Returns their TrackRecords from the refreshed track catalog."""
         for folder in self.look_folders:
             if not os.path.isdir(folder):
                 self.log_manager.log("important", f"❌ Folder not found: {folder}")
-                continue
-            self.log_manager.log("verbose", f"📂 Searching for tracks in: {folder}")
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    if file.lower().endswith(".json"):
-                        full_path = os.path.join(root, file)
-                        track_files.append(full_path)
-                        self.log_manager.log("verbose", f"    ✅ Found track JSON: {full_path}")
+            else:
+                self.log_manager.log("verbose", f"📂 Searching for tracks in: {folder}")
+        self.catalog.refresh(self.look_folders)
+        track_files = self.catalog.tracks(self.look_folders)
+        for track in track_files:
+            self.log_manager.log("verbose", f"    ✅ Found track JSON: {track.json_path}")
         return track_files
 
-    def _process_track(self, track_json_path):
+    def _process_track(self, track):
         """
         Processes a single track JSON file, copying the MP3 and creating metadata.
 
         Args:
-            track_json_path (str): Path to the track JSON file.
+            track (TrackRecord): Catalog entry of the track JSON file.
         """
+        track_json_path = track.json_path
         self.log_manager.log("normal", f"\n▶️ Processing track: {track_json_path}")
-        try:
-            with open(track_json_path, "r", encoding="utf-8") as f:
-                track_data = json.load(f)
-        except FileNotFoundError:
-            self.log_manager.log("important", f"❌ JSON file not found: {track_json_path}. Skipping.")
-            return
-        except json.JSONDecodeError as e:
-            self.log_manager.log("important", f"❌ Error decoding JSON: {track_json_path} - {e}. Skipping.")
-            return
-        except Exception as e:
-            self.log_manager.log("important", f"❌ Error reading JSON file: {track_json_path} - {e}. Skipping.")
+        if track.error is not None:
+            self.log_manager.log("important", f"❌ Error decoding JSON: {track_json_path} - {track.error}. Skipping.")
             return
 
         # --- Check for 'mix' section and 'export' parameter ---
-        if "mix" not in track_data:
+        if track.mix is None:
             self.log_manager.log("important", f"❌ 'mix' section not found in JSON: {track_json_path}. Skipping.")
             return
-        mix_config = track_data["mix"]
+        mix_config = track.mix
 
-        export_params = track_data.get("export_parameters", {})
+        export_params = track.export_parameters or {}
         if export_params.get("export", True) is False:  # Default to True if not present
             self.log_manager.log("normal", f"⏭️ Track not marked for export in JSON: {track_json_path}")
             return
@@ -115,7 +108,7 @@ class ExportTracks:
             return
 
         source_mp3_path = os.path.join(os.path.dirname(track_json_path), source_mp3_name)
-        if not os.path.exists(source_mp3_path):
+        if track.mp3 is None and not os.path.exists(source_mp3_path):  # outputs outside the look folders aren't catalogued
             self.log_manager.log("important", f"❌ MP3 file not found: {source_mp3_path}. Skipping.")
             return
 
@@ -131,7 +124,7 @@ class ExportTracks:
             return
 
         # --- Create and save metadata JSON ---
-        tags = track_data.get("tags", {})
+        tags = track.tags if track.tags is not None else {}
         # Construct the metadata dictionary with the new format
         metadata = {
             "music_configuration": self.music_configuration,
@@ -164,6 +157,6 @@ class ExportTracks:
             return
 
         self.log_manager.log("normal", f"ℹ️ Found {len(track_json_files)} track JSON files to process.")
-        for track_json_path in track_json_files:
-            self._process_track(track_json_path)
+        for track in track_json_files:
+            self._process_track(track)
         self.log_manager.log("important", "🏁 Export process complete.")
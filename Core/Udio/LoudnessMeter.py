@@ -0,0 +1,193 @@
+import math
+from functools import lru_cache
+import numpy as np
+
+# --- ITU-R BS.1770-4 ---
+SHELF_GAIN_DB = 3.99984385397  # stage 1 of the K-weighting: high shelf
+SHELF_Q = 0.7071752369554193
+SHELF_FREQUENCY = 1681.974450955533
+HIGHPASS_Q = 0.5003270373238773  # stage 2: RLB high pass
+HIGHPASS_FREQUENCY = 38.13547087602444
+K_WEIGHTING_SECONDS = 0.2  # impulse response length; the filters have decayed below -200 dB by then
+LOUDNESS_OFFSET = -0.691
+SEGMENT_SECONDS = 0.1  # gating blocks are 400 ms long and start every 100 ms (75% overlap)
+SEGMENTS_PER_BLOCK = 4
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_TAPS = 48  # interpolation filter length over all phases (12 taps per phase)
+FFT_SIZE = 1 << 17  # long buffers are analyzed in chunks that fill one FFT of this size
+
+
+def _biquad(b, a, signal):
+    """Filters a (short) signal with a biquad, direct form I."""
+    output = np.zeros(len(signal))
+    x1 = x2 = y1 = y2 = 0.0
+    for n, x0 in enumerate(signal.tolist()):
+        y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        output[n] = y0
+        x1, x2, y1, y2 = x0, x1, y0, y1
+    return output
+
+
+@lru_cache(maxsize=None)
+def k_weighting_response(frame_rate):
+    """
+    Returns the impulse response of the BS.1770 K-weighting filter (high shelf + RLB
+    high pass) at any sample rate, with coefficients derived like libebur128 does.
+    """
+    k = math.tan(math.pi * SHELF_FREQUENCY / frame_rate)
+    vh = 10.0 ** (SHELF_GAIN_DB / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / SHELF_Q + k * k
+    shelf_b = [(vh + vb * k / SHELF_Q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / SHELF_Q + k * k) / a0]
+    shelf_a = [1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / SHELF_Q + k * k) / a0]
+
+    k = math.tan(math.pi * HIGHPASS_FREQUENCY / frame_rate)
+    a0 = 1.0 + k / HIGHPASS_Q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / HIGHPASS_Q + k * k) / a0]
+
+    impulse = np.zeros(int(K_WEIGHTING_SECONDS * frame_rate))
+    impulse[0] = 1.0
+    response = _biquad(highpass_b, highpass_a, _biquad(shelf_b, shelf_a, impulse))
+    response.flags.writeable = False  # shared by every meter of this sample rate
+    return response
+
+
+def true_peak_filters():
+    """Returns the polyphase interpolation filters (one row per phase) of the 4x true-peak oversampling."""
+    n = np.arange(TRUE_PEAK_TAPS) - (TRUE_PEAK_TAPS - 1) / 2.0
+    response = np.sinc(n / TRUE_PEAK_OVERSAMPLING) * np.kaiser(TRUE_PEAK_TAPS, 6.0)
+    phases = response.reshape(-1, TRUE_PEAK_OVERSAMPLING).T.copy()
+    return phases / phases.sum(axis=1, keepdims=True)  # unity gain at DC for every phase
+
+
+def normalization_gain(analysis, target_lufs, true_peak_limit):
+    """
+    Returns the gain (dB) that brings a mix to `target_lufs`, lowered if needed so its
+    true peak stays at or below `true_peak_limit` (dBTP), and whether the limit applied.
+    Returns (None, False) for a silent mix.
+    """
+    if analysis["integrated_lufs"] is None:
+        return None, False
+    gain_db = target_lufs - analysis["integrated_lufs"]
+    if analysis["true_peak_dbtp"] is not None and analysis["true_peak_dbtp"] + gain_db > true_peak_limit:
+        return round(true_peak_limit - analysis["true_peak_dbtp"], 2), True
+    return round(gain_db, 2), False
+
+
+def _to_db(value):
+    """Returns 20*log10(value), or None for silence (JSON has no -inf)."""
+    return round(20.0 * math.log10(value), 2) if value > 0 else None
+
+
+class LoudnessMeter:
+    """
+    Measures integrated loudness (LUFS, BS.1770-4 with gating), true peak (dBTP, 4x
+    oversampled), sample peak, RMS and the number of clipped samples of a mix in one
+    vectorized pass. Samples can be added all at once or block by block (streaming
+    mode); filter states carry over between blocks, so both give the same result.
+    """
+    def __init__(self, frame_rate, channels, sample_width):
+        """
+        Args:
+            frame_rate (int): Sample rate of the mix.
+            channels (int): Channel count of the mix (all channels are weighted 1.0, as for mono/stereo).
+            sample_width (int): Sample width of the mix in bytes (1, 2 or 4, signed samples).
+        """
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.full_scale = float(1 << (8 * sample_width - 1))
+        self.k_response = k_weighting_response(frame_rate)
+        self.k_spectra = {}  # FFT size -> spectrum of the K-weighting response
+        self.k_tail = np.zeros((channels, len(self.k_response) - 1))
+        self.tp_filters = true_peak_filters()
+        self.tp_tail = np.zeros((channels, self.tp_filters.shape[1] - 1))
+        self.segment_frames = max(int(round(SEGMENT_SECONDS * frame_rate)), 1)
+        self.segments = []  # K-weighted energy of every complete 100 ms segment, per channel
+        self.partial_energy = np.zeros(channels)
+        self.partial_frames = 0
+        self.frames = 0
+        self.sum_squares = 0.0
+        self.sample_peak = 0.0
+        self.true_peak = 0.0
+        self.clipped_samples = 0
+
+    def add(self, samples):
+        """
+        Adds samples to the measurement.
+
+        Args:
+            samples (np.ndarray): Integer samples of shape (frames, channels), in mix order.
+        """
+        chunk_frames = FFT_SIZE - self.k_tail.shape[1]
+        for start in range(0, len(samples), chunk_frames):
+            self._add_chunk(samples[start:start + chunk_frames])
+
+    def _add_chunk(self, samples):
+        if not len(samples):
+            return
+        self.clipped_samples += int(np.count_nonzero((samples >= self.full_scale - 1) | (samples <= -self.full_scale)))
+        x = samples.T.astype(np.float64) / self.full_scale  # (channels, frames), contiguous per channel
+        self.frames += x.shape[1]
+        self.sum_squares += float(np.einsum("ij,ij->", x, x))
+        self.sample_peak = max(self.sample_peak, float(np.max(np.abs(x))))
+
+        # True peak: all interpolation phases in one product, continued from the previous chunk's last samples
+        padded = np.concatenate([self.tp_tail, x], axis=1)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.tp_filters.shape[1], axis=1)
+        interpolated = windows @ self.tp_filters[:, ::-1].T
+        self.true_peak = max(self.true_peak, float(np.max(np.abs(interpolated))))
+        self.tp_tail = padded[:, padded.shape[1] - self.tp_tail.shape[1]:]
+
+        # K-weighting by overlap-save FFT convolution with the filter's impulse response
+        padded = np.concatenate([self.k_tail, x], axis=1)
+        fft_size = 1 << (padded.shape[1] - 1).bit_length()
+        if fft_size not in self.k_spectra:
+            self.k_spectra[fft_size] = np.fft.rfft(self.k_response, fft_size)
+        spectrum = np.fft.rfft(padded, fft_size) * self.k_spectra[fft_size]
+        weighted = np.fft.irfft(spectrum, fft_size)[:, self.k_tail.shape[1]:padded.shape[1]]
+        self.k_tail = padded[:, padded.shape[1] - self.k_tail.shape[1]:]
+        self._add_energy(weighted * weighted)
+
+    def _add_energy(self, energy):
+        """Sums squared K-weighted samples (channels, frames) into 100 ms segments."""
+        position = 0
+        while position < energy.shape[1]:
+            take = min(self.segment_frames - self.partial_frames, energy.shape[1] - position)
+            self.partial_energy += energy[:, position:position + take].sum(axis=1)
+            self.partial_frames += take
+            position += take
+            if self.partial_frames == self.segment_frames:
+                self.segments.append(self.partial_energy)
+                self.partial_energy = np.zeros(self.channels)
+                self.partial_frames = 0
+
+    def integrated_loudness(self):
+        """Returns the gated integrated loudness in LUFS, or None for silence or mixes shorter than 400 ms."""
+        if len(self.segments) < SEGMENTS_PER_BLOCK:
+            return None
+        segments = np.array(self.segments)
+        blocks = sum(segments[i:len(segments) - SEGMENTS_PER_BLOCK + 1 + i] for i in range(SEGMENTS_PER_BLOCK))
+        power = blocks.sum(axis=1) / (SEGMENTS_PER_BLOCK * self.segment_frames)
+        with np.errstate(divide="ignore"):
+            loudness = LOUDNESS_OFFSET + 10.0 * np.log10(power)
+        gated = loudness > ABSOLUTE_GATE_LUFS
+        if not gated.any():
+            return None
+        relative_gate = LOUDNESS_OFFSET + 10.0 * math.log10(power[gated].mean()) + RELATIVE_GATE_LU
+        gated &= loudness > relative_gate
+        return round(LOUDNESS_OFFSET + 10.0 * math.log10(power[gated].mean()), 2)
+
+    def result(self):
+        """Returns the measurements as a JSON-serializable dict (levels in dB, None for silence)."""
+        sample_count = self.frames * self.channels
+        return {
+            "integrated_lufs": self.integrated_loudness(),
+            "true_peak_dbtp": _to_db(max(self.true_peak, self.sample_peak)),
+            "sample_peak_dbfs": _to_db(self.sample_peak),
+            "rms_dbfs": _to_db(math.sqrt(self.sum_squares / sample_count)) if sample_count else None,
+            "clipped_samples": self.clipped_samples,
+            "duration_seconds": round(self.frames / self.frame_rate, 3),
+        }
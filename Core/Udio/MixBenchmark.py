@@ -0,0 +1,491 @@
+import os
+import io
+import sys
+import json
+import time
+import wave
+import shutil
+import zipfile
+import hashlib
+import platform
+import threading
+import numpy as np
+
+# Add Core to path so we can import ConfigManager, LogManager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from Core.ConfigManager import ConfigManager
+from Core.LogManager import LogManager
+from Core.Udio.MixTracks import MixTracks, EXPECTED_STEMS, DEFAULT_CACHE_FOLDER
+from Core.Udio.MixEngine import MixStem, mix_stems
+from Core.Udio.MixEncoder import OutputTarget
+from Core.Udio.EffectCompiler import compile_effects, plan_effects
+from Core.Udio.ZipStemReader import ZipStemReader
+try:
+    import psutil
+except ImportError:  # optional, without it peak RSS is read from /proc (Linux) or not reported
+    psutil = None
+
+# --- Benchmark Configuration ---
+BENCHMARK_MODES = ("pydub", "numpy", "streaming")
+DEFAULT_SECONDS = 30
+DEFAULT_FRAME_RATE = 44100
+DEFAULT_SAMPLE_WIDTH = 2
+BENCHMARK_BITRATE = "192k"
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MixBenchmarkGoldenHashes.json")  # committed reference
+REPORT_FILE = "benchmark_report.json"
+RSS_SAMPLE_INTERVAL = 0.005  # seconds
+STEM_LEVEL = 0.2  # peak level of every synthetic stem, four of them never clip
+SYNTHETIC_SEED = 20240501
+
+
+class NotStreamableError(Exception):
+    """Raised when a scenario can't be mixed in streaming mode (MixTracks falls back to the regular mix)."""
+
+
+def benchmark_scenarios(length_ms):
+    """
+    Returns the benchmark tracks: scenario name -> {"effects": mix effects section,
+    "compare": True if every engine must match the pydub engine within tolerance}.
+    Every effect module is covered by at least one scenario.
+    """
+    quarter = length_ms // 4
+    # Kept in the first 60% of the track: every crossfade of the AudioSegment gain effect
+    # shortens the track, later windows would run past its end
+    automation = [{"amount": -6 if i % 2 else 3, "start_time": start, "end_time": start + quarter // 4,
+                   "in_crossfade": 200, "out_crossfade": 200}
+                  for i, start in enumerate(range(1000, int(length_ms * 0.6), quarter // 3))]
+    return {
+        "dry": {"effects": {}, "compare": True},
+        "cut": {"effects": {"cut_beginning": {"time": 1000}, "cut_end": {"time": 1500}}, "compare": True},
+        "fade": {"effects": {"fade_in": {"time": 2000}, "fade_out": {"time": 3000}}, "compare": True},
+        "gain": {"effects": {"gain": {"amount": -6, "start_time": quarter, "end_time": 3 * quarter}}, "compare": True},
+        # Crossfades are spliced by the AudioSegment effect and ramped by the compiled one (see README)
+        "gain_automation": {"effects": {"gain": automation}, "compare": False},
+        "reverb": {"effects": {"reverb": {"amount": 50, "start_time": quarter, "end_time": 2 * quarter,
+                                          "in_crossfade": 500, "out_crossfade": 500, "target_track": "vocals.wav"}},
+                   "compare": True},
+        "full": {"effects": {"cut_beginning": {"time": 500}, "fade_in": {"time": 2000}, "fade_out": {"time": 3000},
+                             "gain": automation}, "compare": False},
+    }
+
+
+def current_rss():
+    """Returns the resident set size of this process in bytes, or None if it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakRssSampler:
+    """Context manager sampling the process RSS in a background thread; peak_mb is the peak seen inside the block."""
+    def __init__(self):
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            rss = current_rss()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            if self._stop.wait(RSS_SAMPLE_INTERVAL):
+                break
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / 1048576, 1) if self.peak is not None else None
+
+
+class MixBenchmark:
+    """
+    Benchmark suite of the mixing path. Generates synthetic Udio-style ZIPs (bass, drums,
+    other and vocals WAVs) with one track JSON per scenario, then measures every stage of
+    MixTracks (decode, effects, merge, encode and the end-to-end process_track) for each
+    mix mode, plus every effect module on its own. Reports wall time, peak RSS and
+    throughput (seconds of audio per second), and validates the mixed PCM against golden
+    hashes and against the pydub engine within a tolerance.
+    """
+    def __init__(self, seconds=DEFAULT_SECONDS, frame_rate=DEFAULT_FRAME_RATE, sample_width=DEFAULT_SAMPLE_WIDTH,
+                 modes=None, scenarios=None, stored=False, tolerance_lsb=1, global_log_level=None):
+        """
+        Initializes the benchmark.
+
+        Args:
+            seconds (float): Length of the synthetic tracks.
+            frame_rate (int): Sample rate of the synthetic stems.
+            sample_width (int): Sample width of the synthetic stems in bytes (1, 2, 3 or 4).
+            modes (list[str], optional): Mix modes to measure, from BENCHMARK_MODES. Defaults to all.
+            scenarios (list[str], optional): Scenarios to run, from benchmark_scenarios(). Defaults to all.
+            stored (bool): If True the stems are stored uncompressed in the ZIPs, otherwise deflated.
+            tolerance_lsb (int): Largest sample difference per stem (in LSB of the stems) allowed
+                                 between an engine and the pydub engine for comparable scenarios;
+                                 the differences of all stems add up in the mix.
+            global_log_level (str, optional): Log level of the report. Defaults to the config setting.
+                                              MixTracks itself only logs important messages.
+        """
+        self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+        self.seconds = seconds
+        self.frame_rate = frame_rate
+        self.sample_width = sample_width
+        self.modes = list(modes or BENCHMARK_MODES)
+        self.stored = stored
+        self.tolerance_lsb = tolerance_lsb
+
+        # Initialize ConfigManager
+        self.config_manager = ConfigManager()
+        self.config = self.config_manager.load_config()
+
+        # Initialize LogManager
+        self.log_manager = LogManager(self.config.get("log_level", "verbose"))
+        if global_log_level != None:
+            self.log_manager.globalLogLevel = global_log_level
+
+        all_scenarios = benchmark_scenarios(int(seconds * 1000))
+        self.scenarios = {name: all_scenarios[name] for name in (scenarios or all_scenarios)}
+
+        cache_folder = self.config.get("udio_cache_folder", DEFAULT_CACHE_FOLDER)
+        self.benchmark_folder = os.path.join(self.project_root, cache_folder, "Benchmark")
+        self.tracks_folder = os.path.join(self.benchmark_folder, "Tracks")
+        golden_file = self.config.get("benchmark_golden_file")
+        self.golden_path = os.path.join(self.project_root, golden_file) if golden_file else GOLDEN_FILE
+
+    # --- Synthetic Tracks ---
+
+    def generate_stem(self, stem_name, seed):
+        """Returns deterministic integer (frames, 2) samples of a synthetic stem: tones, or decaying noise hits for drums."""
+        rng = np.random.default_rng(seed)
+        frame_count = int(self.seconds * self.frame_rate)
+        time_axis = np.arange(frame_count) / self.frame_rate
+        if stem_name == "drums.wav":
+            signal = rng.standard_normal(frame_count) * np.exp(-12.0 * (time_axis % 0.5))
+            signal /= np.max(np.abs(signal)) or 1.0
+        else:
+            base = {"bass.wav": 55.0, "other.wav": 220.0, "vocals.wav": 440.0}.get(stem_name, 110.0)
+            vibrato = 1.0 + 0.01 * np.sin(2 * np.pi * 5.0 * time_axis)
+            phase = 2 * np.pi * base * np.cumsum(vibrato) / self.frame_rate
+            signal = 0.7 * np.sin(phase) + 0.3 * np.sin(2 * phase) + 0.02 * rng.standard_normal(frame_count)
+            signal /= np.max(np.abs(signal))
+        stereo = np.stack([signal, np.roll(signal, 17)], axis=1) * STEM_LEVEL
+        full_scale = float(1 << (8 * self.sample_width - 1))
+        return np.rint(stereo * (full_scale - 1)).astype(np.int64)
+
+    def _wav_bytes(self, samples):
+        """Encodes integer samples as a PCM WAV file."""
+        if self.sample_width == 1:
+            pcm = (samples + 128).astype(np.uint8).tobytes()  # 8-bit WAV samples are unsigned
+        elif self.sample_width == 3:
+            pcm = samples.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+        else:
+            pcm = samples.astype(f"<i{self.sample_width}").tobytes()
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(samples.shape[1])
+            wav_file.setsampwidth(self.sample_width)
+            wav_file.setframerate(self.frame_rate)
+            wav_file.writeframes(pcm)
+        return buffer.getvalue()
+
+    def generate_tracks(self):
+        """
+        Writes one synthetic ZIP and track JSON per scenario into the benchmark folder.
+        All scenarios share the same stems, so the effects are the only difference.
+
+        Returns:
+            dict: Scenario name -> track JSON path.
+        """
+        self.log_manager.log("normal", f"🧪 Generating synthetic tracks ({self.seconds} s, {self.frame_rate} Hz, "
+                                       f"{self.sample_width * 8}-bit) in: {self.tracks_folder}")
+        shutil.rmtree(self.tracks_folder, ignore_errors=True)
+        stems = {stem_name: self._wav_bytes(self.generate_stem(stem_name, SYNTHETIC_SEED + index))
+                 for index, stem_name in enumerate(EXPECTED_STEMS)}
+        compression = zipfile.ZIP_STORED if self.stored else zipfile.ZIP_DEFLATED
+
+        track_json_paths = {}
+        for scenario, definition in self.scenarios.items():
+            track_folder = os.path.join(self.tracks_folder, scenario)
+            os.makedirs(track_folder, exist_ok=True)
+            with zipfile.ZipFile(os.path.join(track_folder, f"{scenario}.zip"), "w", compression) as zip_file:
+                for stem_name, data in stems.items():
+                    zip_file.writestr(stem_name, data)
+            track_json_path = os.path.join(track_folder, f"{scenario}.json")
+            with open(track_json_path, "w", encoding="utf-8") as f:
+                json.dump({"mix": {"source_path": f"{scenario}.zip", "output_file": f"{scenario}.mp3",
+                                   "bitrate": BENCHMARK_BITRATE, "effects": definition["effects"]}}, f, indent=4)
+            track_json_paths[scenario] = track_json_path
+        return track_json_paths
+
+    # --- Measurements ---
+
+    def _measure(self, stages, stage, function, *args):
+        """Runs one stage, records its wall time, throughput and peak RSS in `stages` and returns its result."""
+        with PeakRssSampler() as sampler:
+            start = time.perf_counter()
+            result = function(*args)
+            elapsed = time.perf_counter() - start
+        stages[stage] = {
+            "seconds": round(elapsed, 4),
+            "throughput": round(self.seconds / elapsed, 1) if elapsed > 0 else None,
+            "peak_rss_mb": sampler.peak_mb,
+        }
+        return result
+
+    def _create_mixer(self, mode):
+        """Creates the MixTracks instance of one mode. The stem cache is disabled so decoding is always measured."""
+        mixer = MixTracks([os.path.relpath(self.tracks_folder, self.project_root)], global_log_level="important",
+                          force=True, mix_engine="pydub" if mode == "pydub" else "numpy",
+                          streaming=mode == "streaming")
+        mixer.stem_cache = None
+        return mixer
+
+    def benchmark_track(self, mixer, mode, scenario, track_json_path):
+        """
+        Measures every stage of one track in one mode.
+
+        Returns:
+            tuple[dict, bytes]: The result (stages, PCM hash) and the mixed PCM data.
+        """
+        with open(track_json_path, "r", encoding="utf-8") as f:
+            effects_config = json.load(f)["mix"]["effects"]
+        zip_path = os.path.splitext(track_json_path)[0] + ".zip"
+        encode_target = OutputTarget(os.path.splitext(track_json_path)[0] + f".{mode}.stage.mp3", "mp3", BENCHMARK_BITRATE)
+        stages = {}
+
+        if mode == "streaming":
+            def stream_mix():
+                streams = []
+                try:
+                    with ZipStemReader(zip_path) as zip_reader:
+                        try:
+                            mix = mixer._open_stream_mix(zip_reader, effects_config, streams)
+                        except ValueError as e:
+                            raise NotStreamableError(str(e))
+                        return mix, b"".join(mix.blocks(mixer.stream_block_frames))
+                finally:
+                    for stream in streams:
+                        stream.close()
+            mix, pcm = self._measure(stages, "stream_mix", stream_mix)
+            frame_rate, channels, sample_width = mix.frame_rate, mix.channels, mix.sample_width
+        else:
+            track_data = self._measure(stages, "decode", mixer._read_stems, zip_path, os.path.basename(zip_path))
+            stem_effects = mixer._collect_stem_effects(effects_config, track_data)
+            if mode == "numpy":
+                stems = self._measure(stages, "effects", mixer._build_mix_stems, track_data, stem_effects)
+                merged_audio = self._measure(stages, "merge", mix_stems, stems, mixer.mix_limiter)
+            else:
+                track_data = self._measure(stages, "effects", mixer._apply_stem_effects, track_data, stem_effects)
+                merged_audio = self._measure(stages, "merge", mixer._overlay_stems, track_data)
+            pcm = merged_audio.raw_data
+            frame_rate, channels, sample_width = merged_audio.frame_rate, merged_audio.channels, merged_audio.sample_width
+
+        results = self._measure(stages, "encode", mixer.encoder_pool.encode, pcm, frame_rate, channels, sample_width, [encode_target])
+        if results[encode_target] is not None:
+            raise results[encode_target]
+        os.remove(encode_target.path)
+
+        result = self._measure(stages, "end_to_end", mixer.process_track, track_json_path)
+        if result is not True:
+            raise RuntimeError(f"process_track failed for scenario '{scenario}' in mode '{mode}'")
+
+        return {
+            "scenario": scenario,
+            "mode": mode,
+            "stages": stages,
+            "pcm_sha256": hashlib.sha256(pcm).hexdigest(),
+            "format": {"frame_rate": frame_rate, "channels": channels, "sample_width": sample_width},
+        }, pcm
+
+    def benchmark_effects(self):
+        """
+        Measures every loaded effect module on one synthetic stem: the AudioSegment effect and,
+        if the effect has them, its compiled envelope form (compile plus applying it while mixing)
+        and its NumPy buffer form.
+
+        Returns:
+            list[dict]: One result per effect.
+        """
+        mixer = self._create_mixer("numpy")
+        if not os.path.isdir(self.tracks_folder):
+            self.generate_tracks()
+        scenario = next(iter(self.scenarios))
+        with ZipStemReader(os.path.join(self.tracks_folder, scenario, f"{scenario}.zip")) as zip_reader:
+            audio = zip_reader.load_segment("vocals.wav")
+
+        # Parameters of every effect, taken from the scenarios that use it
+        effect_params = {}
+        for definition in benchmark_scenarios(int(self.seconds * 1000)).values():
+            for name, params in definition["effects"].items():
+                entries = params if isinstance(params, list) else [params]
+                effect_params.setdefault(name, [{k: v for k, v in entry.items() if k != "target_track"} for entry in entries])
+
+        results = []
+        for name in sorted(mixer.effects):
+            calls = [(name, params) for params in effect_params.get(name, [])]
+            if not calls:
+                self.log_manager.log("normal", f"    ⚠️ No benchmark parameters for effect '{name}', skipped")
+                continue
+            stages = {}
+            self._measure(stages, "audiosegment", mixer._apply_effects, "vocals.wav", audio, calls)
+            if name in mixer.effect_envelopes:
+                def envelope_mix():
+                    chain = compile_effects(calls, mixer.effect_envelopes, audio.frame_rate, int(audio.frame_count()))
+                    return mix_stems([MixStem.from_segment(audio, chain)])
+                self._measure(stages, "envelope", envelope_mix)
+            if name in mixer.buffer_effects:
+                def buffer_mix():
+                    plan = plan_effects(calls, {}, mixer.buffer_effects, audio.frame_rate, int(audio.frame_count()))
+                    return mix_stems([mixer._planned_stem("vocals.wav", audio, plan)])
+                self._measure(stages, "buffer", buffer_mix)
+            results.append({"effect": name, "calls": len(calls), "stages": stages})
+        return results
+
+    # --- Validation ---
+
+    def _golden_key(self, scenario, mode):
+        return f"{scenario}/{mode}/{self.seconds}s/{self.frame_rate}Hz/{self.sample_width * 8}bit/" \
+               f"{'stored' if self.stored else 'deflated'}"
+
+    def _compare(self, pcm, sample_width, reference_pcm, reference_width):
+        """
+        Returns the largest sample difference in LSB of the stem sample width (24-bit stems
+        are mixed as 32-bit samples), or None if the lengths differ.
+        """
+        if len(pcm) // sample_width != len(reference_pcm) // reference_width:
+            return None
+        samples = np.frombuffer(pcm, dtype=f"<i{sample_width}").astype(np.int64)
+        reference = np.frombuffer(reference_pcm, dtype=f"<i{reference_width}").astype(np.int64)
+        if sample_width > reference_width:
+            reference <<= 8 * (sample_width - reference_width)
+        if not samples.size:
+            return 0
+        lsb = 1 << 8 * max(sample_width - self.sample_width, 0)
+        return -(-int(np.max(np.abs(samples - reference))) // lsb)
+
+    # --- Run ---
+
+    def run(self, update_golden=False):
+        """
+        Generates the tracks, benchmarks every scenario in every mode and every effect module,
+        validates the mixed PCM, logs a summary and writes the JSON report.
+
+        Args:
+            update_golden (bool): If True, the current PCM hashes become the new golden hashes
+                                  (run this with a trusted build).
+
+        Returns:
+            dict: The report. report["passed"] is False if any check failed.
+        """
+        self.log_manager.log("important", "=" * 40)
+        self.log_manager.log("important", "🚀 Starting MixTracks Benchmark")
+        self.log_manager.log("important", f"Modes: {', '.join(self.modes)}")
+        self.log_manager.log("important", f"Scenarios: {', '.join(self.scenarios)}")
+        self.log_manager.log("important", "=" * 40)
+
+        track_json_paths = self.generate_tracks()
+        golden = {}
+        if os.path.exists(self.golden_path):
+            with open(self.golden_path, "r", encoding="utf-8") as f:
+                golden = json.load(f)
+
+        report = {
+            "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                            "platform": platform.platform(), "cpu_count": os.cpu_count()},
+            "parameters": {"seconds": self.seconds, "frame_rate": self.frame_rate,
+                           "sample_width": self.sample_width, "stored": self.stored,
+                           "tolerance_lsb": self.tolerance_lsb},
+            "tracks": [],
+            "effects": [],
+            "passed": True,
+        }
+
+        reference = {}  # scenario -> (pcm, sample_width) of the pydub engine
+        for mode in self.modes:
+            mixer = self._create_mixer(mode)
+            for scenario, track_json_path in track_json_paths.items():
+                self.log_manager.log("normal", f"\n▶️ {scenario} / {mode}")
+                try:
+                    result, pcm = self.benchmark_track(mixer, mode, scenario, track_json_path)
+                except NotStreamableError as e:
+                    self.log_manager.log("normal", f"    ⏭️ Not streamable ({e}), skipped")
+                    report["tracks"].append({"scenario": scenario, "mode": mode, "skipped": str(e)})
+                    continue
+                except Exception as e:
+                    self.log_manager.log("important", f"❌ {scenario} / {mode} failed: {e}")
+                    report["tracks"].append({"scenario": scenario, "mode": mode, "error": str(e)})
+                    report["passed"] = False
+                    continue
+
+                # Golden hash
+                key = self._golden_key(scenario, mode)
+                if update_golden:
+                    golden[key] = result["pcm_sha256"]
+                    result["golden"] = "updated"
+                elif key not in golden:
+                    result["golden"] = "missing"
+                else:
+                    result["golden"] = "ok" if golden[key] == result["pcm_sha256"] else "changed"
+                    if result["golden"] == "changed":
+                        report["passed"] = False
+
+                # Tolerance against the pydub engine
+                sample_width = result["format"]["sample_width"]
+                if mode == "pydub":
+                    reference[scenario] = (pcm, sample_width)
+                elif scenario in reference and self.scenarios[scenario]["compare"]:
+                    reference_pcm, reference_width = reference[scenario]
+                    max_diff = self._compare(pcm, sample_width, reference_pcm, reference_width)
+                    result["max_diff_lsb"] = max_diff
+                    result["within_tolerance"] = max_diff is not None \
+                        and max_diff <= self.tolerance_lsb * len(EXPECTED_STEMS)
+                    if not result["within_tolerance"]:
+                        report["passed"] = False
+
+                self._log_track_result(result)
+                report["tracks"].append(result)
+
+        self.log_manager.log("normal", "\n▶️ Effect modules")
+        report["effects"] = self.benchmark_effects()
+        for effect_result in report["effects"]:
+            timings = ", ".join(f"{stage} {values['seconds']:.3f} s ({values['throughput']}x)"
+                                for stage, values in effect_result["stages"].items())
+            self.log_manager.log("normal", f"    {effect_result['effect']:<14} {timings}")
+
+        if update_golden:
+            os.makedirs(os.path.dirname(self.golden_path), exist_ok=True)
+            with open(self.golden_path, "w", encoding="utf-8") as f:
+                json.dump(golden, f, indent=4, sort_keys=True)
+            self.log_manager.log("important", f"💾 Golden hashes updated: {self.golden_path}")
+
+        report_path = os.path.join(self.benchmark_folder, REPORT_FILE)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+        self.log_manager.log("important", "=" * 40)
+        self.log_manager.log("important", "🏁 Benchmark Complete" + (" ✅ all checks passed" if report["passed"] else " ❌ checks failed"))
+        self.log_manager.log("important", f"📄 Report: {report_path}")
+        self.log_manager.log("important", "=" * 40)
+        return report
+
+    def _log_track_result(self, result):
+        stages = result["stages"]
+        total = sum(values["seconds"] for stage, values in stages.items() if stage != "end_to_end")
+        peak = max((values["peak_rss_mb"] or 0) for values in stages.values())
+        timings = ", ".join(f"{stage} {values['seconds']:.3f} s" for stage, values in stages.items())
+        self.log_manager.log("normal", f"    ⏱️ {timings}")
+        checks = f"golden {result['golden']}"
+        if "within_tolerance" in result:
+            checks += f", vs pydub {'ok' if result['within_tolerance'] else 'FAILED'} (max diff {result['max_diff_lsb']} LSB)"
+        self.log_manager.log("normal", f"    📊 stages {total:.3f} s ({self.seconds / total:.1f}x realtime), "
+                                       f"peak RSS {peak} MB, {checks}")
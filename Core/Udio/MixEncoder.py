@@ -0,0 +1,328 @@
+import os
+import subprocess
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pydub import AudioSegment
+try:
+    import lameenc
+except ImportError:  # optional, only needed by the "lameenc" encoder backend
+    lameenc = None
+
+# ffmpeg raw sample formats of pydub sample widths (the streaming mix writes signed samples)
+RAW_SAMPLE_FORMATS = {1: "s8", 2: "s16le", 4: "s32le"}
+DEFAULT_CODECS = {"ogg": "libvorbis"}  # same defaults as AudioSegment.export
+ENCODER_BACKENDS = ("ffmpeg", "lameenc")
+# lameenc encodes MP3 in-process, so it is the default when installed (no process start per output)
+DEFAULT_ENCODER_BACKEND = "lameenc" if lameenc is not None else "ffmpeg"
+DEFAULT_LAME_BITRATE = "192k"
+LAME_QUALITY = 2  # LAME -q 2, the quality ffmpeg's libmp3lame uses by default
+
+# One encoded file of a mix: path, container format (e.g. "mp3", "ogg") and bitrate (e.g. "192k")
+OutputTarget = namedtuple("OutputTarget", ["path", "format", "bitrate"])
+
+
+def encoder_command(output_path, frame_rate, channels, sample_width, format="mp3", bitrate=None, codec=None):
+    """
+    Builds the ffmpeg command that encodes raw PCM read from stdin. The output options
+    mirror AudioSegment.export, so a streamed mix encodes to the same file as an exported one.
+
+    Args:
+        output_path (str): Path of the encoded file.
+        frame_rate (int): Sample rate of the PCM data.
+        channels (int): Channel count of the PCM data.
+        sample_width (int): Sample width of the PCM data in bytes (1, 2 or 4).
+        format (str): Output container format, e.g. "mp3".
+        bitrate (str, optional): Output bitrate, e.g. "320k".
+        codec (str, optional): Output codec, defaults like AudioSegment.export.
+    """
+    command = [AudioSegment.converter, "-y", "-loglevel", "error",
+               "-f", RAW_SAMPLE_FORMATS[sample_width], "-ar", str(frame_rate), "-ac", str(channels),
+               "-i", "pipe:0"]
+    codec = codec or DEFAULT_CODECS.get(format)
+    if codec:
+        command += ["-acodec", codec]
+    if bitrate is not None:
+        command += ["-b:a", bitrate]
+    if sys.platform == "darwin" and codec == "mp3":
+        command += ["-write_xing", "0"]
+    command += ["-f", format, output_path]
+    return command
+
+
+class PipeEncoder:
+    """
+    Encodes raw PCM blocks with ffmpeg as they are produced, without an intermediate
+    WAV file. Use as a context manager: leaving the block normally finishes the file,
+    leaving it with an exception aborts the encoder. Like LameEncoder, ffmpeg writes to a
+    temp path that is renamed over the output only once the encode succeeded, so a crash
+    or a failed encode never leaves a truncated file (the previous output stays intact).
+    """
+    def __init__(self, output_path, frame_rate, channels, sample_width, format="mp3", bitrate=None, codec=None):
+        """
+        Args:
+            See encoder_command().
+        """
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"  # the explicit "-f format" lets ffmpeg ignore the extension
+        self.command = encoder_command(self.temp_path, frame_rate, channels, sample_width, format, bitrate, codec)
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def started(self):
+        """True while the encoder is running."""
+        return self.process is not None
+
+    def write(self, pcm):
+        """Feeds a block of raw PCM data (bytes-like) to the encoder."""
+        try:
+            self.process.stdin.write(pcm)
+        except BrokenPipeError:
+            self.close()  # ffmpeg died, close() raises with its error message
+            raise
+
+    def close(self):
+        """
+        Finishes the encoded file.
+
+        Raises:
+            RuntimeError: If ffmpeg failed.
+        """
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        error = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            _remove_file(self.temp_path)
+            raise RuntimeError(f"ffmpeg failed with code {process.returncode}: {error.decode(errors='replace').strip()}")
+        os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        """Stops the encoder and removes the unfinished file."""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.kill()
+        process.wait()
+        for pipe in (process.stdin, process.stderr):
+            try:
+                pipe.close()
+            except (BrokenPipeError, OSError):
+                pass
+        _remove_file(self.temp_path)
+
+
+class LameEncoder:
+    """
+    Encodes 16-bit PCM blocks to MP3 inside this process with LAME (lameenc), so no
+    encoder process is started per file. Same interface as PipeEncoder. The file is
+    written to a temp path and renamed when finished, so an aborted encode leaves nothing.
+    """
+    def __init__(self, output_path, frame_rate, channels, bitrate=None):
+        """
+        Args:
+            output_path (str): Path of the MP3 file.
+            frame_rate (int): Sample rate of the PCM data.
+            channels (int): Channel count of the PCM data (1 or 2).
+            bitrate (str, optional): Output bitrate, e.g. "320k".
+        """
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"
+        self.encoder = lameenc.Encoder()
+        self.encoder.set_in_sample_rate(frame_rate)
+        self.encoder.set_channels(channels)
+        self.encoder.set_bit_rate(int(str(bitrate or DEFAULT_LAME_BITRATE).lower().rstrip("k")))
+        self.encoder.set_quality(LAME_QUALITY)
+        self.file = None
+
+    @staticmethod
+    def supports(format, sample_width, channels):
+        """Returns True if lameenc is installed and can encode this target (MP3 from 16-bit mono/stereo PCM)."""
+        return lameenc is not None and format == "mp3" and sample_width == 2 and channels in (1, 2)
+
+    def __enter__(self):
+        self.file = open(self.temp_path, "wb")
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, pcm):
+        """Encodes a block of raw PCM data (bytes-like) and writes the MP3 frames produced so far."""
+        self.file.write(self.encoder.encode(bytes(pcm)))
+
+    def close(self):
+        """Flushes the encoder and finishes the file."""
+        if self.file is None:
+            return
+        file, self.file = self.file, None
+        try:
+            file.write(self.encoder.flush())
+        except Exception:
+            file.close()
+            _remove_file(self.temp_path)
+            raise
+        file.close()
+        os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        """Stops encoding and removes the unfinished file."""
+        if self.file is None:
+            return
+        file, self.file = self.file, None
+        file.close()
+        _remove_file(self.temp_path)
+
+    @property
+    def started(self):
+        """True while the encoder is running."""
+        return self.file is not None
+
+
+def uses_lame(target, channels, sample_width, backend):
+    """True if open_encoder() encodes the target in-process with LAME instead of starting ffmpeg."""
+    return backend == "lameenc" and LameEncoder.supports(target.format, sample_width, channels)
+
+
+def encoder_processes(targets, channels, sample_width, backend="ffmpeg"):
+    """Returns the number of ffmpeg processes started to encode the targets (one per target lameenc can't encode)."""
+    return sum(1 for target in targets if not uses_lame(target, channels, sample_width, backend))
+
+
+def open_encoder(target, frame_rate, channels, sample_width, backend="ffmpeg"):
+    """
+    Returns the encoder of one OutputTarget: a LameEncoder if the "lameenc" backend is
+    selected and can encode the target, a PipeEncoder (ffmpeg) otherwise.
+    """
+    if uses_lame(target, channels, sample_width, backend):
+        return LameEncoder(target.path, frame_rate, channels, bitrate=target.bitrate)
+    return PipeEncoder(target.path, frame_rate, channels, sample_width,
+                       format=target.format, bitrate=target.bitrate)
+
+
+class MultiEncoder:
+    """
+    Encodes the same PCM blocks into several targets at once, one ffmpeg process per
+    target, so all encodes run in parallel from a single mix pass. Use as a context
+    manager like PipeEncoder; a failed encode leaves the previous file of its target untouched.
+    """
+    def __init__(self, targets, frame_rate, channels, sample_width, backend="ffmpeg"):
+        """
+        Args:
+            targets (list[OutputTarget]): Files to encode.
+            frame_rate (int): Sample rate of the PCM data.
+            channels (int): Channel count of the PCM data.
+            sample_width (int): Sample width of the PCM data in bytes (1, 2 or 4).
+            backend (str): Encoder backend, see open_encoder().
+        """
+        self.targets = targets
+        self.encoders = [open_encoder(target, frame_rate, channels, sample_width, backend)
+                         for target in targets]
+
+    def __enter__(self):
+        try:
+            for encoder in self.encoders:
+                encoder.__enter__()
+        except Exception:
+            self.abort()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, pcm):
+        """Feeds a block of raw PCM data to every encoder."""
+        for encoder in self.encoders:
+            encoder.write(pcm)
+
+    def close(self):
+        """
+        Finishes all files.
+
+        Raises:
+            RuntimeError: If any encoder failed (its unfinished file is removed).
+        """
+        errors = []
+        for target, encoder in zip(self.targets, self.encoders):
+            try:
+                encoder.close()
+            except Exception as e:
+                errors.append(f"{os.path.basename(target.path)}: {e}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def abort(self):
+        """Stops all encoders and removes their unfinished files."""
+        for encoder in self.encoders:
+            encoder.abort()
+
+
+class EncoderPool:
+    """
+    Persistent encoder worker threads, reused for every track of a batch (and across watch
+    mode mixes) instead of starting a new thread pool per track. Each target of a track is
+    encoded by one worker thread. Only the threads are pooled: with the "ffmpeg" backend
+    each thread still starts a new ffmpeg process for every target of every track and feeds
+    the PCM to it through its stdin. With "lameenc" MP3 targets are encoded in-process, so
+    no encoder process is started for them.
+    """
+    def __init__(self, backend="ffmpeg", max_workers=None):
+        """
+        Args:
+            backend (str): "ffmpeg" or "lameenc" (targets lameenc can't encode use ffmpeg).
+            max_workers (int, optional): Number of worker threads. Defaults to ThreadPoolExecutor's default.
+        """
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="MixEncoder")
+
+    def _encode(self, pcm, frame_rate, channels, sample_width, target):
+        with open_encoder(target, frame_rate, channels, sample_width, self.backend) as encoder:
+            encoder.write(pcm)
+
+    def encode(self, pcm, frame_rate, channels, sample_width, targets):
+        """
+        Encodes one block of PCM data (e.g. a whole mix) into every target, in parallel.
+
+        Returns:
+            dict: OutputTarget -> None on success or the exception that made its encode fail
+                  (a failed encode leaves the previous file of its target untouched).
+        """
+        futures = {target: self.executor.submit(self._encode, pcm, frame_rate, channels, sample_width, target)
+                   for target in targets}
+        return {target: future.exception() for target, future in futures.items()}
+
+    def shutdown(self):
+        """Stops the worker threads once the queued encodes are done."""
+        self.executor.shutdown(wait=True)
+
+
+def _remove_file(path):
+    """Removes a partially written (temp) file, if any."""
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
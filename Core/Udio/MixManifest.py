@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Returns the SHA-1 hex digest of a file, read in chunks so large ZIPs never sit in memory."""
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def hash_effect_sources(effects_path):
+    """Returns one hash covering every Effects/*.py source, so editing any effect invalidates all tracks."""
+    sha1 = hashlib.sha1()
+    if os.path.isdir(effects_path):
+        for filename in sorted(os.listdir(effects_path)):
+            if filename.lower().endswith(".py"):
+                sha1.update(filename.encode("utf-8"))
+                with open(os.path.join(effects_path, filename), "rb") as f:
+                    sha1.update(f.read())
+    return sha1.hexdigest()
+
+
+class MixManifest:
+    """
+    Persistent record of the fingerprint every track was last mixed with.
+    A fingerprint covers the effective 'mix' config (after mix_override), the source ZIP
+    (size, mtime and content hash), the Effects sources and the bitrate. A track whose
+    fingerprint matches and whose output exists doesn't need to be mixed again.
+    """
+    def __init__(self, manifest_path, project_root, log_manager):
+        """
+        Initializes the manifest and loads it from disk if it exists.
+
+        Args:
+            manifest_path (str | None): Absolute path of the manifest JSON file, or None for an in-memory
+                                        manifest that is never loaded or saved (e.g. in a worker process).
+            project_root (str): Project root, track paths are stored relative to it.
+            log_manager (LogManager): Logger of the owning module.
+        """
+        self.manifest_path = manifest_path
+        self.project_root = project_root
+        self.log_manager = log_manager
+        self.tracks = {}
+        self.load()
+
+    def load(self):
+        """Loads the manifest. A missing or unreadable manifest is treated as empty."""
+        self.tracks = {}
+        if self.manifest_path is None or not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.tracks = data.get("tracks", {})
+            else:
+                self.log_manager.log("normal", f"⚠️ Mix manifest version changed, rebuilding: {self.manifest_path}")
+        except Exception as e:
+            self.log_manager.log("important", f"⚠️ Could not read mix manifest {self.manifest_path}, rebuilding: {e}")
+
+    def save(self):
+        """Writes the manifest atomically (temp file + rename) so an interrupted run never corrupts it."""
+        if self.manifest_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            temp_path = self.manifest_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "tracks": self.tracks}, f, indent=4)
+            os.replace(temp_path, self.manifest_path)
+        except Exception as e:
+            self.log_manager.log("important", f"❌ Error writing mix manifest {self.manifest_path}: {e}")
+
+    def _key(self, track_json_path):
+        return os.path.relpath(track_json_path, self.project_root).replace("\\", "/")
+
+    def zip_state(self, track_json_path, zip_path):
+        """
+        Returns {"size", "mtime", "hash"} of the source ZIP. The stored hash is reused
+        when size and mtime are unchanged, so unchanged ZIPs are never read again.
+        """
+        stat = os.stat(zip_path)
+        previous = self.tracks.get(self._key(track_json_path), {}).get("zip", {})
+        if previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns and previous.get("hash"):
+            zip_hash = previous["hash"]
+        else:
+            zip_hash = hash_file(zip_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": zip_hash}
+
+    @staticmethod
+    def fingerprint(mix_config, zip_state, effects_hash, bitrate, engine=None, limiter=None, encoder=None):
+        """
+        Builds the fingerprint of one track from everything that influences its mix: the
+        track's mix config, its ZIP, the effect sources, the bitrate and the mix engine,
+        limiter and encoder backend it is rendered with.
+        """
+        payload = json.dumps({
+            "mix": mix_config,
+            "zip": zip_state,
+            "effects": effects_hash,
+            "bitrate": bitrate,
+            "engine": engine,
+            "limiter": limiter,
+            "encoder": encoder,
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, track_json_path, fingerprint):
+        """Returns True if the track was last mixed with exactly this fingerprint."""
+        return self.tracks.get(self._key(track_json_path), {}).get("fingerprint") == fingerprint
+
+    def get_entry(self, track_json_path):
+        """Returns the stored entry of a track (or None)."""
+        return self.tracks.get(self._key(track_json_path))
+
+    def set_entry(self, track_json_path, entry):
+        """Stores an entry produced by record() or get_entry(), e.g. one returned by a worker process."""
+        if entry:
+            self.tracks[self._key(track_json_path)] = entry
+
+    def record(self, track_json_path, fingerprint, zip_state):
+        """Remembers the fingerprint a track was successfully mixed with."""
+        self.tracks[self._key(track_json_path)] = {"fingerprint": fingerprint, "zip": zip_state}
@@ -0,0 +1,124 @@
+from Core.Udio.ZipStemReader import ZipStemReader, UnsupportedWavError
+try:
+    import psutil
+except ImportError:  # optional, without it available memory is read from /proc/meminfo (Linux) or unknown
+    psutil = None
+
+# Peak memory of a mix relative to the decoded PCM of its stems, measured on a 3-minute
+# stereo track (decoded stems, effect copies, merged mix and encoder input)
+MEMORY_FACTORS = {"pydub": 2.5, "numpy": 2.0}
+STREAM_BLOCK_COPIES = 8  # float32 blocks alive at once per stem in streaming mode (reads, effects, mix, encode)
+WORKER_BASE_MEMORY = 40 * 1024 * 1024  # a worker process with pydub, NumPy and the effects loaded
+DEFAULT_BUDGET_FRACTION = 0.8  # share of the available memory used when no budget is configured
+
+
+def available_memory():
+    """Returns the memory available to new processes in bytes, or None if it can't be determined."""
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def decoded_stem_sizes(zip_path, stem_names):
+    """
+    Returns the size in bytes each stem takes once decoded, read from the WAV headers
+    (only the first bytes of each member are inflated). 24-bit samples are held as 32-bit
+    like pydub does; WAV flavours pydub decodes itself (e.g. float) count as their file size.
+
+    Returns:
+        list[tuple[int, int]]: (decoded bytes, channels) per stem found in the archive.
+    """
+    sizes = []
+    with ZipStemReader(zip_path) as zip_reader:
+        for name in stem_names:
+            if not zip_reader.has_member(name):
+                continue
+            member_size = zip_reader.member_size(name)
+            try:
+                stream = zip_reader.open_pcm_stream(name)
+            except UnsupportedWavError:
+                sizes.append((member_size, 2))
+                continue
+            stream.close()
+            wav_format = stream.format
+            # Streamed WAVs may declare a bogus data size, the member can't hold more than its size
+            frames = min(stream.frame_count, member_size // stream.frame_width)
+            held_width = 4 if wav_format.sample_width == 3 else wav_format.sample_width
+            sizes.append((frames * wav_format.channels * held_width, wav_format.channels))
+    return sizes
+
+
+def estimate_mix_memory(stem_sizes, mix_engine, stream_block_frames=None):
+    """
+    Estimates the peak memory of mixing one track, on top of the worker's own memory.
+
+    Args:
+        stem_sizes (list[tuple[int, int]]): Result of decoded_stem_sizes().
+        mix_engine (str): "pydub" or "numpy".
+        stream_block_frames (int, optional): Block size if the track is streamed; memory then
+                                             depends on the block size, not the track length.
+    """
+    if stream_block_frames:
+        return sum(stream_block_frames * channels * 4 * STREAM_BLOCK_COPIES for _, channels in stem_sizes)
+    return int(sum(size for size, _ in stem_sizes) * MEMORY_FACTORS.get(mix_engine, max(MEMORY_FACTORS.values())))
+
+
+class MixScheduler:
+    """
+    Admission control of parallel mode. Jobs (tracks) are started largest first, so the
+    longest mixes don't end up alone at the end of the batch, and a job is only started
+    while the estimated memory of all running jobs fits the budget. When the next job
+    doesn't fit, smaller queued jobs that do fit are started instead (first fit), and a
+    job larger than the whole budget still runs, alone.
+    """
+    def __init__(self, job_memory, max_running, budget=None):
+        """
+        Args:
+            job_memory (dict): job -> estimated memory in bytes.
+            max_running (int): Maximum number of jobs running at once (the worker count).
+            budget (int, optional): Memory budget in bytes for all running jobs. None disables
+                                    admission control (jobs are only ordered).
+        """
+        self.job_memory = job_memory
+        self.max_running = max_running
+        self.budget = budget
+        # Largest first; ties keep a stable, path-sorted order
+        self.queue = sorted(job_memory, key=lambda job: (-job_memory[job], job))
+        self.running = set()
+        self.memory_in_use = 0
+
+    @property
+    def done(self):
+        """True once every job was started and released."""
+        return not self.queue and not self.running
+
+    def _fits(self, job):
+        if self.budget is None or not self.running:
+            return True
+        return self.memory_in_use + self.job_memory[job] <= self.budget
+
+    def admit(self):
+        """Returns the queued jobs to start now (possibly none) and marks them as running."""
+        started = []
+        for job in list(self.queue):
+            if len(self.running) >= self.max_running:
+                break
+            if self._fits(job):
+                self.queue.remove(job)
+                self.running.add(job)
+                self.memory_in_use += self.job_memory[job]
+                started.append(job)
+        return started
+
+    def release(self, job):
+        """Marks a running job as finished, freeing its memory."""
+        if job in self.running:
+            self.running.remove(job)
+            self.memory_in_use -= self.job_memory[job]
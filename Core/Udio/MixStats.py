@@ -0,0 +1,116 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+
+MIX_REPORT_VERSION = 1
+
+
+class MixStats:
+    """
+    Timing and I/O counters of one track mix. Stages (e.g. "zip_read", "decode",
+    "merge", "encode") accumulate wall time over every time they run; effects are
+    timed per effect name. Bytes are counted per kind (e.g. "zip", "output"), so the
+    report can tell reading from the ZIP apart from reading the stem cache.
+    Counters count events per name (e.g. "encoder_processes" started for the track).
+    """
+    def __init__(self):
+        self.stages = {}  # stage name -> seconds
+        self.effects = {}  # effect name -> {"calls": int, "seconds": float}
+        self.bytes_read = {}  # kind -> bytes
+        self.bytes_written = {}  # kind -> bytes
+        self.counters = {}  # name -> count
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager adding the wall time of its block to the stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        """Adds `seconds` to the stage `name`."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_effect_time(self, name, seconds):
+        """Records one call of the effect `name` that took `seconds`."""
+        entry = self.effects.setdefault(name, {"calls": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+
+    def add_read(self, kind, size):
+        """Counts `size` bytes read from `kind` (e.g. "zip", "stem_cache")."""
+        self.bytes_read[kind] = self.bytes_read.get(kind, 0) + size
+
+    def add_written(self, kind, size):
+        """Counts `size` bytes written to `kind` (e.g. "output", "stem_cache")."""
+        self.bytes_written[kind] = self.bytes_written.get(kind, 0) + size
+
+    def add_count(self, name, count=1):
+        """Adds `count` to the counter `name` (e.g. "encoder_processes")."""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def to_dict(self):
+        """Returns the counters as a JSON-serializable dict (times rounded to microseconds)."""
+        return {
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "effects": {name: {"calls": entry["calls"], "seconds": round(entry["seconds"], 6)}
+                        for name, entry in self.effects.items()},
+            "bytes_read": dict(self.bytes_read),
+            "bytes_written": dict(self.bytes_written),
+            "counters": dict(self.counters),
+        }
+
+
+def summarize_track_stats(tracks):
+    """
+    Sums the stats of several tracks.
+
+    Args:
+        tracks (list[dict]): Track entries of a run report (MixStats.to_dict() plus "total_seconds").
+
+    Returns:
+        dict: Totals of every stage, effect, byte and event counter, plus the slowest tracks.
+    """
+    totals = MixStats()
+    for track in tracks:
+        for name, seconds in track.get("stages", {}).items():
+            totals.add_time(name, seconds)
+        for name, entry in track.get("effects", {}).items():
+            total_entry = totals.effects.setdefault(name, {"calls": 0, "seconds": 0.0})
+            total_entry["calls"] += entry["calls"]
+            total_entry["seconds"] += entry["seconds"]
+        for kind, size in track.get("bytes_read", {}).items():
+            totals.add_read(kind, size)
+        for kind, size in track.get("bytes_written", {}).items():
+            totals.add_written(kind, size)
+        for name, count in track.get("counters", {}).items():
+            totals.add_count(name, count)
+    summary = totals.to_dict()
+    summary["track_seconds"] = round(sum(track.get("total_seconds", 0.0) for track in tracks), 6)
+    slowest = sorted(tracks, key=lambda track: track.get("total_seconds", 0.0), reverse=True)[:5]
+    summary["slowest_tracks"] = [{"track": track["track"], "total_seconds": track["total_seconds"]} for track in slowest]
+    return summary
+
+
+def write_run_report(report_path, report, history_path=None):
+    """
+    Writes a run report as JSON (replacing the previous one) and optionally appends
+    a one-line summary of it to a JSON Lines history file, so batch performance can
+    be compared across runs.
+    """
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    temp_path = report_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    os.replace(temp_path, report_path)
+
+    if history_path:
+        entry = {key: report[key] for key in ("started", "duration_seconds", "settings", "counts")}
+        entry["stages"] = report["totals"]["stages"]
+        entry["bytes_read"] = report["totals"]["bytes_read"]
+        entry["bytes_written"] = report["totals"]["bytes_written"]
+        with open(history_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
@@ -1,11 +1,11 @@
 import os
+import re
+import time
 import zipfile
 import json
-import shutil
 import importlib.util
-import tempfile
 import traceback
-from pydub import AudioSegment
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
 import sys
 from fnmatch import fnmatch
 
@@ -13,19 +13,58 @@ from fnmatch import fnmatch
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from Core.ConfigManager import ConfigManager
 from Core.LogManager import LogManager
+from Core.Udio.MixManifest import MixManifest, hash_effect_sources
+from Core.Udio.ZipStemReader import ZipStemReader, UnsupportedWavError, decode_wav
+from Core.Udio.MixStats import MixStats, MIX_REPORT_VERSION, summarize_track_stats, write_run_report
+from Core.Udio.MixEncoder import (OutputTarget, MultiEncoder, EncoderPool, ENCODER_BACKENDS, DEFAULT_ENCODER_BACKEND,
+                                  encoder_processes, lameenc)
+from Core.Udio.TrackWatcher import TrackWatcher
+from Core.Udio.BufferEffect import BufferEffect
+from Core.Udio.TrackCatalog import TrackCatalog, SIDECAR_SUFFIXES
+from Core.Udio.RunJournal import RunJournal
+from Core.Udio.MixScheduler import (MixScheduler, available_memory, decoded_stem_sizes, estimate_mix_memory,
+                                    WORKER_BASE_MEMORY, DEFAULT_BUDGET_FRACTION)
+try:
+    from Core.Udio.MixEngine import (MixStem, mix_stems, StreamStem, StreamMix, segment_samples, segment_to_array,
+                                     raw_samples, apply_gain, full_scale)
+    from Core.Udio.EffectCompiler import plan_effects
+    from Core.Udio.StemCache import StemCache
+    from Core.Udio.LoudnessMeter import LoudnessMeter, normalization_gain
+except ImportError:  # NumPy is optional, only needed by the "numpy" mix engine, streaming mode, the stem cache and analysis
+    mix_stems = None
+    StemCache = None
+    LoudnessMeter = None
 
 # --- Script Configuration ---
 EXPECTED_STEMS = ["bass.wav", "drums.wav", "other.wav", "vocals.wav"]
 DEFAULT_BITRATE = "192k"
+DEFAULT_FORMAT = "mp3"
+DEFAULT_CACHE_FOLDER = "Temp/Udio"
+MIX_MANIFEST_FILE = "mix_manifest.json"
+MIX_REPORT_FILE = "mix_report.json"
+MIX_REPORT_HISTORY_FILE = "mix_report_history.jsonl"
+MIX_JOURNAL_FILE = "mix_journal.jsonl"
+DEFAULT_STEM_CACHE_MAX_MB = 0  # opt-in: the decoded PCM is ~10x the ZIP, so nothing is written unless a budget is set
+MIX_ENGINES = ("pydub", "numpy")
+DEFAULT_STREAM_BLOCK_FRAMES = 1 << 16
+ANALYSIS_MODES = ("track_json", "sidecar", "off")
+DEFAULT_TRUE_PEAK_LIMIT = -1.0  # dBTP ceiling of loudness normalization
 
 class MixTracks:
     """
     Processes track configurations from JSON files, mixes audio stems from
     associated ZIP archives, applies defined effects, and exports the final
-    mix as an MP3. Supports overriding mix parameters via a dictionary
+    mix as an MP3 (or several files of different formats and bitrates, all
+    encoded from one mix). Supports overriding mix parameters via a dictionary
     and skipping tracks based on configuration.
+    Tracks can optionally be mixed in parallel across a process pool, and tracks
+    whose inputs didn't change since their last mix are skipped.
+    Every track is timed per stage and per effect (see MixStats); run() writes the
+    timings with the summary counts to a JSON run report.
     """
-    def __init__(self, look_folders, global_log_level=None, mix_override=None):
+    def __init__(self, look_folders, global_log_level=None, mix_override=None, parallel=False, workers=None,
+                 force=False, mix_engine=None, streaming=None, preview=None, encoder=None,
+                 resume=False, retry_failed=False, memory_budget_mb=None, worker=False):
         """
         Initializes the MixTracks processor.
 
@@ -37,10 +76,61 @@ class MixTracks:
             mix_override (dict, optional): A dictionary to override 'mix' section values in the JSON.
                                            Can include "target_wildcard" (list of glob patterns)
                                            and "json" (dictionary of override values).
+            parallel (bool, optional): If True, run() spreads tracks across a process pool.
+                                       Defaults to False (tracks are mixed one after another).
+            workers (int, optional): Number of worker processes used in parallel mode.
+                                     Defaults to the "mix_workers" config value or the CPU count.
+            force (bool, optional): If True, every track is mixed again even if the mix manifest
+                                    says it is up to date. Defaults to False.
+            mix_engine (str, optional): "pydub" merges stems with a chain of AudioSegment.overlay calls,
+                                        "numpy" sums all stems in one vectorized pass (requires NumPy).
+                                        Defaults to the "mix_engine" config value or "pydub".
+            streaming (bool, optional): If True, stems are read, mixed and encoded block by block, so memory
+                                        use doesn't grow with the track length (requires NumPy). Tracks that
+                                        can't be streamed use the regular mix. Defaults to the
+                                        "mix_streaming" config value or False.
+            preview (dict, optional): Renders a quick preview WAV of a time window instead of the final
+                                      outputs, with the same 'mix' config and effects. Keys: "start_time"
+                                      and "end_time" (ms, default: whole track), "frame_rate" (e.g. 22050,
+                                      default: original rate) and "mono" (bool). Previews are written
+                                      next to the track as '<output name>.preview.wav'.
+            encoder (str, optional): "ffmpeg" pipes the PCM into an ffmpeg process per output,
+                                     "lameenc" encodes MP3 outputs in-process (requires lameenc).
+                                     Defaults to the "mix_encoder" config value, else "lameenc" if it is
+                                     installed and "ffmpeg" otherwise.
+            resume (bool, optional): If True, run() continues the last journaled run that didn't finish
+                                     (e.g. it crashed or was killed) with the tracks it never completed,
+                                     instead of starting over. Defaults to False.
+            retry_failed (bool, optional): If True, run() processes the tracks whose mix failed in the last
+                                           journaled run (combined with resume: failed and never completed
+                                           tracks). Defaults to False.
+            memory_budget_mb (int, optional): Memory in MB that the tracks mixed at once in parallel mode
+                                              may use together, estimated from their decoded stem sizes.
+                                              Defaults to the "mix_memory_budget_mb" config value or 80%
+                                              of the available memory.
+            worker (bool, optional): True inside a parallel mode worker process. Workers only mix: the
+                                     parent owns the mix manifest, run journal and track catalog, so
+                                     they get an in-memory manifest and no journal or catalog.
         """
         self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
         self.look_folders = [os.path.join(self.project_root, folder) for folder in look_folders]
         self.mix_override = mix_override  # Store the mix override
+        self.parallel = parallel
+        self.force = force
+        self.preview = preview
+        self.resume = resume
+        self.retry_failed = retry_failed
+        # Constructor arguments, used to build an identical MixTracks inside each worker process
+        self._worker_init_args = {
+            "look_folders": look_folders,
+            "global_log_level": global_log_level,
+            "mix_override": mix_override,
+            "force": force,
+            "mix_engine": mix_engine,
+            "streaming": streaming,
+            "preview": preview,
+            "encoder": encoder,
+        }
 
         # Initialize ConfigManager
         self.config_manager = ConfigManager()
@@ -51,29 +141,106 @@ class MixTracks:
         if global_log_level != None:
             self.log_manager.globalLogLevel = global_log_level
 
+        self.workers = workers or self.config.get("mix_workers") or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb or self.config.get("mix_memory_budget_mb")
+
+        self.mix_engine = mix_engine or self.config.get("mix_engine", "pydub")
+        self.mix_limiter = self.config.get("mix_limiter", "clip")
+        if self.mix_engine not in MIX_ENGINES:
+            self.log_manager.log("important", f"⚠️ Unknown mix engine '{self.mix_engine}', using 'pydub'.")
+            self.mix_engine = "pydub"
+        if self.mix_engine == "numpy" and mix_stems is None:
+            self.log_manager.log("important", "⚠️ Mix engine 'numpy' requires NumPy, which is not installed. Using 'pydub'.")
+            self.mix_engine = "pydub"
+
+        self.streaming = streaming if streaming is not None else self.config.get("mix_streaming", False)
+        self.stream_block_frames = self.config.get("mix_block_frames", DEFAULT_STREAM_BLOCK_FRAMES)
+        if self.streaming and mix_stems is None:
+            self.log_manager.log("important", "⚠️ Streaming mode requires NumPy, which is not installed. Streaming disabled.")
+            self.streaming = False
+
+        self.encoder = encoder or self.config.get("mix_encoder", DEFAULT_ENCODER_BACKEND)
+        if self.encoder not in ENCODER_BACKENDS:
+            self.log_manager.log("important", f"⚠️ Unknown encoder '{self.encoder}', using 'ffmpeg'.")
+            self.encoder = "ffmpeg"
+        if self.encoder == "lameenc" and lameenc is None:
+            self.log_manager.log("important", "⚠️ Encoder 'lameenc' requires lameenc, which is not installed. Using 'ffmpeg'.")
+            self.encoder = "ffmpeg"
+        # Encoder worker threads, reused by every track; outputs lameenc doesn't encode still
+        # start one ffmpeg process per output of every track
+        self.encoder_pool = EncoderPool(self.encoder)
+
+        # Loudness/peak analysis of every mix, written into the track JSON or a sidecar file
+        self.analysis_mode = self.config.get("mix_analysis", "sidecar")
+        if self.analysis_mode not in ANALYSIS_MODES:
+            self.log_manager.log("important", f"⚠️ Unknown mix_analysis '{self.analysis_mode}', using 'sidecar'.")
+            self.analysis_mode = "sidecar"
+        if self.analysis_mode != "off" and LoudnessMeter is None:
+            self.log_manager.log("normal", "ℹ️ Mix analysis requires NumPy, which is not installed. Analysis disabled.")
+            self.analysis_mode = "off"
+
         # Effects path, relative to the current script's directory
         self.effects_path = os.path.join(os.path.dirname(__file__), "Effects")
-        self.effects = self._load_effects()
+        self.reload_effects()
+
+        # Manifest of track fingerprints, used to skip tracks that are already up to date.
+        # A worker gets the entry of each track from the parent with the track (see _mix_track_in_worker)
+        self.cache_folder = os.path.join(self.project_root, self.config.get("udio_cache_folder", DEFAULT_CACHE_FOLDER))
+        self.manifest = MixManifest(None if worker else os.path.join(self.cache_folder, MIX_MANIFEST_FILE),
+                                    self.project_root, self.log_manager)
+
+        # Journal of the run in progress, so a run that dies can be resumed where it stopped
+        self.journal = None
+        # Catalog of the track folders shared with ExportTracks and AnalyzeTrackDB, so discovery doesn't walk them again
+        self.catalog = None
+        if not worker:
+            self.journal = RunJournal(os.path.join(self.project_root,
+                                                   self.config.get("mix_journal_file") or os.path.join(self.cache_folder, MIX_JOURNAL_FILE)),
+                                      self.project_root, self.log_manager)
+            self.catalog = TrackCatalog.from_config(self.project_root, self.config, self.log_manager)
+
+        # Stage timings of the track being mixed, and the report entry of the last mixed track
+        self.stats = MixStats()
+        self.last_track_stats = None
+        self.report_path = os.path.join(self.project_root,
+                                        self.config.get("mix_report_file") or os.path.join(self.cache_folder, MIX_REPORT_FILE))
+
+        # Cache of decoded stems, so re-mixing a track with new effect settings skips the ZIP entirely
+        self.stem_cache = None
+        stem_cache_max_mb = self.config.get("stem_cache_max_mb", DEFAULT_STEM_CACHE_MAX_MB)
+        if stem_cache_max_mb and StemCache is not None:
+            stem_cache_folder = self.config.get("stem_cache_folder") or os.path.join(self.cache_folder, "Stems")
+            self.stem_cache = StemCache(os.path.join(self.project_root, stem_cache_folder),
+                                        int(stem_cache_max_mb * 1024 * 1024), self.log_manager)
 
     def _find_track_json_files(self):
-        """Finds all track JSON files (e.g., 'Track Name 1.json') within the look_folders."""
-        json_files = []
+        """Finds all track JSON files (e.g., 'Track Name 1.json') within the look_folders, through the track catalog."""
         for folder in self.look_folders:
             if not os.path.isdir(folder):
                 self.log_manager.log("important", f"❌ Search folder not found: {folder}")
-                continue
-            self.log_manager.log("verbose", f"📂 Searching for tracks in: {folder}")
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    # Process any .json file, assuming it's a track config
-                    if file.lower().endswith(".json"):
-                        full_path = os.path.join(root, file)
-                        json_files.append(full_path)
-                        self.log_manager.log("verbose", f"    ✅ Mapped JSON: {full_path}")
+            else:
+                self.log_manager.log("verbose", f"📂 Searching for tracks in: {folder}")
+        self.catalog.refresh(self.look_folders)
+        # Process any .json file, assuming it's a track config
+        json_files = self.catalog.track_json_paths(self.look_folders)
+        for full_path in json_files:
+            self.log_manager.log("verbose", f"    ✅ Mapped JSON: {full_path}")
         return json_files
 
+    def reload_effects(self):
+        """(Re)loads all effect modules and the hash of their sources (used by watch mode after an edit)."""
+        self.effect_envelopes = {}  # compiled forms of effects, filled by _load_effects
+        self.buffer_effects = {}  # NumPy buffer forms of effects (BufferEffect), filled by _load_effects
+        self.effects = self._load_effects()
+        self.effects_hash = hash_effect_sources(self.effects_path)
+
     def _load_effects(self):
-        """Loads effect functions from Python files in the Effects directory."""
+        """
+        Loads effect functions from Python files in the Effects directory. A module declares
+        its AudioSegment effects in 'effect_name', and optionally envelope forms in
+        'effect_envelope' and NumPy buffer forms (BufferEffect) in 'effect_buffer'. Effects
+        that only have a buffer form get an AudioSegment adapter, so every mix path can run them.
+        """
         effects = {}
         if not os.path.isdir(self.effects_path):
             self.log_manager.log("important", f"❌ Effects directory not found: {self.effects_path}")
@@ -106,19 +273,65 @@ class MixTracks:
                         else:
                             self.log_manager.log("important",
                                                  f"⚠️ Effect module {filename} missing 'effect_name' dictionary or it's not a dictionary.")
+
+                        # Optional envelope forms of the effects, compiled by the numpy mix engine
+                        if isinstance(getattr(module, "effect_envelope", None), dict):
+                            for name, function in module.effect_envelope.items():
+                                if callable(function):
+                                    self.effect_envelopes[name] = function
+                                    self.log_manager.log("verbose", f"    ✅ Loaded envelope form of: '{name}' from {filename}")
+
+                        # Optional NumPy buffer forms, run without AudioSegment copies by the numpy mix engine
+                        if isinstance(getattr(module, "effect_buffer", None), dict):
+                            for name, effect in module.effect_buffer.items():
+                                if callable(effect):
+                                    effect = BufferEffect(effect)  # undeclared: copying, whole signal
+                                if not isinstance(effect, BufferEffect):
+                                    self.log_manager.log("important",
+                                                         f"⚠️ Item '{name}' in 'effect_buffer' from {filename} is not a BufferEffect.")
+                                    continue
+                                self.buffer_effects[name] = effect
+                                kind = "streamable" if effect.streamable else "whole signal"
+                                self.log_manager.log("verbose",
+                                                     f"    ✅ Loaded buffer form of: '{name}' from {filename} "
+                                                     f"({kind}{', in place' if effect.in_place else ''})")
                     else:
                         self.log_manager.log("important", f"⚠️ Could not create module spec for {filename}")
 
                 except Exception as e:
                     self.log_manager.log("important", f"❌ Error loading effect module {filename}: {e}\n{traceback.format_exc()}")
+        for name, effect in self.buffer_effects.items():
+            if name in effects:
+                continue
+            if mix_stems is None:
+                self.log_manager.log("important", f"⚠️ Effect '{name}' only has a NumPy buffer form and NumPy is not installed. Skipping.")
+                continue
+            effects[name] = effect.apply_segment
         self.log_manager.log("normal", f"✨ Loaded {len(effects)} effects: {', '.join(effects.keys())}")
         return effects
 
     def process_track(self, track_json_path):
         """
         Processes a single track based on its JSON configuration file.
-        Returns True on success, "ignored" if explicitly ignored, False on error.
+        Returns True on success, "ignored" if explicitly ignored, "up_to_date" if the
+        output already matches the track's fingerprint, False on error.
+        The stage timings of the track are kept in self.last_track_stats.
         """
+        self.stats = MixStats()
+        start_time = time.perf_counter()
+        try:
+            result = self._process_track(track_json_path)
+        finally:
+            total_seconds = time.perf_counter() - start_time
+            self.last_track_stats = dict(self.stats.to_dict(),
+                                         track=os.path.relpath(track_json_path, self.project_root),
+                                         result=None,
+                                         total_seconds=round(total_seconds, 6))
+        self.last_track_stats["result"] = _result_name(result)
+        return result
+
+    def _process_track(self, track_json_path):
+        """Mixes one track, see process_track()."""
         self.log_manager.log("normal", f"\n▶️ Processing track from JSON: {track_json_path}")
         config_file_dir = os.path.dirname(track_json_path)
 
@@ -143,26 +356,7 @@ class MixTracks:
             return False  # Treat as skippable failure
 
         # --- Apply Overrides ---
-        if self.mix_override:
-            # Check for target_wildcard
-            target_wildcards = self.mix_override.get("target_wildcard", [])
-            apply_override = False
-            if target_wildcards:
-                base_name = os.path.basename(track_json_path)
-                for wildcard in target_wildcards:
-                    if fnmatch(base_name, wildcard):
-                        self.log_manager.log("verbose", f"    ✅ Matched target_wildcard '{wildcard}' for {base_name}. Applying override.")
-                        apply_override = True
-                        break  # Apply only once if matched
-            else: # apply if no wildcards specified in override
-                 self.log_manager.log("verbose", f"    ✅ No target_wildcard specified in override. Applying override to {os.path.basename(track_json_path)}.")
-                 apply_override = True
-
-            if apply_override:
-                 # Use a copy to avoid modifying the original dictionary while iterating or updating
-                 override_json_data = self.mix_override.get("json", {}).copy()
-                 track_config.update(override_json_data) # Override the mix section
-
+        self._apply_mix_override(track_config, track_json_path)
 
         # --- Check Ignore Flag (after overrides) ---
         if track_config.get("ignore", False):
@@ -172,145 +366,776 @@ class MixTracks:
 
         # --- Get Paths and Parameters ---
         source_zip_name = track_config.get("source_path")
-        output_mp3_name = track_config.get("output_file")
         bitrate = track_config.get("bitrate", DEFAULT_BITRATE)
+        outputs = self._resolve_outputs(track_config, config_file_dir)
 
-        if not source_zip_name or not output_mp3_name:
+        if not source_zip_name or not outputs:
             self.log_manager.log("important",
-                            f"❌ Missing 'source_path' or 'output_file' in 'mix' section of {track_json_path}. Skipping.")
+                            f"❌ Missing 'source_path' or 'output_file'/'outputs' in 'mix' section of {track_json_path}. Skipping.")
             return False
 
         source_zip_path = os.path.join(config_file_dir, source_zip_name)
-        output_mp3_path = os.path.join(config_file_dir, output_mp3_name)
 
         if not os.path.exists(source_zip_path):
             self.log_manager.log("important", f"❌ Source ZIP file not found: {source_zip_path}")
             return False
 
+        # --- Check Fingerprint ---
+        try:
+            with self.stats.stage("fingerprint"):
+                zip_state = self.manifest.zip_state(track_json_path, source_zip_path)
+        except Exception as e:
+            self.log_manager.log("important", f"❌ Error reading source ZIP file {source_zip_path}: {e}")
+            return False
+
+        # --- Preview Mode ---
+        if self.preview is not None:
+            return self._render_preview(track_config, source_zip_path, source_zip_name, zip_state, outputs[0])
+
+        fingerprint = MixManifest.fingerprint(track_config, zip_state, self.effects_hash, bitrate,
+                                              self.mix_engine, self.mix_limiter, self.encoder)
+        if not self.force and self.manifest.is_up_to_date(track_json_path, fingerprint) \
+                and all(os.path.exists(output.path) for output in outputs):
+            self.log_manager.log("normal", f"⏩ Up to date, skipping: {', '.join(os.path.basename(output.path) for output in outputs)}")
+            return "up_to_date"
+
+        # --- Streaming Mode ---
+        # Loudness normalization needs the loudness of the whole mix before encoding, so it can't be streamed
+        if self.streaming and self._can_stream(track_config.get("effects", {})) and track_config.get("target_lufs") is None:
+            result = self._mix_streaming(source_zip_path, track_config.get("effects", {}), outputs, track_json_path)
+            if result is True:
+                self.manifest.record(track_json_path, fingerprint, zip_state)
+            if result is not None:
+                return result
+
         # --- Process Track ---
-        with tempfile.TemporaryDirectory(prefix="mix_") as temp_folder:
-            self.log_manager.log("verbose", f"    📦 Extracting {source_zip_name} to {temp_folder}")
+        track_data = self._load_stems(source_zip_path, source_zip_name, zip_state)
+        if track_data is None:
+            return False
+        stem_effects = self._collect_track_effects(track_config, track_data)
 
-            # Extract ZIP file
+        # Merge tracks
+        if self.mix_engine == "numpy":
+            self.log_manager.log("verbose", "    🔄 Merging loaded stems (numpy engine)...")
             try:
-                with zipfile.ZipFile(source_zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_folder)
-            except zipfile.BadZipFile:
-                self.log_manager.log("important", f"❌ Invalid ZIP file: {source_zip_path}")
+                merged_audio = self._mix_numpy(track_data, stem_effects)
+            except Exception as e:
+                self.log_manager.log("important", f"❌ Error merging stems: {e}\n{traceback.format_exc()}")
                 return False
+        else:
+            with self.stats.stage("effects"):
+                track_data = self._apply_stem_effects(track_data, stem_effects)
+
+            # Overlay method
+            self.log_manager.log("verbose", "    🔄 Merging loaded stems...")
+            try:
+                with self.stats.stage("merge"):
+                    merged_audio = self._overlay_stems(track_data)
+            except Exception as e:
+                self.log_manager.log("important", f"❌ Error overlaying stems: {e}")
+                return False  # Treat overlay error as fatal for this mix
+
+        # Analyze (and normalize) the merged buffer before it is encoded
+        if merged_audio and self.analysis_mode != "off":
+            try:
+                with self.stats.stage("analysis"):
+                    merged_audio, analysis = self._analyze_mix(merged_audio, track_config)
+                self._write_analysis(track_json_path, outputs, analysis)
             except Exception as e:
-                self.log_manager.log("important", f"❌ Error extracting ZIP file {source_zip_path}: {e}")
+                self.log_manager.log("important", f"❌ Error analyzing mix: {e}\n{traceback.format_exc()}")
                 return False
+        elif track_config.get("target_lufs") is not None:
+            self.log_manager.log("important", "⚠️ 'target_lufs' is ignored while mix analysis is off or NumPy is missing.")
 
-            # Load expected audio stems and check for missing ones
-            track_data = {}
-            loaded_stems = []
-            missing_stems = []
-            for stem_file in EXPECTED_STEMS:  # Use defined order
-                file_path = os.path.join(temp_folder, stem_file)
-                if os.path.exists(file_path):
-                    try:
-                        track_data[stem_file] = AudioSegment.from_wav(file_path)
-                        loaded_stems.append(stem_file)
-                        self.log_manager.log("verbose", f"    🔊 Loaded stem: {stem_file}")
-                    except Exception as e:
-                        # Treat loading error as a missing stem for simplicity
-                        self.log_manager.log("important",
-                                             f"❌ Error loading stem {stem_file} from {source_zip_path}: {e}")
-                        missing_stems.append(f"{stem_file} (Load Error)")
-                else:
-                    missing_stems.append(stem_file)
+        # Export final files, all encoded in parallel from the one merged buffer
+        if merged_audio:
+            if not self._export_outputs(merged_audio, outputs):
+                return False  # Export failed
+        else:
+            self.log_manager.log("important",
+                                 f"⚠️ No audio data was successfully merged for {os.path.basename(outputs[0].path)}. Skipping export.")
+            return False  # Nothing to export is a failure condition
 
-            # --- Strict Stem Check ---
-            if missing_stems:
-                self.log_manager.log("important",
-                                     f"❌ Missing required stems in {source_zip_name}: {', '.join(missing_stems)}. Skipping mix.")
-                return False  # Quit processing this track due to missing stems
-
-            self.log_manager.log("verbose", f"    🔊 All expected stems loaded: {', '.join(loaded_stems)}")
-
-            # Apply effects dynamically
-            effects_config = track_config.get("effects", {})
-            if effects_config:
-                self.log_manager.log("verbose", f"    ✨ Applying Effects...")
-                for effect_name, effect_params in effects_config.items():
-                    if effect_name in self.effects:
-                        target_track = effect_params.get("target_track", None)
-                        effect_function = self.effects[effect_name]
-                        params_for_effect = {k: v for k, v in effect_params.items() if k != "target_track"}
-
-                        if target_track:
-                            if target_track in track_data:
-                                self.log_manager.log("verbose",
-                                                     f"      Applying '{effect_name}' to {target_track} with params: {params_for_effect}")
-                                try:
-                                    track_data[target_track] = effect_function(track_data[target_track],
-                                                                               **params_for_effect)
-                                except Exception as e:
-                                    self.log_manager.log("important",
-                                                         f"❌ Error applying effect '{effect_name}' to {target_track}: {e}\n{traceback.format_exc()}")
-                                    # Decide if error is fatal for the track: return False
-                            else:
-                                self.log_manager.log("important",
-                                                     f"⚠️ Target track '{target_track}' for effect '{effect_name}' not found. Skipping effect.")
-                        else:
-                            self.log_manager.log("verbose",
-                                                 f"      Applying '{effect_name}' to all stems with params: {params_for_effect}")
-                            for key in list(track_data.keys()):
-                                try:
-                                    track_data[key] = effect_function(track_data[key], **params_for_effect)
-                                except Exception as e:
-                                    self.log_manager.log("important",
-                                                         f"❌ Error applying effect '{effect_name}' to {key}: {e}\n{traceback.format_exc()}")
-                                    # Decide if error is fatal for the track: return False
+        self.manifest.record(track_json_path, fingerprint, zip_state)
+        return True  # Indicate success for this track
+
+
+    def _apply_mix_override(self, track_config, track_json_path, log=True):
+        """Applies mix_override to a track's 'mix' section (in place) if its target_wildcard matches the track."""
+        if not self.mix_override:
+            return
+        # Check for target_wildcard
+        target_wildcards = self.mix_override.get("target_wildcard", [])
+        apply_override = False
+        if target_wildcards:
+            base_name = os.path.basename(track_json_path)
+            for wildcard in target_wildcards:
+                if fnmatch(base_name, wildcard):
+                    if log:
+                        self.log_manager.log("verbose", f"    ✅ Matched target_wildcard '{wildcard}' for {base_name}. Applying override.")
+                    apply_override = True
+                    break  # Apply only once if matched
+        else: # apply if no wildcards specified in override
+             if log:
+                 self.log_manager.log("verbose", f"    ✅ No target_wildcard specified in override. Applying override to {os.path.basename(track_json_path)}.")
+             apply_override = True
+
+        if apply_override:
+             # Use a copy to avoid modifying the original dictionary while iterating or updating
+             override_json_data = self.mix_override.get("json", {}).copy()
+             track_config.update(override_json_data) # Override the mix section
+
+    def _load_stems(self, source_zip_path, source_zip_name, zip_state):
+        """Loads the decoded stems from the stem cache, or from the ZIP (and caches them). Returns None on error."""
+        track_data = None
+        if self.stem_cache:
+            with self.stats.stage("stem_cache_load"):
+                track_data = self.stem_cache.load(zip_state["hash"], EXPECTED_STEMS)
+        if track_data is not None:
+            self.stats.add_read("stem_cache", sum(len(audio.raw_data) for audio in track_data.values()))
+            self.log_manager.log("verbose", f"    ⚡ Loaded decoded stems of {source_zip_name} from the stem cache")
+        else:
+            track_data = self._read_stems(source_zip_path, source_zip_name)
+            if track_data is None:
+                return None
+            if self.stem_cache:
+                with self.stats.stage("stem_cache_store"):
+                    self.stem_cache.store(zip_state["hash"], track_data)
+        self.log_manager.log("verbose", f"    🔊 All expected stems loaded: {', '.join(track_data)}")
+        return track_data
+
+    def _collect_track_effects(self, track_config, track_data):
+        """Collects the effects of every stem, in the order they are listed in the JSON."""
+        effects_config = track_config.get("effects", {})
+        if effects_config:
+            self.log_manager.log("verbose", f"    ✨ Applying Effects...")
+        else:
+            self.log_manager.log("verbose", "    ✨ No effects specified in JSON.")
+        return self._collect_stem_effects(effects_config, track_data)
+
+    def _read_stems(self, source_zip_path, source_zip_name):
+        """
+        Decodes the expected stems straight from the ZIP members, nothing is extracted to disk.
+        Returns a dict of stem name -> AudioSegment, or None if the ZIP is unreadable or stems are missing.
+        """
+        self.log_manager.log("verbose", f"    📦 Reading stems from {source_zip_name}")
+        try:
+            with ZipStemReader(source_zip_path) as zip_reader:
+                # Load expected audio stems and check for missing ones
+                track_data = {}
+                missing_stems = []
+                for stem_file in EXPECTED_STEMS:  # Use defined order
+                    if zip_reader.has_member(stem_file):
+                        try:
+                            # Inflating (or paging in) the member and parsing the WAV are timed separately
+                            with self.stats.stage("zip_read"):
+                                member = zip_reader.read_member(stem_file)
+                            self.stats.add_read("zip", zip_reader.compressed_size(stem_file))
+                            with self.stats.stage("decode"):
+                                track_data[stem_file] = decode_wav(member)
+                            del member
+                            self.log_manager.log("verbose", f"    🔊 Loaded stem: {stem_file}")
+                        except Exception as e:
+                            # Treat loading error as a missing stem for simplicity
+                            self.log_manager.log("important",
+                                                 f"❌ Error loading stem {stem_file} from {source_zip_path}: {e}")
+                            missing_stems.append(f"{stem_file} (Load Error)")
                     else:
-                        self.log_manager.log("important", f"⚠️ Effect '{effect_name}' not found. Skipping.")
+                        missing_stems.append(stem_file)
+        except zipfile.BadZipFile:
+            self.log_manager.log("important", f"❌ Invalid ZIP file: {source_zip_path}")
+            return None
+        except Exception as e:
+            self.log_manager.log("important", f"❌ Error reading ZIP file {source_zip_path}: {e}")
+            return None
+
+        # --- Strict Stem Check ---
+        if missing_stems:
+            self.log_manager.log("important",
+                                 f"❌ Missing required stems in {source_zip_name}: {', '.join(missing_stems)}. Skipping mix.")
+            return None  # Quit processing this track due to missing stems
+
+        return track_data
+
+    def _resolve_outputs(self, track_config, config_file_dir):
+        """
+        Resolves the files a track is encoded into. The 'mix' section either has an
+        'outputs' list of {"output_file", "format", "bitrate"} entries, or a single
+        'output_file' (with the section's 'bitrate'). The format defaults to the file
+        extension, the bitrate to the section's 'bitrate'.
+
+        Returns:
+            list[OutputTarget]: The output files (absolute paths), or None if none is configured.
+        """
+        bitrate = track_config.get("bitrate", DEFAULT_BITRATE)
+        output_entries = track_config.get("outputs")
+        if not output_entries:
+            if not track_config.get("output_file"):
+                return None
+            output_entries = [{"output_file": track_config["output_file"]}]
+
+        outputs = []
+        for entry in output_entries:
+            if not isinstance(entry, dict) or not entry.get("output_file"):
+                self.log_manager.log("important", f"⚠️ Output entry without 'output_file' ignored: {entry}")
+                continue
+            output_path = os.path.join(config_file_dir, entry["output_file"])
+            extension = os.path.splitext(output_path)[1].lstrip(".").lower()
+            outputs.append(OutputTarget(output_path,
+                                        entry.get("format", extension or DEFAULT_FORMAT),
+                                        entry.get("bitrate", bitrate)))
+        return outputs or None
+
+    def _export_outputs(self, merged_audio, outputs):
+        """Encodes the merged AudioSegment into every output file in parallel. Returns True if all succeeded."""
+        for output in outputs:
+            self.log_manager.log("normal",
+                                 f"    💾 Exporting final {output.format.upper()}: {output.path} (Bitrate: {output.bitrate})")
+            os.makedirs(os.path.dirname(output.path), exist_ok=True)
+        self.stats.add_count("encoder_processes", encoder_processes(outputs, merged_audio.channels,
+                                                                    merged_audio.sample_width, self.encoder))
+        with self.stats.stage("encode"):
+            results = self.encoder_pool.encode(merged_audio.raw_data, merged_audio.frame_rate,
+                                               merged_audio.channels, merged_audio.sample_width, outputs)
+        success = True
+        for output, error in results.items():
+            if error is None:
+                self.stats.add_written("output", os.path.getsize(output.path))
+                self.log_manager.log("important", f"✅ Successfully exported: {os.path.basename(output.path)}")
             else:
-                self.log_manager.log("verbose", "    ✨ No effects specified in JSON.")
+                self.log_manager.log("important", f"❌ Error exporting {output.path}: {error}")
+                success = False
+        return success
 
-            # Merge tracks (overlay method)
-            self.log_manager.log("verbose", "    🔄 Merging loaded stems...")
-            merged_audio = None
-            first_stem = True
-            for stem_name in EXPECTED_STEMS:  # Use defined order
-                if stem_name in track_data:
-                    if first_stem:
-                        merged_audio = track_data[stem_name]
-                        first_stem = False
-                        self.log_manager.log("verbose", f"      Base for merge: {stem_name}")
+    def _collect_stem_effects(self, effects_config, track_data):
+        """
+        Resolves the 'effects' section into the effect calls of every stem.
+        An effect entry is either a parameter dict or a list of parameter dicts
+        (e.g. several gain automation points), each optionally limited to one
+        stem with "target_track".
+
+        Returns:
+            dict: Stem name -> list of (effect name, parameters), in application order.
+        """
+        stem_effects = {stem_name: [] for stem_name in track_data}
+        for effect_name, effect_entries in effects_config.items():
+            if effect_name not in self.effects:
+                self.log_manager.log("important", f"⚠️ Effect '{effect_name}' not found. Skipping.")
+                continue
+            if isinstance(effect_entries, dict):
+                effect_entries = [effect_entries]
+            for effect_params in effect_entries:
+                target_track = effect_params.get("target_track", None)
+                params_for_effect = {k: v for k, v in effect_params.items() if k != "target_track"}
+                if target_track:
+                    if target_track in track_data:
+                        self.log_manager.log("verbose",
+                                             f"      Applying '{effect_name}' to {target_track} with params: {params_for_effect}")
+                        stem_effects[target_track].append((effect_name, params_for_effect))
                     else:
-                        try:
-                            # Ensure both audio segments have the same frame rate before overlay
-                            if merged_audio.frame_rate != track_data[stem_name].frame_rate:
-                                self.log_manager.log("verbose", f"        Resampling {stem_name} to match base frame rate {merged_audio.frame_rate}")
-                                track_data[stem_name] = track_data[stem_name].set_frame_rate(merged_audio.frame_rate)
+                        self.log_manager.log("important",
+                                             f"⚠️ Target track '{target_track}' for effect '{effect_name}' not found. Skipping effect.")
+                else:
+                    self.log_manager.log("verbose",
+                                         f"      Applying '{effect_name}' to all stems with params: {params_for_effect}")
+                    for stem_name in stem_effects:
+                        stem_effects[stem_name].append((effect_name, params_for_effect))
+        return stem_effects
 
-                            merged_audio = merged_audio.overlay(track_data[stem_name])
-                            self.log_manager.log("verbose", f"      Overlayed: {stem_name}")
-                        except Exception as e:
-                            self.log_manager.log("important", f"❌ Error overlaying stem {stem_name}: {e}")
-                            return False  # Treat overlay error as fatal for this mix
+    def _can_stream(self, effects_config):
+        """
+        Returns True if every effect of the track has an envelope form or a streamable buffer form
+        and the limiter works block by block.
+        """
+        if self.mix_limiter != "clip":
+            return False
+        return all(name in self.effect_envelopes or (name in self.buffer_effects and self.buffer_effects[name].streamable)
+                   for name in effects_config if name in self.effects)
+
+    def _mix_streaming(self, source_zip_path, effects_config, outputs, track_json_path):
+        """
+        Mixes a track block by block: stems are read sequentially from the ZIP, their effects
+        are applied as compiled envelopes, and every mixed block is piped straight into the
+        encoders of all outputs. Memory use is bounded by the block size, whatever the track length.
+        The mix analysis is measured block by block along the way.
+
+        Returns:
+            True on success, False on error, None if the track can't be streamed
+            (e.g. stems with different sample rates) and has to use the regular mix.
+        """
+        self.log_manager.log("verbose", f"    📦 Streaming stems from {os.path.basename(source_zip_path)}")
+        streams = []
+        try:
+            with ZipStemReader(source_zip_path) as zip_reader:
+                missing_stems = [stem_file for stem_file in EXPECTED_STEMS if not zip_reader.has_member(stem_file)]
+                if missing_stems:
+                    self.log_manager.log("important",
+                                         f"❌ Missing required stems in {os.path.basename(source_zip_path)}: {', '.join(missing_stems)}. Skipping mix.")
+                    return False
+
+                try:
+                    with self.stats.stage("stream_open"):
+                        mix = self._open_stream_mix(zip_reader, effects_config, streams)
+                except (UnsupportedWavError, ValueError) as e:
+                    self.log_manager.log("verbose", f"    ℹ️ Track can't be streamed ({e}), using the regular mix.")
+                    return None
+
+                self.log_manager.log("verbose", "    🔄 Merging stems block by block...")
+                for output in outputs:
+                    self.log_manager.log("normal",
+                                         f"    💾 Exporting final {output.format.upper()}: {output.path} (Bitrate: {output.bitrate})")
+                    os.makedirs(os.path.dirname(output.path), exist_ok=True)
+                for stem_file in EXPECTED_STEMS:
+                    self.stats.add_read("zip", zip_reader.compressed_size(stem_file))
+                # Outputs are encoded to temp files renamed when complete, so a failure leaves no truncated output.
+                # Reading, effects and mixing of a block count as "stream_mix", waiting for the encoders as "encode".
+                meter = None
+                if self.analysis_mode != "off":
+                    meter = LoudnessMeter(mix.frame_rate, mix.channels, mix.sample_width)
+                self.stats.add_count("encoder_processes",
+                                     encoder_processes(outputs, mix.channels, mix.sample_width, self.encoder))
+                with MultiEncoder(outputs, mix.frame_rate, mix.channels, mix.sample_width, self.encoder) as encoder:
+                    blocks = mix.blocks(self.stream_block_frames)
+                    while True:
+                        with self.stats.stage("stream_mix"):
+                            block = next(blocks, None)
+                        if block is None:
+                            break
+                        if meter is not None:
+                            with self.stats.stage("analysis"):
+                                meter.add(raw_samples(block, mix.sample_width, mix.channels))
+                        with self.stats.stage("encode"):
+                            encoder.write(block)
+                    with self.stats.stage("encode"):
+                        encoder.close()
+        except zipfile.BadZipFile:
+            self.log_manager.log("important", f"❌ Invalid ZIP file: {source_zip_path}")
+            return False
+        except Exception as e:
+            self.log_manager.log("important",
+                                 f"❌ Error streaming mix of {source_zip_path}: {e}\n{traceback.format_exc()}")
+            return False
+        finally:
+            for stream in streams:
+                stream.close()
+
+        if meter is not None:
+            analysis = meter.result()
+            self._log_analysis(analysis)
+            self._write_analysis(track_json_path, outputs, analysis)
+        for output in outputs:
+            self.stats.add_written("output", os.path.getsize(output.path))
+            self.log_manager.log("important", f"✅ Successfully exported: {os.path.basename(output.path)}")
+        return True
+
+    def _open_stream_mix(self, zip_reader, effects_config, streams):
+        """
+        Opens the stems of a ZIP as PCM streams (appended to `streams`, which the caller closes)
+        and compiles their effects. Returns the StreamMix.
+
+        Raises:
+            UnsupportedWavError, ValueError: If the track can't be streamed.
+        """
+        stem_streams = {}
+        for stem_file in EXPECTED_STEMS:  # Use defined order
+            stem_streams[stem_file] = zip_reader.open_pcm_stream(stem_file)
+            streams.append(stem_streams[stem_file])
+        sample_rates = sorted({stream.format.sample_rate for stream in streams})
+        if len(sample_rates) > 1:
+            raise ValueError(f"stems have different sample rates: {sample_rates}")
+
+        if effects_config:
+            self.log_manager.log("verbose", f"    ✨ Applying Effects...")
+        stem_effects = self._collect_stem_effects(effects_config, stem_streams)
+        stems = []
+        for stem_file in EXPECTED_STEMS:
+            stream = stem_streams[stem_file]
+            plan = plan_effects(stem_effects[stem_file], self.effect_envelopes, self.buffer_effects,
+                                stream.format.sample_rate, stream.frame_count)
+            if plan is None or plan.kind != "compiled":
+                raise ValueError(f"effects of {stem_file} can't run block by block")
+            stems.append(StreamStem(stream, plan.chain, plan.block_effects))
+        return StreamMix(stems)
+
+    def _analyze_mix(self, merged_audio, track_config):
+        """
+        Measures loudness, peaks and clipping of the merged mix in one vectorized pass and,
+        if the 'mix' section sets 'target_lufs', normalizes the mix to it (limited by
+        'true_peak_limit', default -1 dBTP). Returns (merged AudioSegment, analysis dict).
+        """
+        meter = LoudnessMeter(merged_audio.frame_rate, merged_audio.channels, merged_audio.sample_width)
+        meter.add(segment_samples(merged_audio))
+        analysis = meter.result()
+        self._log_analysis(analysis)
+
+        target_lufs = track_config.get("target_lufs")
+        if target_lufs is not None:
+            true_peak_limit = track_config.get("true_peak_limit", DEFAULT_TRUE_PEAK_LIMIT)
+            gain_db, limited = normalization_gain(analysis, target_lufs, true_peak_limit)
+            if gain_db is None:
+                self.log_manager.log("normal", "    ⚠️ Silent mix, loudness normalization skipped")
+            else:
+                merged_audio = apply_gain(merged_audio, gain_db)
+                # Loudness and peaks move by exactly the gain; clipped samples are counted again
+                for key in ("integrated_lufs", "true_peak_dbtp", "sample_peak_dbfs", "rms_dbfs"):
+                    if analysis[key] is not None:
+                        analysis[key] = round(analysis[key] + gain_db, 2)
+                samples = segment_samples(merged_audio)
+                scale = 1 << (8 * merged_audio.sample_width - 1)
+                analysis["clipped_samples"] = int(((samples >= scale - 1) | (samples <= -scale)).sum())
+                analysis["normalization"] = {"target_lufs": target_lufs, "gain_db": gain_db,
+                                             "limited_by_true_peak": limited}
+                self.log_manager.log("normal", f"    🎚️ Normalized by {gain_db:+.2f} dB to {analysis['integrated_lufs']} LUFS"
+                                               f"{' (limited by true peak)' if limited else ''}")
+        return merged_audio, analysis
+
+    def _log_analysis(self, analysis):
+        self.log_manager.log("normal", f"    📈 Loudness {analysis['integrated_lufs']} LUFS, true peak {analysis['true_peak_dbtp']} dBTP, "
+                                       f"RMS {analysis['rms_dbfs']} dBFS")
+        if analysis["clipped_samples"]:
+            self.log_manager.log("normal", f"    ⚠️ {analysis['clipped_samples']} clipped samples in the mix")
+
+    def _write_analysis(self, track_json_path, outputs, analysis):
+        """
+        Stores the analysis in the 'analysis' section of the track JSON, or in
+        '<first output name>.analysis.json' in sidecar mode. Failures are logged, not fatal.
+        """
+        indent, trailing_newline = 4, False
+        if self.analysis_mode == "sidecar":
+            path = os.path.splitext(outputs[0].path)[0] + SIDECAR_SUFFIXES[0]
+            data = analysis
+        else:
+            # Re-read the file: the loaded config may carry mix_override values, which must not be saved
+            path = track_json_path
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                data = json.loads(text)
+            except Exception as e:
+                self.log_manager.log("important", f"⚠️ Could not store analysis in {path}: {e}")
+                return
+            data["analysis"] = analysis
+            # Keep the file's own layout (hand-edited files may use tabs, 2 spaces or a single line)
+            indentation = re.search(r"\n([ \t]+)\S", text)
+            indent = indentation.group(1) if indentation else None
+            trailing_newline = text.endswith("\n")
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=indent, ensure_ascii=False)
+                if trailing_newline:
+                    f.write("\n")
+            os.replace(temp_path, path)
+            self.log_manager.log("verbose", f"    ✅ Analysis stored in {os.path.basename(path)}")
+        except Exception as e:
+            self.log_manager.log("important", f"⚠️ Could not store analysis in {path}: {e}")
 
-            # Export final MP3
-            if merged_audio:
-                self.log_manager.log("normal",
-                                     f"    💾 Exporting final MP3: {output_mp3_path} (Bitrate: {bitrate})")
+    def _apply_effects(self, stem_name, audio, effect_calls):
+        """Applies effect calls to the AudioSegment of one stem and returns the result."""
+        for effect_name, params_for_effect in effect_calls:
+            start_time = time.perf_counter()
+            try:
+                audio = self.effects[effect_name](audio, **params_for_effect)
+            except Exception as e:
+                self.log_manager.log("important",
+                                     f"❌ Error applying effect '{effect_name}' to {stem_name}: {e}\n{traceback.format_exc()}")
+                # Decide if error is fatal for the track: return False
+            finally:
+                self.stats.add_effect_time(effect_name, time.perf_counter() - start_time)
+        return audio
+
+    def _apply_stem_effects(self, track_data, stem_effects):
+        """Applies the AudioSegment effects to every stem. Returns a new dict of stem name -> AudioSegment."""
+        return {stem_name: self._apply_effects(stem_name, audio, stem_effects.get(stem_name, []))
+                for stem_name, audio in track_data.items()}
+
+    def _overlay_stems(self, track_data):
+        """Merges the stems with a chain of AudioSegment.overlay calls (pydub engine). Returns the merged AudioSegment."""
+        merged_audio = None
+        for stem_name in EXPECTED_STEMS:  # Use defined order
+            if stem_name not in track_data:
+                continue
+            audio = track_data[stem_name]
+            if merged_audio is None:
+                merged_audio = audio
+                self.log_manager.log("verbose", f"      Base for merge: {stem_name}")
+                continue
+            # Ensure both audio segments have the same frame rate before overlay
+            if merged_audio.frame_rate != audio.frame_rate:
+                self.log_manager.log("verbose", f"        Resampling {stem_name} to match base frame rate {merged_audio.frame_rate}")
+                audio = audio.set_frame_rate(merged_audio.frame_rate)
+            merged_audio = merged_audio.overlay(audio)
+            self.log_manager.log("verbose", f"      Overlayed: {stem_name}")
+        return merged_audio
+
+    def _mix_numpy(self, track_data, stem_effects):
+        """
+        Mixes the stems with the numpy engine. Returns the merged AudioSegment.
+        Compiling the effects counts as "effects"; compiled envelopes are applied while
+        the stems are summed, so their cost is part of "merge".
+        """
+        with self.stats.stage("effects"):
+            stems = self._build_mix_stems(track_data, stem_effects)
+        with self.stats.stage("merge"):
+            return mix_stems(stems, limiter=self.mix_limiter)
+
+    def _build_mix_stems(self, track_data, stem_effects):
+        """
+        Prepares the stems for mix_stems(), running the effects of every stem on the cheapest
+        path plan_effects() finds: compiled into one gain envelope and trim range (plus
+        streamable buffer effects applied while mixing), on one float32 buffer, or, if an
+        effect only has an AudioSegment form, through the AudioSegment effects.
+        Returns the list of MixStems, in mix order.
+        """
+        stems = []
+        base_rate = track_data[EXPECTED_STEMS[0]].frame_rate
+        for stem_name in EXPECTED_STEMS:  # Use defined order
+            audio = track_data[stem_name]
+            effect_calls = stem_effects.get(stem_name, [])
+            plan = None
+            if effect_calls and audio.frame_rate == base_rate:
                 try:
-                    os.makedirs(os.path.dirname(output_mp3_path), exist_ok=True)
-                    merged_audio.export(output_mp3_path, format="mp3", bitrate=bitrate)
-                    self.log_manager.log("important", f"✅ Successfully exported: {output_mp3_name}")
+                    plan = plan_effects(effect_calls, self.effect_envelopes, self.buffer_effects,
+                                        audio.frame_rate, int(audio.frame_count()))
                 except Exception as e:
                     self.log_manager.log("important",
-                                         f"❌ Error exporting MP3 {output_mp3_path}: {e}\n{traceback.format_exc()}")
-                    return False  # Export failed
+                                         f"⚠️ Could not compile effects of {stem_name}, applying them one by one: {e}")
+            stem = self._planned_stem(stem_name, audio, plan) if plan is not None else None
+            if stem is not None:
+                stems.append(stem)
+                continue
+            if effect_calls:
+                audio = self._apply_effects(stem_name, audio, effect_calls)
+            if audio.frame_rate != base_rate:
+                self.log_manager.log("verbose", f"        Resampling {stem_name} to match base frame rate {base_rate}")
+                audio = audio.set_frame_rate(base_rate)
+            stems.append(MixStem.from_segment(audio))
+        return stems
+
+    def _planned_stem(self, stem_name, audio, plan):
+        """Runs an EffectPlan on the AudioSegment of one stem. Returns the MixStem, or None if an effect failed."""
+        if plan.kind == "compiled":
+            block_note = f", {len(plan.block_effects)} block effect(s) applied while mixing" if plan.block_effects else ""
+            self.log_manager.log("verbose", f"      Compiled the effects of {stem_name} into one envelope{block_note}")
+            return MixStem.from_segment(audio, plan.chain, plan.block_effects)
+        try:
+            samples, chain = plan.run(segment_to_array(audio), audio.frame_rate, self.stats.add_effect_time)
+        except Exception as e:
+            self.log_manager.log("important", f"❌ Error applying effects to {stem_name}: {e}\n{traceback.format_exc()}")
+            return None
+        self.log_manager.log("verbose", f"      Applied the effects of {stem_name} on one float buffer")
+        samples *= full_scale(audio.sample_width)  # back to the integer range mix_stems() sums in
+        return MixStem(samples, audio.sample_width, audio.frame_rate, chain)
+
+    def _render_preview(self, track_config, source_zip_path, source_zip_name, zip_state, output):
+        """
+        Renders the preview window of a track into '<output name>.preview.wav' with the same mix
+        engine as the full mix. With the numpy engine only the window is mixed (compiled effect
+        envelopes are evaluated for the window frames only); with the pydub engine, or for effects
+        without an envelope form, the effects run on the full stems and the window is cut from
+        the result. Returns True on success, False on error.
+        """
+        start_time = self.preview.get("start_time", 0) or 0
+        end_time = self.preview.get("end_time")
+        preview_path = os.path.splitext(output.path)[0] + ".preview.wav"
+        window_label = f"{start_time}-{end_time if end_time is not None else 'end'} ms"
+        self.log_manager.log("normal", f"    🎧 Rendering preview ({window_label}): {preview_path}")
+
+        track_data = self._load_stems(source_zip_path, source_zip_name, zip_state)
+        if track_data is None:
+            return False
+        stem_effects = self._collect_track_effects(track_config, track_data)
+
+        try:
+            if self.mix_engine == "numpy":
+                with self.stats.stage("effects"):
+                    stems = self._build_mix_stems(track_data, stem_effects)
+                with self.stats.stage("merge"):
+                    frame_rate = stems[0].frame_rate
+                    start_frame = int(start_time * frame_rate / 1000.0)
+                    end_frame = int(end_time * frame_rate / 1000.0) if end_time is not None else None
+                    for stem in stems:
+                        stem.crop(start_frame, end_frame)
+                    preview_audio = mix_stems(stems, limiter=self.mix_limiter)
             else:
-                self.log_manager.log("important",
-                                     f"⚠️ No audio data was successfully merged for {output_mp3_name}. Skipping export.")
-                return False  # Nothing to export is a failure condition
+                with self.stats.stage("effects"):
+                    track_data = self._apply_stem_effects(track_data, stem_effects)
+                with self.stats.stage("merge"):
+                    preview_audio = self._overlay_stems({stem_name: audio[start_time:end_time]
+                                                         for stem_name, audio in track_data.items()})
 
-        self.log_manager.log("verbose", f"    🧹 Cleaned up temporary files for {source_zip_name}")
-        return True  # Indicate success for this track
+            with self.stats.stage("encode"):
+                if self.preview.get("frame_rate"):
+                    preview_audio = preview_audio.set_frame_rate(self.preview["frame_rate"])
+                if self.preview.get("mono"):
+                    preview_audio = preview_audio.set_channels(1)
+                preview_audio.export(preview_path, format="wav")
+            self.stats.add_written("preview", os.path.getsize(preview_path))
+        except Exception as e:
+            self.log_manager.log("important", f"❌ Error rendering preview {preview_path}: {e}\n{traceback.format_exc()}")
+            return False
 
+        self.log_manager.log("important", f"✅ Preview rendered: {os.path.basename(preview_path)} ({len(preview_audio) / 1000:.1f} s)")
+        return True
+
+    def _process_sequential(self, track_json_files):
+        """Processes the given track JSON files one after another. Returns the lists of results and track stats."""
+        results = []
+        track_stats = []
+        for json_file in track_json_files:
+            # Call process_track for each file and collect its return value
+            result = self.process_track(json_file)
+            self.journal.record(json_file, self.last_track_stats["result"],
+                                self.manifest.get_entry(json_file) if result is True else None)
+            results.append(result)
+            track_stats.append(self.last_track_stats)
+        return results, track_stats
+
+    def _estimate_track_memory(self, track_json_path):
+        """
+        Estimates the peak memory of mixing a track from the WAV headers of its stems (see
+        MixScheduler). Tracks that are ignored or can't be read count as 0, they finish at once.
+        """
+        try:
+            with open(track_json_path, "r", encoding="utf-8") as f:
+                track_config = json.load(f).get("mix")
+            if not isinstance(track_config, dict):
+                return 0
+            self._apply_mix_override(track_config, track_json_path, log=False)
+            if track_config.get("ignore", False) or not track_config.get("source_path"):
+                return 0
+            stem_sizes = decoded_stem_sizes(os.path.join(os.path.dirname(track_json_path), track_config["source_path"]),
+                                            EXPECTED_STEMS)
+        except Exception:
+            return 0  # the mix reports the problem
+        streamed = self.streaming and self._can_stream(track_config.get("effects", {})) \
+            and track_config.get("target_lufs") is None and self.preview is None
+        return estimate_mix_memory(stem_sizes, self.mix_engine, self.stream_block_frames if streamed else None)
+
+    def _memory_budget(self, worker_count):
+        """
+        Returns the memory in bytes the tracks mixed at once may use: mix_memory_budget_mb, or
+        a share of the currently available memory, minus what the worker processes need
+        themselves. None if the available memory is unknown (no admission control).
+        """
+        if self.memory_budget_mb:
+            budget = int(self.memory_budget_mb * 1024 * 1024)
+        else:
+            available = available_memory()
+            if available is None:
+                return None
+            budget = int(available * DEFAULT_BUDGET_FRACTION)
+        return max(budget - worker_count * WORKER_BASE_MEMORY, 0)
+
+    def _process_parallel(self, track_json_files):
+        """
+        Processes the given track JSON files across a process pool.
+        Tracks are admitted by a MixScheduler: largest first, and only while their estimated
+        memory fits the memory budget, so long tracks don't get the pool OOM-killed.
+        Each worker buffers the log lines of a track and sends them back with the result,
+        so the output of one track is printed as a single block when that track completes.
+        Manifest entries of successful mixes and the track stats are sent back too and merged here,
+        and every track is journaled as it completes.
+        Returns the lists of results and track stats.
+        """
+        worker_count = min(self.workers, len(track_json_files))
+        budget = self._memory_budget(worker_count)
+        scheduler = MixScheduler({json_file: self._estimate_track_memory(json_file) for json_file in track_json_files},
+                                 worker_count, budget)
+        budget_text = f"{budget / 1024 ** 2:.0f} MB" if budget is not None else "unknown"
+        self.log_manager.log("important", f"⚙️ Parallel mode: mixing with {worker_count} worker processes "
+                                          f"(memory budget {budget_text}, largest track "
+                                          f"{max(scheduler.job_memory.values()) / 1024 ** 2:.0f} MB)")
+
+        results = []
+        track_stats = []
+        with ProcessPoolExecutor(max_workers=worker_count,
+                                 initializer=_init_mix_worker,
+                                 initargs=(self._worker_init_args,)) as executor:
+            futures = {}
+            while not scheduler.done:
+                for json_file in scheduler.admit():
+                    self.log_manager.log("verbose", f"🚦 Starting {os.path.basename(json_file)} "
+                                                    f"(~{scheduler.job_memory[json_file] / 1024 ** 2:.0f} MB)")
+                    try:
+                        future = executor.submit(_mix_track_in_worker, json_file, self.manifest.get_entry(json_file))
+                    except Exception as e:  # the pool broke, e.g. a worker was OOM-killed
+                        future = Future()
+                        future.set_exception(e)
+                    futures[future] = json_file
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    json_file = futures.pop(future)
+                    scheduler.release(json_file)
+                    try:
+                        result, captured_logs, manifest_entry, stats = future.result()
+                    except Exception as e:
+                        # The worker process itself failed (e.g. it was killed), not just the mix
+                        self.log_manager.log("important", f"❌ Worker failed while processing {json_file}: {e}")
+                        result, captured_logs, manifest_entry = False, [], None
+                        stats = dict(MixStats().to_dict(), track=os.path.relpath(json_file, self.project_root),
+                                     result=_result_name(result), total_seconds=0.0)
+                    self.log_manager.replay(captured_logs)
+                    if result is True:
+                        self.manifest.set_entry(json_file, manifest_entry)
+                    self.journal.record(json_file, _result_name(result), manifest_entry if result is True else None)
+                    results.append(result)
+                    track_stats.append(stats)
+        return results, track_stats
+
+    def _start_journal(self, track_json_files):
+        """
+        Starts the run journal and returns the tracks to process. Manifest entries of tracks
+        mixed by an interrupted run are recovered from its journal first (the manifest is only
+        saved when a run ends), so they count as up to date. With resume / retry_failed the
+        journaled run is continued with its unfinished / failed tracks that still exist;
+        otherwise a new run with all found tracks is journaled.
+        """
+        journal = self.journal
+        if journal.exists and not journal.finished:
+            recovered = journal.manifest_entries()
+            for json_path, entry in recovered.items():
+                self.manifest.set_entry(json_path, entry)
+            self.log_manager.log("normal", f"ℹ️ The run started {journal.started} did not finish "
+                                           f"({len(journal.outcomes)} of {len(journal.tracks)} tracks done, "
+                                           f"{len(recovered)} mix manifest entries recovered)")
+
+        if not (self.resume or self.retry_failed):
+            journal.start(track_json_files, {"force": self.force, "mix_override": self.mix_override})
+            return track_json_files
+        if not journal.exists:
+            self.log_manager.log("important", "⚠️ No journaled run to resume, processing all tracks.")
+            journal.start(track_json_files, {"force": self.force, "mix_override": self.mix_override})
+            return track_json_files
+
+        if journal.settings.get("force") and not self.force:
+            # Tracks of a forced run must be mixed again, not skipped as up to date
+            self.log_manager.log("important", "Force: the journaled run ignored the mix manifest, so does its continuation")
+            self.force = True
+            self._worker_init_args["force"] = True
+        selected = set()
+        if self.resume:
+            pending = journal.pending_tracks()
+            self.log_manager.log("important", f"⏯️ Resuming the run started {journal.started}: "
+                                              f"{len(pending)} of {len(journal.tracks)} tracks never completed")
+            selected.update(pending)
+        if self.retry_failed:
+            failed = journal.failed_tracks()
+            self.log_manager.log("important", f"🔁 Retrying {len(failed)} failed tracks of the run started {journal.started}")
+            selected.update(failed)
+        # Keep the order of the journaled run; tracks deleted since then are dropped
+        track_json_files = [path for path in journal.track_paths() if path in selected and os.path.exists(path)]
+        if track_json_files:
+            journal.resume(track_json_files)
+        return track_json_files
+
+    def watch(self, poll_interval=None, debounce=None):
+        """
+        Runs watch mode: keeps this instance (config, effects, caches) loaded and re-mixes
+        a track a few seconds after its JSON or ZIP changes, until interrupted (Ctrl+C).
+        See TrackWatcher.
+        """
+        TrackWatcher(self, poll_interval=poll_interval, debounce=debounce).run()
 
     def run(self):
         """Finds and processes all track JSON files."""
@@ -320,8 +1145,20 @@ class MixTracks:
         self.log_manager.log("important", f"Searching Folders: {self.look_folders}")
         if self.mix_override:
              self.log_manager.log("important", f"Mix Override Applied: {self.mix_override}")
+        if self.force:
+             self.log_manager.log("important", "Force: ignoring mix manifest, all tracks are mixed again")
+        if self.streaming:
+             self.log_manager.log("important", f"Streaming: mixing in blocks of {self.stream_block_frames} frames")
+        if self.preview is not None:
+             self.log_manager.log("important", f"Preview mode: {self.preview} (final outputs are not touched)")
+        self.log_manager.log("important", f"Encoder: {self.encoder}")
+        if self.resume or self.retry_failed:
+             modes = [name for name, enabled in (("resume", self.resume), ("retry failed", self.retry_failed)) if enabled]
+             self.log_manager.log("important", f"Journal: {' + '.join(modes)} ({self.journal.journal_path})")
         self.log_manager.log("important", "=" * 40)
 
+        run_started = time.time()
+        run_start_time = time.perf_counter()
         track_json_files = self._find_track_json_files()
 
         if not track_json_files:
@@ -330,17 +1167,39 @@ class MixTracks:
 
         self.log_manager.log("important", f"ℹ️ Found {len(track_json_files)} potential track JSON files to process.")
 
+        # Previews don't touch the outputs, so they are not journaled (and don't replace the journal of a real run)
+        journaled = self.preview is None
+        if journaled:
+            track_json_files = self._start_journal(track_json_files)
+            if not track_json_files:
+                self.log_manager.log("important", "⏹️ Nothing left to resume or retry in the journaled run.")
+                return
+
+        parallel = self.parallel and self.workers > 1 and len(track_json_files) > 1
+        try:
+            if parallel:
+                results, track_stats = self._process_parallel(track_json_files)
+            else:
+                results, track_stats = self._process_sequential(track_json_files)
+        except BaseException:
+            self.journal.close()  # the run stays unfinished in the journal, so it can be resumed
+            raise
+        finally:
+            # Also on Ctrl+C, so the tracks mixed so far are up to date in the next run
+            self.manifest.save()
+
         success_count = 0
         error_count = 0
         skipped_explicitly_count = 0
+        up_to_date_count = 0
 
-        for json_file in track_json_files:
-            # Call process_track for each file and handle its return value
-            result = self.process_track(json_file)
+        for result in results:
             if result is True:
                 success_count += 1
             elif result == "ignored":
                 skipped_explicitly_count += 1
+            elif result == "up_to_date":
+                up_to_date_count += 1
             else: # result is False (an error occurred during processing)
                 error_count += 1
 
@@ -348,6 +1207,92 @@ class MixTracks:
         self.log_manager.log("important", "🏁 Processing Complete")
         self.log_manager.log("important", f"📊 Summary:")
         self.log_manager.log("important", f"    ✅ Successful Mixes: {success_count}")
+        self.log_manager.log("important", f"    ⏩ Up to date: {up_to_date_count}")
         self.log_manager.log("important", f"    ⏭️ Skipped (ignore flags): {skipped_explicitly_count}")
         self.log_manager.log("important", f"    ❌ Errors/Failed Mixes: {error_count}")
+        counts = {
+            "success": success_count,
+            "up_to_date": up_to_date_count,
+            "ignored": skipped_explicitly_count,
+            "errors": error_count,
+        }
+        if journaled:
+            self.journal.finish(counts)
+            if error_count:
+                self.log_manager.log("important", "    🔁 Retry only the failed tracks with retry_failed=True")
+
+        # --- Run Report ---
+        totals = summarize_track_stats(track_stats)
+        if totals["stages"]:
+            stage_times = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in
+                                    sorted(totals["stages"].items(), key=lambda item: item[1], reverse=True))
+            self.log_manager.log("normal", f"⏱️ Time per stage: {stage_times}")
+        started_processes = totals["counters"].get("encoder_processes", 0)
+        if started_processes:
+            self.log_manager.log("normal", f"🧵 Encoder processes started: {started_processes} "
+                                           f"(one per output and track encoded by ffmpeg)")
+        report = {
+            "version": MIX_REPORT_VERSION,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(run_started)),
+            "duration_seconds": round(time.perf_counter() - run_start_time, 6),
+            "settings": {
+                "mix_engine": self.mix_engine,
+                "encoder": self.encoder,
+                "streaming": self.streaming,
+                "parallel": parallel,
+                "workers": min(self.workers, len(track_json_files)) if parallel else 1,
+                "force": self.force,
+                "preview": self.preview is not None,
+                "resume": self.resume,
+                "retry_failed": self.retry_failed,
+            },
+            "counts": counts,
+            "totals": totals,
+            "tracks": track_stats,
+        }
+        try:
+            write_run_report(self.report_path, report,
+                             os.path.join(os.path.dirname(self.report_path), MIX_REPORT_HISTORY_FILE))
+            self.log_manager.log("important", f"📄 Run report: {self.report_path}")
+        except Exception as e:
+            self.log_manager.log("important", f"⚠️ Could not write run report {self.report_path}: {e}")
         self.log_manager.log("important", "=" * 40)
+
+
+# --- Parallel Mode Worker Helpers ---
+# Effect functions are loaded from files at runtime and can't be pickled, so every
+# worker process builds its own mix-only MixTracks instance once and reuses it for all its tracks.
+_worker_mixer = None
+
+def _init_mix_worker(init_args):
+    """Process pool initializer: creates the MixTracks instance used by this worker."""
+    global _worker_mixer
+    # Only important messages (e.g. effect loading errors) are printed while the worker starts up;
+    # per-track messages are captured and filtered by the parent's log level.
+    _worker_mixer = MixTracks(**dict(init_args, global_log_level="important", worker=True))
+
+def _mix_track_in_worker(track_json_path, manifest_entry):
+    """
+    Mixes one track in a worker process, given the parent's manifest entry of the track (or None).
+    Returns (result, captured log lines, manifest entry, track stats).
+    """
+    _worker_mixer.manifest.tracks = {}  # only the entry of the current track, the parent keeps the others
+    _worker_mixer.manifest.set_entry(track_json_path, manifest_entry)
+    _worker_mixer.log_manager.start_capture()
+    try:
+        result = _worker_mixer.process_track(track_json_path)
+    except Exception as e:
+        _worker_mixer.log_manager.log("important", f"❌ Unexpected error processing {track_json_path}: {e}\n{traceback.format_exc()}")
+        result = False
+        _worker_mixer.last_track_stats["result"] = _result_name(result)
+    return (result, _worker_mixer.log_manager.stop_capture(), _worker_mixer.manifest.get_entry(track_json_path),
+            _worker_mixer.last_track_stats)
+
+
+def _result_name(result):
+    """Returns the run report name of a process_track() result."""
+    if result is True:
+        return "success"
+    if result in ("ignored", "up_to_date"):
+        return result
+    return "error"
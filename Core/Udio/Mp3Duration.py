@@ -0,0 +1,246 @@
+import os
+try:
+    from mutagen.mp3 import MP3
+except ImportError:  # optional, without it durations the headers don't settle are unknown
+    MP3 = None
+
+HEADER_READ_SIZE = 8 * 1024  # bytes read after the ID3v2 tags; four frames and the VBR header fit easily
+ENOUGH_FRAMES = 4  # consecutive frames that make a sync trustworthy without a VBR header (as mutagen)
+MIN_FRAMES = 2  # frames of a sync used when no better one is found before the end of the file (as mutagen)
+MAX_SYNCS = 1500
+
+# Bitrates in kbps per (MPEG version, layer); index 0 (free format) and 15 are invalid
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+BITRATES[(2, 3)] = BITRATES[(2, 2)]
+for _layer in (1, 2, 3):
+    BITRATES[(2.5, _layer)] = BITRATES[(2, _layer)]
+SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+MPEG_VERSIONS = {0: 2.5, 2: 2, 3: 1}  # header bits -> version, 1 is reserved
+MONO = 3
+
+XING_FRAMES = 0x1
+XING_FIELDS = ((XING_FRAMES, 4), (0x2, 4), (0x4, 100), (0x8, 4))  # (flag, size): frames, bytes, TOC, VBR scale
+VBRI_OFFSET = 36
+
+
+class _Undecided(Exception):
+    """The bytes read don't settle the duration (the frames or headers continue past them)."""
+
+
+def _window(data, start, length, at_eof):
+    """Returns data[start:start + length]; a shorter slice is only returned at the end of the file."""
+    chunk = data[start:start + length]
+    if len(chunk) < length and not at_eof:
+        raise _Undecided()
+    return chunk
+
+
+def _lame_padding(data, offset, at_eof):
+    """Returns encoder delay + padding in samples from the LAME tag at `offset`, 0 if there is none."""
+    version = _window(data, offset, 20, at_eof)
+    if len(version) < 20 or not version.startswith((b"LAME", b"L3.99")):
+        return 0
+    rest = version.lstrip(b"EMAL")
+    major, rest = rest[0:1], rest[1:].lstrip(b".")
+    minor = b""
+    for value in rest:
+        if not 0x30 <= value <= 0x39:
+            break
+        minor += bytes([value])
+    rest = rest[len(minor):]
+    try:
+        major, minor = int(major.decode("ascii")), int(minor.decode("ascii"))
+    except ValueError:
+        return 0
+    # The tag with the delay and padding came with 3.90 (not its alpha releases)
+    if (major, minor) < (3, 90) or ((major, minor) == (3, 90) and rest[-11:-10] == b"(") or len(rest) < 11:
+        return 0
+    tag = _window(data, offset + 9, 27, at_eof)
+    if len(tag) < 27 or tag[0] >> 4 != 0:
+        return 0
+    delay = (tag[12] << 4) | (tag[13] >> 4)
+    padding = ((tag[13] & 0x0F) << 8) | tag[14]
+    return delay + padding
+
+
+def _vbr_length(data, offset, version, mode, sample_rate, frame_samples, at_eof):
+    """
+    Reads the Xing/Info or VBRI header of the layer III frame at `offset`.
+
+    Returns:
+        tuple[bool, float | None]: (header found, length in seconds or None if the header has no frame count).
+    """
+    if version == 1:
+        xing_offset = 36 if mode != MONO else 21
+    else:
+        xing_offset = 21 if mode != MONO else 13
+    header = _window(data, offset + xing_offset, 8, at_eof)
+    if len(header) == 8 and header[:4] in (b"Xing", b"Info"):
+        flags = int.from_bytes(header[4:8], "big")
+        position, frames = offset + xing_offset + 8, None
+        for flag, size in XING_FIELDS:
+            if flags & flag:
+                field = _window(data, position, size, at_eof)
+                if len(field) < size:
+                    break  # truncated, not a Xing header
+                if flag == XING_FRAMES:
+                    frames = int.from_bytes(field, "big")
+                position += size
+        else:
+            if frames is None:
+                return True, None
+            samples = max(0, frame_samples * frames - _lame_padding(data, position, at_eof))
+            return True, samples / sample_rate
+
+    header = _window(data, offset + VBRI_OFFSET, 26, at_eof)
+    if len(header) == 26 and header.startswith(b"VBRI") and int.from_bytes(header[4:6], "big") == 1:
+        toc_entries = int.from_bytes(header[18:20], "big")
+        toc_entry_size = int.from_bytes(header[22:24], "big")
+        toc = _window(data, offset + VBRI_OFFSET + 26, toc_entries * toc_entry_size, at_eof)
+        if toc_entry_size in (2, 4) and len(toc) == toc_entries * toc_entry_size:
+            return True, frame_samples * int.from_bytes(header[14:18], "big") / sample_rate
+    return False, None
+
+
+def _parse_frame(data, offset, at_eof):
+    """
+    Parses the frame header at `offset`.
+
+    Returns:
+        tuple | None: (frame length in bytes, bitrate in bit/s, VBR header found, VBR length or None),
+                      None if there is no valid frame header.
+    """
+    header = _window(data, offset, 4, at_eof)
+    if len(header) < 4:
+        return None
+    value = int.from_bytes(header, "big")
+    version_bits, layer_bits = (value >> 19) & 0x3, (value >> 17) & 0x3
+    bitrate_index, sample_rate_index = (value >> 12) & 0xF, (value >> 10) & 0x3
+    if value >> 21 != 0x7FF or version_bits == 1 or layer_bits == 0 or sample_rate_index == 3 \
+            or bitrate_index in (0, 15):
+        return None
+    version, layer = MPEG_VERSIONS[version_bits], 4 - layer_bits
+    padding, mode = (value >> 9) & 0x1, (value >> 6) & 0x3
+    bitrate = BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    if layer == 1:
+        frame_samples, slot = 384, 4
+    elif version >= 2 and layer == 3:
+        frame_samples, slot = 576, 1
+    else:
+        frame_samples, slot = 1152, 1
+    frame_length = ((frame_samples // 8 * bitrate) // sample_rate + padding) * slot
+    has_vbr_header, vbr_length = False, None
+    if layer == 3:
+        has_vbr_header, vbr_length = _vbr_length(data, offset, version, mode, sample_rate, frame_samples, at_eof)
+    return frame_length, bitrate, has_vbr_header, vbr_length
+
+
+def _frames_at(data, offset, at_eof):
+    """
+    Parses up to ENOUGH_FRAMES consecutive frames from `offset`, stopping after a frame with a
+    VBR header. Returns [(offset, frame)] with the frames of _parse_frame().
+    """
+    frames = []
+    for _ in range(ENOUGH_FRAMES):
+        frame = _parse_frame(data, offset, at_eof)
+        if frame is None:
+            break
+        frames.append((offset, frame))
+        if frame[2]:
+            break
+        offset += frame[0]
+    return frames
+
+
+def _skip_id3v2(f):
+    """Returns the offset of the audio data after the ID3v2 tags (some writers stack several)."""
+    offset = 0
+    while True:
+        f.seek(offset)
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b"ID3":
+            return offset
+        size = 0
+        for value in header[6:10]:
+            size = (size << 7) | (value & 0x7F)
+        if size == 0:
+            return offset
+        offset += 10 + size
+
+
+def read_header_duration(path):
+    """
+    Returns the duration of an MP3 in seconds from its headers only: the frame count of a
+    Xing/Info or VBRI header (minus the LAME encoder delay and padding), or, without one, the
+    file size and the bitrate of the first frame. The ID3v2 tags are skipped, not read, and
+    at most HEADER_READ_SIZE bytes of audio are read. Frames are synced and validated by the
+    same rules as mutagen, so both give the same duration.
+
+    Returns:
+        float | None: The duration, None if the bytes read don't settle it (e.g. garbage
+                      before the first frame) or the file has no valid frames.
+
+    Raises:
+        OSError: If the file can't be read.
+    """
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        audio_offset = _skip_id3v2(f)
+        f.seek(audio_offset)
+        data = f.read(HEADER_READ_SIZE)
+    at_eof = audio_offset + len(data) >= file_size
+
+    try:
+        fallback = None  # (offset, bitrate) of the first sync with MIN_FRAMES frames, used if nothing better follows
+        syncs = 0
+        index = data.find(b"\xff")
+        while index != -1 and index + 1 < len(data):
+            if data[index + 1] & 0xE0 == 0xE0:
+                syncs += 1
+                if syncs >= MAX_SYNCS:
+                    return None
+                frames = _frames_at(data, index, at_eof)
+                if frames and frames[-1][1][2]:
+                    position, (_, bitrate, _, vbr_length) = frames[-1]
+                    if vbr_length is not None:
+                        return vbr_length
+                    return 8 * (file_size - audio_offset - position) / bitrate
+                if len(frames) >= ENOUGH_FRAMES:
+                    return 8 * (file_size - audio_offset - index) / frames[0][1][1]
+                if len(frames) >= MIN_FRAMES and fallback is None:
+                    fallback = (index, frames[0][1][1])
+            index = data.find(b"\xff", index + 1)
+    except _Undecided:
+        return None
+    if not at_eof or fallback is None:
+        return None  # mutagen would keep searching further into the file, or finds no frames at all
+    return 8 * (file_size - audio_offset - fallback[0]) / fallback[1]
+
+
+def mp3_duration(path):
+    """
+    Returns the duration of an MP3 in seconds, from its headers (read_header_duration()) or,
+    if they don't settle it, from mutagen.
+
+    Returns:
+        float | None: The duration, None if neither could read it (or mutagen isn't installed).
+
+    Raises:
+        OSError: If the file can't be read.
+    """
+    duration = read_header_duration(path)
+    if duration is not None or MP3 is None:
+        return duration
+    try:
+        return MP3(path).info.length
+    except OSError:
+        raise
+    except Exception:
+        return None
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+from mutagen.mp3 import MP3
+
+# Add Core to path so we can import ConfigManager, LogManager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from Core.ConfigManager import ConfigManager
+from Core.LogManager import LogManager
+from Core.Udio.Mp3Duration import BITRATES, SAMPLE_RATES, HEADER_READ_SIZE, read_header_duration, mp3_duration
+
+# --- Benchmark Configuration ---
+DEFAULT_FILES = 2000
+DEFAULT_SECONDS = 4
+CORPUS_SEED = 20240601
+REPORT_FILE = "mp3_duration_report.json"
+COVER_ART_SIZES = (64 * 1024, 256 * 1024)  # every fourth file carries cover art of this size range, as tagged libraries do
+# variant -> (MPEG version, layer, sample rate, bitrate(s) in kbps, channel mode, header); mode 3 is mono
+CORPUS_VARIANTS = {
+    "cbr": (1, 3, 44100, (128, 192, 256, 320), 1, None),
+    "cbr_mono": (1, 3, 32000, (64,), 3, None),
+    "mpeg2": (2, 3, 22050, (64,), 0, None),
+    "mpeg25": (2.5, 3, 11025, (32,), 3, None),
+    "layer2": (1, 2, 48000, (192,), 0, None),
+    "xing_vbr": (1, 3, 44100, (96, 128, 160, 192, 256), 1, "Xing"),
+    "info_cbr": (1, 3, 44100, (160,), 1, "Info"),
+    "vbri": (1, 3, 44100, (112, 128, 160, 192), 1, "VBRI"),
+    "vbr_no_header": (1, 3, 44100, (96, 128, 160, 192, 256), 1, None),
+    "junk_before_audio": (1, 3, 44100, (128,), 1, None),  # more garbage than the header reader reads, falls back
+}
+ENCODER_DELAY, ENCODER_PADDING = 576, 1105  # written into the LAME tags
+MIN_FRAMES_WRITTEN = 8  # even the shortest synthetic file has more frames than a reader needs to sync
+
+
+def frame_header(version, layer, bitrate, sample_rate, mode):
+    """Returns (4 header bytes, frame length in bytes, samples per frame) of an MPEG audio frame without CRC or padding."""
+    version_bits = {1: 3, 2: 2, 2.5: 0}[version]
+    bitrate_index = BITRATES[(version, layer)].index(bitrate)
+    value = (0x7FF << 21) | (version_bits << 19) | ((4 - layer) << 17) | (1 << 16) | (bitrate_index << 12) \
+        | (SAMPLE_RATES[version].index(sample_rate) << 10) | (mode << 6)
+    if layer == 1:
+        frame_samples, slot = 384, 4
+    elif version >= 2 and layer == 3:
+        frame_samples, slot = 576, 1
+    else:
+        frame_samples, slot = 1152, 1
+    return value.to_bytes(4, "big"), (frame_samples // 8 * bitrate * 1000) // sample_rate * slot, frame_samples
+
+
+def id3v2_tag(title, cover_art_size, rng):
+    """Returns an ID3v2.3 tag with a title and, if cover_art_size > 0, an APIC frame of random bytes."""
+    frames = b""
+    text = b"\x00" + title.encode("latin-1")
+    frames += b"TIT2" + len(text).to_bytes(4, "big") + b"\x00\x00" + text
+    if cover_art_size:
+        picture = b"\x00image/jpeg\x00\x03\x00" + rng.randbytes(cover_art_size)
+        frames += b"APIC" + len(picture).to_bytes(4, "big") + b"\x00\x00" + picture
+    frames += bytes(1024)  # padding, as taggers leave it
+    size = len(frames)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x03\x00\x00" + syncsafe + frames
+
+
+def _vbr_header_frame(kind, header, frame_length, mode, frame_count, audio_bytes):
+    """Returns the first frame of a VBR stream carrying a Xing/Info (with LAME tag) or VBRI header."""
+    data = bytearray(frame_length)
+    data[0:4] = header
+    if kind == "VBRI":
+        toc = bytes(200)  # 100 entries of 2 bytes
+        data[36:36 + 26 + len(toc)] = b"VBRI" + (1).to_bytes(2, "big") + bytes(2) + (75).to_bytes(2, "big") \
+            + audio_bytes.to_bytes(4, "big") + frame_count.to_bytes(4, "big") + (100).to_bytes(2, "big") \
+            + (1).to_bytes(2, "big") + (2).to_bytes(2, "big") + max(1, frame_count // 100).to_bytes(2, "big") + toc
+        return bytes(data)
+    offset = 36 if mode != 3 else 21  # MPEG-1
+    fields = kind.encode("ascii") + (0xF).to_bytes(4, "big") + frame_count.to_bytes(4, "big") \
+        + audio_bytes.to_bytes(4, "big") + bytes(range(100)) + (50).to_bytes(4, "big")
+    lame_tag = bytearray(27)
+    lame_tag[0] = 0x03  # revision 0, VBR method 3
+    delay_padding = (ENCODER_DELAY << 12) | ENCODER_PADDING
+    lame_tag[12:15] = delay_padding.to_bytes(3, "big")
+    fields += b"LAME3.100" + bytes(lame_tag)
+    data[offset:offset + len(fields)] = fields
+    return bytes(data)
+
+
+def synthetic_mp3(variant, seconds, rng):
+    """
+    Returns the bytes of a synthetic MP3 of one corpus variant: valid frame headers with random
+    payloads (nothing a player would enjoy, but every duration reader parses it like real audio).
+    """
+    version, layer, sample_rate, bitrates, mode, header_kind = CORPUS_VARIANTS[variant]
+    _, _, frame_samples = frame_header(version, layer, bitrates[0], sample_rate, mode)
+    frame_count = max(MIN_FRAMES_WRITTEN, int(seconds * sample_rate / frame_samples))
+    bitrate = rng.choice(bitrates)
+    frames = []
+    for _ in range(frame_count):
+        if header_kind in ("Xing", "VBRI") or variant == "vbr_no_header":
+            bitrate = rng.choice(bitrates)
+        header, frame_length, _ = frame_header(version, layer, bitrate, sample_rate, mode)
+        frames.append(header + rng.randbytes(frame_length - 4))
+    audio = b"".join(frames)
+    if header_kind is not None:
+        header, frame_length, _ = frame_header(version, layer, bitrates[0], sample_rate, mode)
+        audio = _vbr_header_frame(header_kind, header, frame_length, mode, frame_count, len(audio) + frame_length) + audio
+    if variant == "junk_before_audio":
+        audio = rng.randbytes(2 * HEADER_READ_SIZE) + audio
+    return audio
+
+
+class Mp3DurationBenchmark:
+    """
+    Compares the header-only MP3 duration reader (Mp3Duration.py) with mutagen on a synthetic,
+    deterministic corpus: CBR and VBR streams of every MPEG version, layer II, Xing/Info (with
+    LAME tags) and VBRI headers, garbage before the audio, ID3v2 tags with and without cover art
+    and ID3v1 tags. Reports the time of both readers, how often the header reader had to fall
+    back to mutagen and every file where the two disagree.
+    """
+    def __init__(self, files=DEFAULT_FILES, seconds=DEFAULT_SECONDS, global_log_level=None):
+        """
+        Initializes the benchmark.
+
+        Args:
+            files (int): Number of synthetic MP3s, spread evenly over the corpus variants.
+            seconds (float): Audio length of each MP3 (only file sizes depend on it, neither reader reads the audio).
+            global_log_level (str, optional): Log level of the report. Defaults to the config setting.
+        """
+        self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+        self.files = files
+        self.seconds = seconds
+
+        # Initialize ConfigManager
+        self.config_manager = ConfigManager()
+        self.config = self.config_manager.load_config()
+
+        # Initialize LogManager
+        self.log_manager = LogManager(self.config.get("log_level", "verbose"))
+        if global_log_level != None:
+            self.log_manager.globalLogLevel = global_log_level
+
+        cache_folder = self.config.get("udio_cache_folder", "Temp/Udio")
+        self.benchmark_folder = os.path.join(self.project_root, cache_folder, "Benchmark")
+        self.corpus_folder = os.path.join(self.benchmark_folder, "Mp3Corpus")
+
+    def generate_corpus(self):
+        """
+        Writes the synthetic MP3s into the corpus folder (replacing an older corpus).
+
+        Returns:
+            list[tuple[str, str]]: (variant, path) of every MP3.
+        """
+        self.log_manager.log("normal", f"🧪 Generating {self.files} synthetic MP3s ({self.seconds} s each) in: {self.corpus_folder}")
+        shutil.rmtree(self.corpus_folder, ignore_errors=True)
+        os.makedirs(self.corpus_folder)
+        rng = random.Random(CORPUS_SEED)
+        variants = list(CORPUS_VARIANTS)
+        corpus = []
+        for index in range(self.files):
+            variant = variants[index % len(variants)]
+            cover_art_size = rng.randint(*COVER_ART_SIZES) if index % 4 == 0 else 0
+            data = synthetic_mp3(variant, self.seconds, rng)
+            if index % 5 != 4:
+                data = id3v2_tag(f"Track {index}", cover_art_size, rng) + data
+            if index % 7 == 0:
+                data = id3v2_tag(f"Stacked {index}", 0, rng) + data  # some writers stack tags
+            if index % 3 == 0:
+                data += b"TAG" + f"Track {index}".encode("latin-1").ljust(125, b"\x00")  # ID3v1
+            path = os.path.join(self.corpus_folder, f"{index:05d}_{variant}.mp3")
+            with open(path, "wb") as f:
+                f.write(data)
+            corpus.append((variant, path))
+        return corpus
+
+    @staticmethod
+    def _mutagen_duration(path):
+        try:
+            return MP3(path).info.length
+        except Exception:
+            return None
+
+    def _time_reader(self, reader, corpus):
+        """Runs reader(path) on every file. Returns ({path: duration}, seconds)."""
+        start = time.perf_counter()
+        durations = {path: reader(path) for _, path in corpus}
+        return durations, time.perf_counter() - start
+
+    def run(self):
+        """
+        Generates the corpus, times both readers and compares their durations, logs a summary
+        and writes the JSON report.
+
+        Returns:
+            dict: The report. report["passed"] is False if any duration differs from mutagen's.
+        """
+        self.log_manager.log("important", "=" * 40)
+        self.log_manager.log("important", "🚀 Starting MP3 Duration Benchmark")
+        self.log_manager.log("important", "=" * 40)
+
+        corpus = self.generate_corpus()
+        # The corpus was just written, so both readers run on a warm page cache and measure
+        # parsing and system calls; on a network share the bytes read matter even more
+        mutagen_durations, mutagen_seconds = self._time_reader(self._mutagen_duration, corpus)
+        header_durations, header_seconds = self._time_reader(read_header_duration, corpus)
+        durations, total_seconds = self._time_reader(mp3_duration, corpus)
+
+        variants = {}
+        mismatches = []
+        for variant, path in corpus:
+            stats = variants.setdefault(variant, {"files": 0, "fallbacks": 0, "mismatches": 0})
+            stats["files"] += 1
+            if header_durations[path] is None:
+                stats["fallbacks"] += 1
+            expected, duration = mutagen_durations[path], durations[path]
+            if (expected is None) != (duration is None) or (expected is not None and abs(expected - duration) > 1e-9):
+                stats["mismatches"] += 1
+                mismatches.append({"file": os.path.basename(path), "mutagen": expected, "header": duration})
+
+        report = {
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "parameters": {"files": self.files, "seconds": self.seconds, "header_read_size": HEADER_READ_SIZE},
+            "mutagen_seconds": round(mutagen_seconds, 4),
+            "header_seconds": round(header_seconds, 4),
+            "with_fallback_seconds": round(total_seconds, 4),
+            "speedup": round(mutagen_seconds / total_seconds, 1) if total_seconds > 0 else None,
+            "variants": variants,
+            "mismatches": mismatches,
+            "passed": not mismatches,
+        }
+
+        for variant, stats in variants.items():
+            self.log_manager.log("normal", f"    {variant:<18} {stats['files']} files, {stats['fallbacks']} fell back to mutagen, "
+                                           f"{stats['mismatches']} mismatches")
+        self.log_manager.log("normal", f"\n⏱️ mutagen {mutagen_seconds:.3f} s, header reader {header_seconds:.3f} s, "
+                                       f"with fallback {total_seconds:.3f} s ({report['speedup']}x faster)")
+        for mismatch in mismatches[:10]:
+            self.log_manager.log("important", f"❌ {mismatch['file']}: mutagen {mismatch['mutagen']}, header reader {mismatch['header']}")
+
+        report_path = os.path.join(self.benchmark_folder, REPORT_FILE)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+        self.log_manager.log("important", "=" * 40)
+        self.log_manager.log("important", "🏁 Benchmark Complete" + (" ✅ all durations match mutagen" if report["passed"] else " ❌ durations differ"))
+        self.log_manager.log("important", f"📄 Report: {report_path}")
+        self.log_manager.log("important", "=" * 40)
+        return report
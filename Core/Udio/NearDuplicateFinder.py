@@ -0,0 +1,316 @@
+import os
+import itertools
+import shutil
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pydub import AudioSegment
+
+FINGERPRINT_VERSION = 1  # first byte of every stored fingerprint; a change makes the cached ones recomputed
+FINGERPRINT_RATE = 11025  # tracks are decoded to mono at this rate, chroma needs nothing above ~5 kHz
+FRAME_SIZE = 4096  # samples per chroma frame (0.37 s): fingerprints are downsampled chroma
+CHROMA_RANGE = (110.0, 5000.0)  # Hz; below it the FFT bins are wider than a semitone
+MAX_FINGERPRINT_SECONDS = 900
+MIN_FINGERPRINT_FRAMES = 16  # shorter tracks (~6 s) aren't compared
+SILENCE_LEVEL = 1e-6  # frames this far below the loudest frame of the track count as silence
+LOG_FLOOR = 1e-4  # chroma is log-compressed from this level (relative to the track's loudest pitch class) up
+LSH_WINDOW = 16  # frames (6 s) per hashed window; a window starts at every frame, so shifted variants share windows
+LSH_BANDS = 8  # every window is hashed into LSH_BANDS buckets of LSH_BITS random hyperplane signs
+LSH_BITS = 32
+LSH_SEED = 20240701
+LSH_MAX_BUCKET = 50  # buckets shared by more tracks (silence, stock intros) say nothing and are skipped
+MIN_SHARED_BUCKETS = 0.004  # share of its buckets a track must share with another to be compared with it
+MAX_OFFSET_SECONDS = 30.0  # largest shift between two variants (e.g. a cut beginning) the comparison finds
+MIN_OVERLAP = 0.5  # share of the shorter track that must overlap at the best offset
+DEFAULT_MIN_SIMILARITY = 0.75  # re-encodes score ~1.0, cut or re-mixed variants ~0.9, unrelated songs ~0.5 at most
+DEFAULT_FINGERPRINT_WORKERS = 4  # ffmpeg decodes in its own process, numpy's FFT releases the GIL
+
+
+class DecoderUnavailableError(OSError):
+    """ffmpeg (AudioSegment.converter) is not installed or can't be started."""
+
+
+class UndecodableFileError(OSError):
+    """ffmpeg ran but rejected the file (non-zero exit code)."""
+
+
+def decode_mono(path):
+    """
+    Decodes an audio file with ffmpeg to float32 mono samples at FINGERPRINT_RATE.
+
+    Raises:
+        DecoderUnavailableError: If ffmpeg can't be started.
+        UndecodableFileError: If ffmpeg can't decode the file.
+    """
+    command = [AudioSegment.converter, "-v", "error", "-i", path, "-t", str(MAX_FINGERPRINT_SECONDS),
+               "-ac", "1", "-ar", str(FINGERPRINT_RATE), "-f", "s16le", "pipe:1"]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise DecoderUnavailableError(f"could not start ffmpeg ({AudioSegment.converter}): {e}") from e
+    if result.returncode != 0:
+        message = result.stderr.decode(errors="replace").strip().splitlines()
+        raise UndecodableFileError(f"ffmpeg could not decode it: {message[-1] if message else result.returncode}")
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def decoder_available():
+    """True if ffmpeg (AudioSegment.converter, a command name or a path) can be found."""
+    return bool(AudioSegment.converter) and shutil.which(AudioSegment.converter) is not None
+
+
+def _chroma_filters():
+    """Returns the (FFT bins, 12) matrix summing the power of each bin into its pitch class."""
+    frequencies = np.fft.rfftfreq(FRAME_SIZE, 1.0 / FINGERPRINT_RATE)
+    filters = np.zeros((len(frequencies), 12), dtype=np.float32)
+    in_range = (frequencies >= CHROMA_RANGE[0]) & (frequencies <= CHROMA_RANGE[1])
+    pitch_classes = np.rint(12 * np.log2(frequencies[in_range] / 440.0) + 69).astype(int) % 12
+    filters[np.flatnonzero(in_range), pitch_classes] = 1.0
+    return filters
+
+
+def chroma_fingerprint(samples):
+    """
+    Computes the fingerprint of mono samples: one 12-bin chroma vector per FRAME_SIZE samples,
+    log-compressed (so a louder or quieter stem in a re-mix shifts it little), centered and
+    L2-normalized (so gain doesn't matter), quantized to int8. Silent frames are all zeros.
+
+    Returns:
+        numpy.ndarray: (frames, 12) int8 array.
+    """
+    frame_count = len(samples) // FRAME_SIZE
+    frames = samples[:frame_count * FRAME_SIZE].reshape(frame_count, FRAME_SIZE) * np.hanning(FRAME_SIZE).astype(np.float32)
+    chroma = (np.abs(np.fft.rfft(frames, axis=1)) ** 2).astype(np.float32) @ _chroma_filters()
+    energy = chroma.sum(axis=1)
+    audible = energy > SILENCE_LEVEL * (energy.max() if frame_count else 0.0)
+    chroma = np.log1p(chroma / max(float(chroma.max()) if frame_count else 0.0, 1e-20) / LOG_FLOOR)
+    chroma = chroma / np.maximum(chroma.sum(axis=1, keepdims=True), 1e-20) - 1.0 / 12  # pitch class distribution around its mean
+    norms = np.linalg.norm(chroma, axis=1, keepdims=True)
+    chroma = np.where(audible[:, None] & (norms > 0), chroma / np.maximum(norms, 1e-20), 0.0)
+    return np.rint(chroma * 127).astype(np.int8)
+
+
+def encode_fingerprint(fingerprint):
+    """Returns the bytes a fingerprint is stored as (version byte + int8 chroma)."""
+    return bytes([FINGERPRINT_VERSION]) + fingerprint.tobytes()
+
+
+def decode_fingerprint(data):
+    """Returns the fingerprint stored in bytes, or None if it was made by another fingerprint version."""
+    if not data or data[0] != FINGERPRINT_VERSION:
+        return None
+    return np.frombuffer(data, dtype=np.int8, offset=1).reshape(-1, 12)
+
+
+def fingerprint_similarity(first, second, max_offset_frames):
+    """
+    Compares two fingerprints at every time offset up to max_offset_frames (one matrix product,
+    the diagonals of which are summed with a bincount): the similarity at an offset is the mean
+    correlation of the overlapping chroma frames.
+
+    Returns:
+        tuple[float, int]: (best similarity in -1..1, its offset in frames; positive if the second
+                           track starts later in the music).
+    """
+    a = first.astype(np.float32) / 127
+    b = second.astype(np.float32) / 127
+    products = a @ b.T
+    both_audible = np.outer(a.any(axis=1), b.any(axis=1))
+    diagonals = (np.arange(len(a))[:, None] - np.arange(len(b))[None, :] + len(b) - 1).ravel()
+    sums = np.bincount(diagonals, weights=products.ravel(), minlength=len(a) + len(b) - 1)
+    counts = np.bincount(diagonals, weights=both_audible.ravel(), minlength=len(a) + len(b) - 1)
+    offsets = np.arange(len(a) + len(b) - 1) - (len(b) - 1)
+    min_overlap = MIN_OVERLAP * min(np.count_nonzero(a.any(axis=1)), np.count_nonzero(b.any(axis=1)))
+    valid = (np.abs(offsets) <= max_offset_frames) & (counts >= max(min_overlap, 1))
+    if not valid.any():
+        return 0.0, 0
+    scores = np.where(valid, sums / np.maximum(counts, 1), -np.inf)
+    best = int(np.argmax(scores))
+    return min(float(scores[best]), 1.0), int(offsets[best])  # int8 rounding can push identical tracks above 1
+
+
+def window_hashes(fingerprint, planes):
+    """
+    Returns the LSH buckets of a fingerprint: every window of LSH_WINDOW audible frames is
+    hashed by the signs of its projections on random hyperplanes, LSH_BITS signs per band.
+    Windows that correlate strongly (the same music, even re-encoded or re-mixed) mostly
+    land in the same bucket in at least one band.
+
+    Returns:
+        numpy.ndarray: Sorted unique int64 bucket keys (band in the high bits).
+    """
+    a = fingerprint.astype(np.float32) / 127
+    windows = np.lib.stride_tricks.sliding_window_view(a, (LSH_WINDOW, 12))[:, 0].reshape(-1, LSH_WINDOW * 12)
+    audible = np.lib.stride_tricks.sliding_window_view(a.any(axis=1), LSH_WINDOW).all(axis=1)
+    signs = (windows[audible] @ planes > 0).reshape(-1, LSH_BANDS, LSH_BITS)
+    keys = signs.astype(np.int64) @ (1 << np.arange(LSH_BITS, dtype=np.int64))
+    return np.unique(keys + (np.arange(LSH_BANDS, dtype=np.int64) << LSH_BITS))
+
+
+class NearDuplicateFinder:
+    """
+    Finds tracks that sound the same although their files differ: re-encodes, re-mixes and
+    numbered copies of the same generation. Every track gets an acoustic fingerprint
+    (downsampled chroma, computed with NumPy from an 11 kHz mono decode), cached in the track
+    catalog per file version.
+
+    Instead of comparing every pair, the fingerprints go into a locality-sensitive hash index:
+    every 6-second window of each fingerprint is hashed into buckets by random hyperplane
+    signs, and only tracks sharing enough buckets are compared, so the work grows roughly
+    linearly with the library. Candidates are compared at every offset up to MAX_OFFSET_SECONDS
+    and pairs at or above the minimum similarity are joined into clusters.
+
+    After a run, `stats` holds the number of fingerprinted, cached, candidate and matching pairs.
+    """
+    def __init__(self, catalog=None, workers=None, min_similarity=None):
+        """
+        Args:
+            catalog (TrackCatalog, optional): Catalog the files come from, used to reuse and store fingerprints.
+            workers (int, optional): Tracks decoded in parallel. Defaults to DEFAULT_FINGERPRINT_WORKERS.
+            min_similarity (float, optional): Similarity (mean chroma correlation, up to 1.0) from which two
+                                              tracks are near-duplicates. Defaults to DEFAULT_MIN_SIMILARITY.
+        """
+        self.catalog = catalog
+        self.workers = workers or DEFAULT_FINGERPRINT_WORKERS
+        self.min_similarity = min_similarity or DEFAULT_MIN_SIMILARITY
+        self.stats = {}
+        self.errors = []  # (path, error) of files that couldn't be decoded; they are left out
+
+    @staticmethod
+    def _fingerprint_file(path):
+        """
+        Returns (fingerprint, (size, mtime_ns, inode) before decoding, decode error or None) of a
+        file; a file ffmpeg rejected gets an empty fingerprint. DecoderUnavailableError and other
+        OSErrors (e.g. a file deleted meanwhile) are raised.
+        """
+        stat = os.stat(path)
+        state = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        try:
+            return chroma_fingerprint(decode_mono(path)), state, None
+        except UndecodableFileError as e:
+            return np.zeros((0, 12), dtype=np.int8), state, e
+
+    def fingerprints(self, files):
+        """
+        Returns the fingerprints of files, from the catalog or computed in a thread pool
+        (and stored). Files ffmpeg rejects are listed in `errors` and get an empty
+        fingerprint, stored too, so they aren't decoded again until they change. Files that
+        couldn't be read are listed in `errors` only, and retried next time.
+
+        Args:
+            files (list[CatalogFile]): Files to fingerprint.
+
+        Returns:
+            dict: path -> fingerprint ((frames, 12) int8 array).
+
+        Raises:
+            DecoderUnavailableError: If ffmpeg can't be started (nothing is stored then).
+        """
+        fingerprints = {}
+        if self.catalog is not None:
+            for path, data in self.catalog.load_fingerprints(files).items():
+                fingerprint = decode_fingerprint(data)
+                if fingerprint is not None:
+                    fingerprints[path] = fingerprint
+        self.stats["reused"] = len(fingerprints)
+        missing = [file for file in files if file.path not in fingerprints]
+        if missing and not decoder_available():
+            raise DecoderUnavailableError(f"ffmpeg ({AudioSegment.converter}) was not found")
+        entries = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="NearDuplicateFinder") as executor:
+            futures = {executor.submit(self._fingerprint_file, file.path): file for file in missing}
+            for future, file in futures.items():
+                try:
+                    fingerprint, state, error = future.result()
+                except DecoderUnavailableError:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                except OSError as e:
+                    self.errors.append((file.path, e))
+                    continue
+                if error is not None:
+                    self.errors.append((file.path, error))
+                fingerprints[file.path] = fingerprint
+                if state == (file.size, file.mtime_ns, file.inode):
+                    entries.append((file, encode_fingerprint(fingerprint)))
+        if self.catalog is not None and entries:
+            self.catalog.store_fingerprints(entries)
+        self.stats["fingerprinted"] = len(missing) - len(self.errors)
+        return fingerprints
+
+    @staticmethod
+    def candidate_pairs(fingerprints):
+        """
+        Returns the index pairs (i < j) of fingerprints that share at least MIN_SHARED_BUCKETS
+        of their LSH buckets. The buckets of all tracks are sorted once and only tracks within
+        the same bucket are counted, so the work grows with the number of windows, not pairs.
+
+        Args:
+            fingerprints (list[numpy.ndarray]): Fingerprints of at least LSH_WINDOW frames.
+        """
+        planes = np.random.default_rng(LSH_SEED).standard_normal((LSH_WINDOW * 12, LSH_BANDS * LSH_BITS)).astype(np.float32)
+        bucket_sets = [window_hashes(fingerprint, planes) for fingerprint in fingerprints]
+        if len(bucket_sets) < 2:
+            return set()
+        keys = np.concatenate(bucket_sets)
+        tracks = np.repeat(np.arange(len(bucket_sets)), [len(buckets) for buckets in bucket_sets])
+        order = np.argsort(keys, kind="stable")  # stable: the tracks of a bucket stay in ascending order
+        keys, tracks = keys[order], tracks[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        shared = Counter()
+        for start, size in zip(starts.tolist(), sizes.tolist()):
+            if 1 < size <= LSH_MAX_BUCKET:
+                shared.update(itertools.combinations(tracks[start:start + size].tolist(), 2))
+        return {(i, j) for (i, j), count in shared.items()
+                if count >= max(2, MIN_SHARED_BUCKETS * min(len(bucket_sets[i]), len(bucket_sets[j])))}
+
+    def find(self, files):
+        """
+        Returns the clusters of near-duplicate tracks.
+
+        Args:
+            files (list[CatalogFile]): Files to compare.
+
+        Returns:
+            list[dict]: One dict per cluster, ordered by their first file: "files" (paths in the
+                        order of `files`) and "pairs" (path, path, similarity, offset in seconds)
+                        of the matching pairs that joined it, most similar first.
+        """
+        self.errors = []
+        self.stats = {"files": len(files)}
+        fingerprints = self.fingerprints(files)
+        order = {file.path: index for index, file in enumerate(files)}
+        paths = [file.path for file in files
+                 if file.path in fingerprints and len(fingerprints[file.path]) >= MIN_FINGERPRINT_FRAMES]
+        candidates = self.candidate_pairs([fingerprints[path] for path in paths])
+        self.stats["candidates"] = len(candidates)
+        self.stats["all_pairs"] = len(paths) * (len(paths) - 1) // 2
+
+        max_offset_frames = int(MAX_OFFSET_SECONDS * FINGERPRINT_RATE / FRAME_SIZE)
+        parents = list(range(len(paths)))
+
+        def root(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        matches = []
+        for i, j in sorted(candidates):
+            similarity, offset = fingerprint_similarity(fingerprints[paths[i]], fingerprints[paths[j]], max_offset_frames)
+            if similarity >= self.min_similarity:
+                matches.append((i, (paths[i], paths[j], round(similarity, 3), round(offset * FRAME_SIZE / FINGERPRINT_RATE, 1))))
+                parents[root(j)] = root(i)
+        self.stats["matches"] = len(matches)
+
+        members, pairs = {}, {}
+        for index, path in enumerate(paths):
+            members.setdefault(root(index), []).append(path)
+        for index, match in matches:
+            pairs.setdefault(root(index), []).append(match)
+        clusters = [{"files": sorted(members[key], key=order.get), "pairs": sorted(pairs[key], key=lambda match: -match[2])}
+                    for key in pairs]
+        return sorted(clusters, key=lambda cluster: order[cluster["files"][0]])
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+
+JOURNAL_VERSION = 1
+
+
+class RunJournal:
+    """
+    Crash-safe record of the last MixTracks run, as a JSON Lines file. run() writes a
+    "start" line with the tracks it is about to process, then one line per track as soon
+    as it completes (its result and the mix manifest entry of a successful mix),
+    and an "end" line when the run finishes. Every line is flushed and fsynced, so after
+    a crash, a kill or a reboot the journal tells exactly which tracks were done.
+    A torn last line (the process died while writing it) is ignored when loading.
+
+    The journal only keeps the last run: a new run replaces it, a resumed run appends to it.
+    """
+    def __init__(self, journal_path, project_root, log_manager):
+        """
+        Initializes the journal and loads the last run from disk if it exists.
+
+        Args:
+            journal_path (str): Absolute path of the journal file.
+            project_root (str): Project root, track paths are stored relative to it.
+            log_manager (LogManager): Logger of the owning module.
+        """
+        self.journal_path = journal_path
+        self.project_root = project_root
+        self.log_manager = log_manager
+        self.file = None
+        self.started = None  # start time of the journaled run
+        self.settings = {}  # run settings stored in its "start" line
+        self.tracks = []  # track keys of the journaled run, in processing order
+        self.outcomes = {}  # track key -> latest journaled line of the track
+        self.finished = False
+        self.load()
+
+    def load(self):
+        """Loads the last journaled run. A missing or unreadable journal is treated as empty."""
+        self.started = None
+        self.settings = {}
+        self.tracks = []
+        self.outcomes = {}
+        self.finished = False
+        if not os.path.exists(self.journal_path):
+            return
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError as e:
+            self.log_manager.log("important", f"⚠️ Could not read mix journal {self.journal_path}: {e}")
+            return
+        for line_number, line in enumerate(lines, start=1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if line_number == len(lines):
+                    break  # torn write of the last line, the track it described is simply not done
+                self.log_manager.log("important", f"⚠️ Skipping unreadable line {line_number} of mix journal {self.journal_path}")
+                continue
+            event = entry.get("event")
+            if event == "start":
+                if entry.get("version") != JOURNAL_VERSION:
+                    self.log_manager.log("normal", f"⚠️ Mix journal version changed, ignoring: {self.journal_path}")
+                    self.started = None
+                    return
+                self.started = entry.get("started")
+                self.settings = entry.get("settings", {})
+                self.tracks = entry.get("tracks", [])
+                self.outcomes = {}
+                self.finished = False
+            elif event == "resume":
+                self.finished = False
+            elif event == "track":
+                self.outcomes[entry["track"]] = entry
+            elif event == "end":
+                self.finished = True
+
+    @property
+    def exists(self):
+        """True if a run was journaled."""
+        return self.started is not None
+
+    def _key(self, track_json_path):
+        return os.path.relpath(track_json_path, self.project_root).replace("\\", "/")
+
+    def _path(self, key):
+        return os.path.join(self.project_root, *key.split("/"))
+
+    def track_paths(self):
+        """Returns the track JSON paths of the journaled run, in their original order."""
+        return [self._path(key) for key in self.tracks]
+
+    def pending_tracks(self):
+        """Returns the track JSON paths of the journaled run that never completed, in their original order."""
+        return [self._path(key) for key in self.tracks if key not in self.outcomes]
+
+    def failed_tracks(self):
+        """Returns the track JSON paths whose latest journaled result is an error."""
+        return [self._path(key) for key in self.tracks
+                if key in self.outcomes and self.outcomes[key].get("result") == "error"]
+
+    def manifest_entries(self):
+        """Returns {track JSON path: mix manifest entry} of every journaled successful mix."""
+        return {self._path(key): entry["manifest"] for key, entry in self.outcomes.items()
+                if entry.get("result") == "success" and entry.get("manifest")}
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def start(self, track_json_paths, settings):
+        """
+        Starts journaling a new run, replacing the previous journal.
+
+        Args:
+            track_json_paths (list[str]): Tracks the run is going to process.
+            settings (dict): Run settings stored in the "start" line, for reference.
+        """
+        self.close()
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.settings = settings
+        self.tracks = [self._key(path) for path in track_json_paths]
+        self.outcomes = {}
+        self.finished = False
+        # The start line goes through a temp file, so a crash here leaves the old journal intact
+        temp_path = self.journal_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"event": "start", "version": JOURNAL_VERSION, "started": self.started,
+                                    "settings": settings, "tracks": self.tracks}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.journal_path)
+            self.file = open(self.journal_path, "a", encoding="utf-8")
+        except OSError as e:
+            self.log_manager.log("important", f"⚠️ Could not write mix journal {self.journal_path}, the run can't be resumed: {e}")
+
+    def resume(self, track_json_paths):
+        """
+        Continues journaling the loaded run.
+
+        Args:
+            track_json_paths (list[str]): Tracks the resumed run is going to process.
+        """
+        self.close()
+        self.finished = False
+        try:
+            self.file = open(self.journal_path, "a", encoding="utf-8")
+            self._write({"event": "resume", "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                         "tracks": [self._key(path) for path in track_json_paths]})
+        except OSError as e:
+            self.log_manager.log("important", f"⚠️ Could not write mix journal {self.journal_path}: {e}")
+
+    def record(self, track_json_path, result, manifest_entry=None):
+        """
+        Journals the outcome of one track as soon as it completed.
+
+        Args:
+            track_json_path (str): The track JSON file.
+            result (str): Run report name of the result ("success", "up_to_date", "ignored" or "error").
+            manifest_entry (dict, optional): Mix manifest entry of a successful mix.
+        """
+        key = self._key(track_json_path)
+        entry = {"event": "track", "track": key, "result": result, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        if manifest_entry:
+            entry["manifest"] = manifest_entry
+        self.outcomes[key] = entry
+        if self.file is not None:
+            try:
+                self._write(entry)
+            except OSError as e:
+                self.log_manager.log("important", f"⚠️ Could not write mix journal {self.journal_path}: {e}")
+
+    def finish(self, counts):
+        """Marks the run as finished and closes the journal."""
+        if self.file is not None:
+            try:
+                self._write({"event": "end", "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "counts": counts})
+            except OSError as e:
+                self.log_manager.log("important", f"⚠️ Could not write mix journal {self.journal_path}: {e}")
+        self.finished = True
+        self.close()
+
+    def close(self):
+        """Closes the journal file without marking the run as finished."""
+        if self.file is not None:
+            file, self.file = self.file, None
+            file.close()
@@ -0,0 +1,134 @@
+import os
+import json
+import shutil
+import numpy as np
+from pydub import AudioSegment
+
+STEM_CACHE_VERSION = 1
+META_FILE = "meta.json"
+
+
+class StemCache:
+    """
+    On-disk cache of decoded stems, keyed by the content hash of the source ZIP.
+    Every ZIP gets one entry folder holding its stems as .npy files (integer samples,
+    shape (frames, channels)) plus a meta.json with their sample rates. Entries are
+    evicted least recently used first once the cache grows beyond its size budget.
+    Entries are written to a temp folder and renamed into place, so concurrent worker
+    processes never see a half-written entry.
+    """
+    def __init__(self, cache_folder, max_bytes, log_manager):
+        """
+        Initializes the cache.
+
+        Args:
+            cache_folder (str): Absolute path of the cache folder.
+            max_bytes (int): Size budget of the cache in bytes.
+            log_manager (LogManager): Logger of the owning module.
+        """
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.log_manager = log_manager
+
+    def _entry_path(self, zip_hash):
+        return os.path.join(self.cache_folder, zip_hash)
+
+    def load(self, zip_hash, stem_names):
+        """
+        Loads the stems of a ZIP from the cache and marks the entry as recently used.
+
+        Args:
+            zip_hash (str): Content hash of the source ZIP.
+            stem_names (list[str]): Stems to load.
+
+        Returns:
+            dict | None: Stem name -> AudioSegment, or None if the entry is missing,
+                         incomplete or unreadable (an unreadable entry is removed).
+        """
+        entry_path = self._entry_path(zip_hash)
+        meta_path = os.path.join(entry_path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != STEM_CACHE_VERSION or any(name not in meta["stems"] for name in stem_names):
+                return None
+            stems = {}
+            for name in stem_names:
+                # Memory-mapped, so only the pages of the sample data are read, once, into the segment
+                samples = np.load(os.path.join(entry_path, name + ".npy"), mmap_mode="r")
+                stems[name] = AudioSegment(data=samples.tobytes(),
+                                           sample_width=samples.dtype.itemsize,
+                                           frame_rate=meta["stems"][name]["frame_rate"],
+                                           channels=samples.shape[1])
+                del samples
+            os.utime(meta_path)  # LRU: last use is the mtime of meta.json
+            return stems
+        except Exception as e:
+            self.log_manager.log("important", f"⚠️ Unreadable stem cache entry {entry_path}, removing it: {e}")
+            shutil.rmtree(entry_path, ignore_errors=True)
+            return None
+
+    def store(self, zip_hash, stems):
+        """
+        Stores decoded stems of a ZIP, then evicts old entries beyond the size budget.
+        Stems larger than the whole budget are not cached.
+
+        Args:
+            zip_hash (str): Content hash of the source ZIP.
+            stems (dict): Stem name -> AudioSegment.
+        """
+        entry_path = self._entry_path(zip_hash)
+        if os.path.exists(entry_path):
+            return
+        entry_size = sum(len(segment.raw_data) for segment in stems.values())
+        if entry_size > self.max_bytes:
+            self.log_manager.log("verbose", f"    ℹ️ Stems too large for the stem cache budget, not cached")
+            return
+
+        temp_path = f"{entry_path}.tmp-{os.getpid()}"
+        try:
+            os.makedirs(temp_path, exist_ok=True)
+            meta = {"version": STEM_CACHE_VERSION, "stems": {}}
+            for name, segment in stems.items():
+                samples = np.frombuffer(segment.raw_data, dtype=f"<i{segment.sample_width}")
+                np.save(os.path.join(temp_path, name + ".npy"), samples.reshape(-1, segment.channels))
+                meta["stems"][name] = {"frame_rate": segment.frame_rate}
+            with open(os.path.join(temp_path, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=4)
+            os.replace(temp_path, entry_path)
+            self.log_manager.log("verbose", f"    💾 Cached decoded stems ({entry_size / 1048576:.1f} MB)")
+        except Exception as e:
+            # e.g. another worker stored the same ZIP first, or the disk is full
+            if not os.path.exists(os.path.join(entry_path, META_FILE)):
+                self.log_manager.log("important", f"⚠️ Could not write stem cache entry {entry_path}: {e}")
+        finally:
+            shutil.rmtree(temp_path, ignore_errors=True)
+        self.evict(keep=zip_hash)
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits its budget (never the entry `keep`)."""
+        if not os.path.isdir(self.cache_folder):
+            return
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_folder):
+            if not entry.is_dir() or ".tmp-" in entry.name:
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                last_used = os.stat(os.path.join(entry.path, META_FILE)).st_mtime
+            except OSError:
+                continue  # being written or removed by another process
+            entries.append((last_used, entry.name, size))
+            total_size += size
+
+        for last_used, name, size in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_folder, name), ignore_errors=True)
+            total_size -= size
+            self.log_manager.log("verbose", f"    🗑️ Evicted stem cache entry {name} ({size / 1048576:.1f} MB)")
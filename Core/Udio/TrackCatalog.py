@@ -0,0 +1,484 @@
+import os
+import json
+import posixpath
+import time
+import sqlite3
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+CATALOG_VERSION = 3
+CATALOG_FILE = "track_catalog.sqlite"
+CATALOG_EXTENSIONS = (".json", ".mp3", ".zip")
+SIDECAR_SUFFIXES = (".analysis.json",)  # JSONs written next to the mixes (MixTracks analysis), not track JSONs
+DEFAULT_CACHE_FOLDER = "Temp/Udio"
+RACY_SECONDS = 2.0  # directory listings younger than this are not trusted (mtime granularity)
+DEFAULT_SCAN_WORKERS = 8  # listings, stats and JSON reads in flight at once; scans of network shares are latency-bound
+HASH_CHUNK_SIZE = 1024 * 1024
+QUERY_BATCH_SIZE = 500  # paths per "IN (...)" query, well below SQLite's variable limit
+TRACK_SECTIONS = ("mix", "tags", "export_parameters")
+FILE_COLUMNS = "size, mtime_ns, inode, md5, sample, duration"  # CatalogFile fields after the path, in constructor order
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, subdirs TEXT, files TEXT);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT, name TEXT, ext TEXT,
+                                  size INTEGER, mtime_ns INTEGER, inode INTEGER, md5 TEXT,
+                                  sample TEXT, duration REAL, fingerprint BLOB);
+CREATE INDEX IF NOT EXISTS files_by_dir ON files (dir, name);
+CREATE TABLE IF NOT EXISTS tracks (json_path TEXT PRIMARY KEY, mix TEXT, tags TEXT, export_parameters TEXT, error TEXT);
+"""
+
+
+def is_track_json(name):
+    """Returns True if a file name is a track JSON (any .json except the sidecar files)."""
+    name = name.lower()
+    return name.endswith(".json") and not name.endswith(SIDECAR_SUFFIXES)
+
+
+def hash_file_md5(path):
+    """Returns the MD5 hex digest of a file, read in chunks."""
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _visit_dir(path, row):
+    """
+    Stats a folder and its catalogued files (runs in a TrackCatalog scan thread). A folder whose
+    mtime matches its catalog row isn't listed again, only its known files are stat'ed; a changed
+    folder is listed with os.scandir and the directory entries' stat results are used.
+
+    Args:
+        path (str): The folder.
+        row (tuple | None): Its catalog row (mtime_ns, subdirs JSON, files JSON), None if unknown.
+
+    Returns:
+        tuple | None: (folder stat, listed, sorted subfolder names, {file name: (size, mtime_ns, inode)}),
+                      None if the folder doesn't exist anymore.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if row is not None and row[0] == stat.st_mtime_ns:
+        file_states = {}
+        for name in json.loads(row[2]):
+            try:
+                file_stat = os.stat(os.path.join(path, name))
+            except OSError:
+                continue  # removed since the listing, its rows stay stale and are deleted
+            file_states[name] = (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino)
+        return stat, False, json.loads(row[1]), file_states
+
+    subdirs, file_states = [], {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                    if os.path.splitext(entry.name)[1].lower() in CATALOG_EXTENSIONS:
+                        # No extra system call on Windows (part of the listing); the inode is the target's for symlinks, like os.stat
+                        entry_stat = entry.stat()
+                        inode = entry_stat.st_ino if entry.is_symlink() else entry.inode()
+                        file_states[entry.name] = (entry_stat.st_size, entry_stat.st_mtime_ns, inode)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return stat, True, sorted(subdirs), dict(sorted(file_states.items()))
+
+
+def _read_track_sections(path):
+    """Reads a track JSON (runs in a TrackCatalog scan thread). Returns ({section: value}, error or None)."""
+    sections, error = {}, None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            sections = {name: data[name] for name in TRACK_SECTIONS if name in data}
+        else:
+            error = "not a JSON object"
+    except Exception as e:
+        error = str(e)
+    return sections, error
+
+
+class CatalogFile:
+    """
+    A catalogued file: absolute path, size, mtime (ns), inode and the analysis results cached
+    for exactly that state of the file: MD5, head/tail sample digest (DuplicateFinder) and
+    duration in seconds (MP3s), None until computed.
+    """
+    def __init__(self, path, size, mtime_ns, inode=None, md5=None, sample=None, duration=None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.md5 = md5
+        self.sample = sample
+        self.duration = duration
+
+
+class TrackRecord:
+    """
+    One track JSON of the catalog with its parsed sections and the files it refers to.
+
+    Attributes:
+        json_path (str): Absolute path of the track JSON.
+        mix, tags, export_parameters (dict | None): Parsed sections, None if the JSON has none.
+        error (str | None): Why the JSON couldn't be parsed, None if it could.
+        mp3 (CatalogFile | None): The mix output ('mix.output_file'), None if missing.
+        zip (CatalogFile | None): The stems ZIP ('mix.source_path'), None if missing.
+    """
+    def __init__(self, json_path, sections, error, mp3=None, zip_file=None):
+        self.json_path = json_path
+        self.mix = sections.get("mix")
+        self.tags = sections.get("tags")
+        self.export_parameters = sections.get("export_parameters")
+        self.error = error
+        self.mp3 = mp3
+        self.zip = zip_file
+
+
+class TrackCatalog:
+    """
+    Persistent SQLite catalog of the track folders, shared by MixTracks, ExportTracks and
+    AnalyzeTrackDB. It holds every track JSON (with its parsed 'mix', 'tags' and
+    'export_parameters' sections) and the size, mtime and inode of every JSON, MP3 and ZIP
+    file, with the analysis results cached for it (MD5, MP3 duration, acoustic fingerprint). A change of size,
+    mtime or inode drops the cached results; entries of deleted files are removed.
+
+    refresh() updates it incrementally: a directory whose mtime didn't change is not
+    listed again, files are only stat'ed, and only changed JSONs are parsed again, so
+    discovery after the first scan costs one stat per directory and file. Those stats,
+    listings and JSON reads run concurrently in a small thread pool.
+    """
+    def __init__(self, catalog_path, project_root, log_manager=None, workers=None):
+        """
+        Opens (or creates) the catalog.
+
+        Args:
+            catalog_path (str): Absolute path of the SQLite file.
+            project_root (str): Project root, paths are stored relative to it.
+            log_manager (LogManager, optional): Logger of the owning module; None logs nothing.
+            workers (int, optional): Threads scanning folders in refresh(). Defaults to DEFAULT_SCAN_WORKERS.
+        """
+        self.catalog_path = catalog_path
+        self.project_root = project_root
+        self.log_manager = log_manager
+        self.workers = max(1, int(workers or DEFAULT_SCAN_WORKERS))
+        os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+        try:
+            self.connection = self._open()
+        except sqlite3.DatabaseError as e:
+            self._log("important", f"⚠️ Track catalog {catalog_path} is unreadable, rebuilding: {e}")
+            os.remove(catalog_path)
+            self.connection = self._open()
+
+    @classmethod
+    def from_config(cls, project_root, config, log_manager=None):
+        """
+        Opens the catalog configured by 'track_catalog_file' (default '<udio_cache_folder>/track_catalog.sqlite'),
+        scanning with 'track_catalog_workers' threads.
+        """
+        catalog_file = config.get("track_catalog_file") or \
+            os.path.join(config.get("udio_cache_folder", DEFAULT_CACHE_FOLDER), CATALOG_FILE)
+        return cls(os.path.join(project_root, catalog_file), project_root, log_manager,
+                   config.get("track_catalog_workers"))
+
+    def _open(self):
+        connection = sqlite3.connect(self.catalog_path, timeout=30, check_same_thread=False)  # e.g. watch mode in a thread
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")  # other tools can read while one refreshes
+        except sqlite3.DatabaseError:
+            pass
+        connection.executescript(SCHEMA)
+        row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or int(row[0]) != CATALOG_VERSION:
+            if row is not None:
+                self._log("normal", f"⚠️ Track catalog version changed, rebuilding: {self.catalog_path}")
+            with connection:
+                for table in ("dirs", "files", "tracks"):
+                    connection.execute(f"DROP TABLE {table}")  # the columns may have changed too
+            connection.executescript(SCHEMA)
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(CATALOG_VERSION),))
+        return connection
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def _log(self, level, message):
+        if self.log_manager is not None:
+            self.log_manager.log(level, message)
+
+    def _key(self, path):
+        return os.path.relpath(path, self.project_root).replace("\\", "/")
+
+    def _path(self, key):
+        return os.path.normpath(os.path.join(self.project_root, key))
+
+    # --- Refresh ---
+
+    def refresh(self, folders):
+        """
+        Brings the catalog up to date with the given folders (absolute paths). Missing
+        folders are skipped; entries of files and directories that disappeared are removed.
+
+        Returns:
+            dict: Counts of listed directories, changed files, parsed JSONs and removed entries.
+        """
+        counts = {"dirs_listed": 0, "files_changed": 0, "jsons_parsed": 0, "removed": 0}
+        started = time.time()
+        with self.connection:  # one transaction per refresh
+            for folder in folders:
+                if not os.path.isdir(folder):
+                    continue
+                key = self._key(folder)
+                # Everything known below the folder in three queries; rows left over after the scan are stale
+                dirs = {row[0]: row[1:] for row in self._select_below("dirs", "path", key, "path, mtime_ns, subdirs, files")}
+                files = {row[0]: row[1:] for row in self._select_below("files", "path", key, "path, size, mtime_ns, inode")}
+                tracks = {row[0] for row in self._select_below("tracks", "json_path", key, "json_path")}
+                self._scan(folder, started, dirs, files, tracks, counts)
+                for table, column, stale in (("dirs", "path", dirs), ("files", "path", files), ("tracks", "json_path", tracks)):
+                    if stale:
+                        self.connection.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(path,) for path in stale])
+                        counts["removed"] += len(stale) if table != "tracks" else 0
+        if any(counts.values()):
+            self._log("verbose", f"🗂️ Track catalog refreshed in {time.time() - started:.2f} s: "
+                                 f"{counts['dirs_listed']} folder(s) listed, {counts['files_changed']} file(s) changed, "
+                                 f"{counts['jsons_parsed']} JSON(s) parsed, {counts['removed']} removed")
+        return counts
+
+    def _scan(self, root, started, dirs, files, tracks, counts):
+        """
+        Walks a folder like os.walk (symlinked folders aren't followed), reusing unchanged listings.
+        Folder listings, file stats and JSON reads run in a thread pool of `workers` threads, so
+        many requests are in flight at once on network shares; all catalog writes happen here, in
+        this thread. Entries it sees are removed from the dicts/set of known rows.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="TrackCatalog") as executor:
+            visits = {executor.submit(_visit_dir, root, dirs.get(self._key(root))): (root, self._key(root))}
+            parses = {}
+            while visits:
+                done, _ = wait(visits, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, key = visits.pop(future)
+                    visit = future.result()
+                    if visit is None:
+                        continue  # removed since its parent was listed, its rows stay stale and are deleted
+                    dir_stat, listed, subdirs, file_states = visit
+                    row = dirs.pop(key, None)
+                    if listed or row is None:
+                        # A listing taken within the mtime granularity might miss a file created right after it
+                        mtime_ns = dir_stat.st_mtime_ns if started - dir_stat.st_mtime > RACY_SECONDS else -1
+                        self.connection.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                                                (key, mtime_ns, json.dumps(subdirs), json.dumps(sorted(file_states))))
+                        counts["dirs_listed"] += 1
+                    prefix = f"{key}/" if key != "." else ""
+                    for name, state in file_states.items():
+                        file_key = prefix + name
+                        if self._refresh_file(file_key, key, name, state, files, tracks, counts):
+                            parses[executor.submit(_read_track_sections, os.path.join(path, name))] = file_key
+                    for name in subdirs:
+                        sub_key = prefix + name
+                        visits[executor.submit(_visit_dir, os.path.join(path, name), dirs.get(sub_key))] = \
+                            (os.path.join(path, name), sub_key)
+            for future, file_key in parses.items():
+                sections, error = future.result()
+                values = [json.dumps(sections[name]) if name in sections else None for name in TRACK_SECTIONS]
+                self.connection.execute("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?)", (file_key, *values, error))
+                counts["jsons_parsed"] += 1
+
+    def _refresh_file(self, key, dir_key, name, state, files, tracks, counts):
+        """Updates the row of a file from its (size, mtime_ns, inode). Returns True if its track JSON must be parsed."""
+        row = files.pop(key, None)
+        # A file replaced by another one (e.g. a copy keeping size and mtime) gets a new inode
+        changed = row is None or tuple(row) != state
+        if changed:
+            self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL, NULL, NULL)",
+                                    (key, dir_key, name, os.path.splitext(name)[1].lower(), *state))
+            counts["files_changed"] += 1
+        if is_track_json(name):
+            parse = changed or key not in tracks
+            tracks.discard(key)
+            return parse
+        return False
+
+    def _select_below(self, table, column, key, columns, order_by=None):
+        """Selects the rows of `table` whose `column` is the folder `key` or below it (no LIKE, names may contain % or _)."""
+        order = f" ORDER BY {order_by}" if order_by else ""
+        if key == ".":
+            return self.connection.execute(f"SELECT {columns} FROM {table}{order}").fetchall()
+        return self.connection.execute(f"SELECT {columns} FROM {table} WHERE {column} = ? OR substr({column}, 1, ?) = ?{order}",
+                                       (key, len(key) + 1, key + "/")).fetchall()
+
+    # --- Queries ---
+
+    def track_json_paths(self, folders):
+        """Returns the absolute paths of all track JSONs below the folders, in folder order, sorted within each."""
+        paths = []
+        for folder in folders:
+            rows = self._select_below("files", "dir", self._key(folder), "dir, name", "dir, name")
+            paths.extend(self._path(f"{row[0]}/{row[1]}") for row in rows if is_track_json(row[1]))
+        return paths
+
+    def files(self, folders, extension):
+        """Returns the CatalogFiles with `extension` (e.g. ".mp3") below the folders, in the order of track_json_paths()."""
+        result = []
+        for folder in folders:
+            rows = self._select_below("files", "dir", self._key(folder), f"dir, name, ext, {FILE_COLUMNS}", "dir, name")
+            result.extend(CatalogFile(self._path(f"{row[0]}/{row[1]}"), *row[3:])
+                          for row in rows if row[2] == extension)
+        return result
+
+    def tracks(self, folders):
+        """Returns the TrackRecords of all track JSONs below the folders, in the order of track_json_paths()."""
+        records = []
+        for folder in folders:
+            key = self._key(folder)
+            known = {row[0]: CatalogFile(self._path(row[0]), *row[1:])
+                     for row in self._select_below("files", "dir", key, f"path, {FILE_COLUMNS}")}
+            rows = self._select_below("tracks JOIN files ON files.path = tracks.json_path", "files.dir", key,
+                                      "json_path, mix, tags, export_parameters, error", "files.dir, files.name")
+            records.extend(self._record(row[0], row[1:], known) for row in rows)
+        return records
+
+    def track(self, json_path):
+        """Returns the TrackRecord of one track JSON, or None if it isn't catalogued."""
+        key = self._key(json_path)
+        row = self.connection.execute("SELECT mix, tags, export_parameters, error FROM tracks WHERE json_path = ?",
+                                      (key,)).fetchone()
+        return self._record(key, row, {}) if row is not None else None
+
+    def _record(self, json_key, row, known):
+        """Builds a TrackRecord from a tracks row; `known` maps keys to CatalogFiles already loaded."""
+        sections = {name: json.loads(value) for name, value in zip(TRACK_SECTIONS, row[:3]) if value is not None}
+        record = TrackRecord(self._path(json_key), sections, row[3])
+        if isinstance(record.mix, dict):
+            folder = posixpath.dirname(json_key)
+            for attribute, section_key in (("mp3", "output_file"), ("zip", "source_path")):
+                if record.mix.get(section_key):
+                    key = posixpath.normpath(posixpath.join(folder, str(record.mix[section_key]).replace("\\", "/")))
+                    setattr(record, attribute, known[key] if key in known else self.file(self._path(key)))
+        return record
+
+    def file(self, path):
+        """Returns the CatalogFile of a path, or None if it isn't catalogued."""
+        row = self.connection.execute(f"SELECT {FILE_COLUMNS} FROM files WHERE path = ?",
+                                      (self._key(path),)).fetchone()
+        return CatalogFile(os.path.normpath(path), *row) if row is not None else None
+
+    def current_file(self, path):
+        """Returns the CatalogFile of a path if it is catalogued and unchanged since the last refresh, otherwise None."""
+        file = self.file(path)
+        if file is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return file if (file.size, file.mtime_ns, file.inode) == (stat.st_size, stat.st_mtime_ns, stat.st_ino) else None
+
+    def read_track(self, json_path):
+        """
+        Returns the TrackRecord of a track JSON: the catalogued one if the JSON is unchanged since
+        the last refresh, otherwise parsed from the file (and not stored).
+        """
+        if self.current_file(json_path) is not None:
+            track = self.track(json_path)
+            if track is not None:
+                return track
+        return TrackRecord(os.path.normpath(json_path), *_read_track_sections(json_path))
+
+    def file_md5(self, path):
+        """
+        Returns the MD5 of a file, hashing it only if it changed since its MD5 was stored.
+        Files that aren't catalogued (or changed since the last refresh) are hashed without being stored.
+        """
+        key = self._key(path)
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime_ns, inode, md5 FROM files WHERE path = ?", (key,)).fetchone()
+        unchanged = row is not None and tuple(row[:3]) == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if unchanged and row[3]:
+            return row[3]
+        md5 = hash_file_md5(path)
+        if unchanged:
+            # Only stored for the state the catalog knows, a file changed since the last refresh is left to refresh()
+            with self.connection:
+                self.connection.execute("UPDATE files SET md5 = ? WHERE path = ?", (md5, key))
+        return md5
+
+    def store_md5s(self, entries):
+        """
+        Stores MD5s computed elsewhere (e.g. by DuplicateFinder's hash threads).
+
+        Args:
+            entries (list[tuple[CatalogFile, str]]): Files and their MD5. An MD5 is only stored if the
+                                                     file's size, mtime and inode still match the catalog.
+        """
+        self._store("md5", entries)
+
+    def store_samples(self, entries):
+        """
+        Stores head/tail sample digests computed by DuplicateFinder, see store_md5s().
+
+        Args:
+            entries (list[tuple[CatalogFile, str]]): Files and their sample digest.
+        """
+        self._store("sample", entries)
+
+    def store_durations(self, entries):
+        """
+        Stores MP3 durations read by AnalyzeTrackDB, see store_md5s().
+
+        Args:
+            entries (list[tuple[CatalogFile, float]]): Files and their duration in seconds.
+        """
+        self._store("duration", entries)
+
+    def load_fingerprints(self, files):
+        """
+        Returns the acoustic fingerprints stored for files, only those computed for the
+        file's current size, mtime and inode.
+
+        Args:
+            files (list[CatalogFile]): Files to look up.
+
+        Returns:
+            dict: path -> fingerprint bytes (see NearDuplicateFinder).
+        """
+        wanted = {self._key(file.path): file for file in files}
+        keys = list(wanted)
+        fingerprints = {}
+        for start in range(0, len(keys), QUERY_BATCH_SIZE):
+            batch = keys[start:start + QUERY_BATCH_SIZE]
+            rows = self.connection.execute("SELECT path, size, mtime_ns, inode, fingerprint FROM files "
+                                           f"WHERE fingerprint IS NOT NULL AND path IN ({', '.join('?' * len(batch))})",
+                                           batch).fetchall()
+            for key, size, mtime_ns, inode, fingerprint in rows:
+                file = wanted[key]
+                if (size, mtime_ns, inode) == (file.size, file.mtime_ns, file.inode):
+                    fingerprints[file.path] = fingerprint
+        return fingerprints
+
+    def store_fingerprints(self, entries):
+        """
+        Stores acoustic fingerprints computed by NearDuplicateFinder, see store_md5s().
+
+        Args:
+            entries (list[tuple[CatalogFile, bytes]]): Files and their fingerprint.
+        """
+        self._store("fingerprint", entries)
+
+    def _store(self, column, entries):
+        with self.connection:
+            self.connection.executemany(f"UPDATE files SET {column} = ? WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                                        [(value, self._key(file.path), file.size, file.mtime_ns, file.inode)
+                                         for file, value in entries])
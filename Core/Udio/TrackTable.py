@@ -0,0 +1,376 @@
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add Core to path so the CLI can import ConfigManager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from Core.ConfigManager import ConfigManager
+from Core.Udio.TrackCatalog import DEFAULT_CACHE_FOLDER
+
+TABLE_VERSION = 1
+TABLE_FILE = "track_table.npz"
+TEXT_COLUMNS = ("name", "path")
+NUMERIC_COLUMNS = ("energy", "mood", "pop", "stars", "duration", "size")  # float64, NaN where the tag is missing
+BOOL_COLUMNS = ("export",)
+COLUMNS = TEXT_COLUMNS + NUMERIC_COLUMNS + BOOL_COLUMNS
+DISCRETE_COLUMNS = ("stars", "export")  # histograms count each value instead of binning
+OPERATORS = ("==", "!=", ">=", "<=", ">", "<", "~")
+CONDITION_PATTERN = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|=|>|<|~)\s*(.*?)\s*$")
+
+
+def table_path(project_root, config):
+    """Returns the table configured by 'track_table_file' (default '<udio_cache_folder>/track_table.npz')."""
+    table_file = config.get("track_table_file") or \
+        os.path.join(config.get("udio_cache_folder", DEFAULT_CACHE_FOLDER), TABLE_FILE)
+    return os.path.join(project_root, table_file)
+
+
+def parse_condition(text):
+    """
+    Parses a CLI condition: "energy>0.7", "stars>=4", "name~night", "export" or "!export".
+
+    Returns:
+        tuple[str, str, object]: (column, operator, value), the value converted to the column type.
+
+    Raises:
+        ValueError: If the condition, its column or its value is invalid.
+    """
+    text = text.strip()
+    if text.lstrip("!") in BOOL_COLUMNS:
+        return text.lstrip("!"), "==", not text.startswith("!")
+    match = CONDITION_PATTERN.match(text)
+    if match is None:
+        raise ValueError(f"Invalid condition '{text}', expected <column><operator><value>")
+    column, operator, value = match.groups()
+    return column, "==" if operator == "=" else operator, _convert(column, value)
+
+
+def _convert(column, value):
+    if column in NUMERIC_COLUMNS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value '{value}' for '{column}', expected a number") from None
+    if column in BOOL_COLUMNS:
+        if isinstance(value, str):
+            return value.lower() in ("1", "true", "yes")
+        return bool(value)
+    if column in TEXT_COLUMNS:
+        return str(value)
+    raise ValueError(f"Unknown column '{column}', expected one of: {', '.join(COLUMNS)}")
+
+
+def format_track(record):
+    """Returns a track line in the format of the AnalyzeTrackDB report."""
+    duration = record["duration"]
+    duration = "Unknown" if duration is None else f"{int(duration) // 60}:{int(duration) % 60:02d}"
+    line = f"{'+' if record['export'] else '-'} {record['name']} [{duration}]"
+    if record["energy"] is not None: line += f" 🔥{record['energy']:.1f}"
+    if record["mood"] is not None:   line += f" 😊{record['mood']:.1f}"
+    if record["pop"] is not None:    line += f" 🎵{record['pop']:.1f}"
+    if record["stars"] is not None:  line += f" ✨{int(record['stars'])}"
+    return line
+
+
+class TrackTable:
+    """
+    Columnar table of the analyzed tracks (one NumPy array per tag) with a sorted index on
+    every column, so filters are binary searches instead of scans of the library.
+
+    AnalyzeTrackDB builds it from the tracks it analyzes and saves it (with the indexes) as
+    an .npz file; queries load that file, no track folder is read. Missing tags are NaN and
+    never match a condition; sorted, they come last.
+    """
+    def __init__(self, columns, indexes=None, folders=(), built=None):
+        """
+        Args:
+            columns (dict): Column name -> array, one entry per track (see COLUMNS).
+            indexes (dict, optional): Column name -> row indices sorted by that column (missing values last).
+                                      Built if not given.
+            folders (iterable[str]): Track folders the table was built from.
+            built (float, optional): Time the table was built. Defaults to now.
+        """
+        self.columns = columns
+        self.size = len(columns["name"])
+        self.folders = list(folders)
+        self.built = time.time() if built is None else built
+        self.indexes = indexes if indexes is not None else \
+            {column: np.argsort(values, kind="stable") for column, values in columns.items()}  # NaN sorts last
+        self.sorted = {column: columns[column][index] for column, index in self.indexes.items()}
+        self.present = {column: int(np.count_nonzero(~np.isnan(values))) if column in NUMERIC_COLUMNS else self.size
+                        for column, values in columns.items()}
+
+    @classmethod
+    def from_records(cls, records, folders=()):
+        """
+        Builds the table from AnalyzeTrackDB.track_data.
+
+        Args:
+            records (list[dict]): One dict per track with the keys of COLUMNS; missing tags are None.
+            folders (iterable[str]): Track folders the records come from.
+        """
+        columns = {column: np.array([record[column] for record in records], dtype=str) for column in TEXT_COLUMNS}
+        for column in NUMERIC_COLUMNS:
+            columns[column] = np.array([np.nan if record[column] is None else record[column] for record in records],
+                                       dtype=np.float64)
+        for column in BOOL_COLUMNS:
+            columns[column] = np.array([bool(record[column]) for record in records], dtype=bool)
+        return cls(columns, folders=folders)
+
+    def save(self, path):
+        """Writes the table with its indexes to an .npz file (through a temporary file, so readers never see half of it)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {f"column_{column}": values for column, values in self.columns.items()}
+        arrays.update({f"index_{column}": index for column, index in self.indexes.items()})
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, version=np.array(TABLE_VERSION), built=np.array(self.built),
+                     folders=np.array(self.folders, dtype=str), **arrays)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a table saved by save().
+
+        Returns:
+            TrackTable | None: The table, None if the file is missing or was written by another table version.
+        """
+        if not os.path.isfile(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != TABLE_VERSION:
+                return None
+            columns = {column: data[f"column_{column}"] for column in COLUMNS}
+            indexes = {column: data[f"index_{column}"] for column in COLUMNS}
+            return cls(columns, indexes, data["folders"].tolist(), float(data["built"]))
+
+    def _matches(self, column, operator, value):
+        """Returns the rows matching one condition, found by binary search in the column's sorted values."""
+        if column not in self.columns:
+            raise ValueError(f"Unknown column '{column}', expected one of: {', '.join(COLUMNS)}")
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator '{operator}', expected one of: {', '.join(OPERATORS)}")
+        value = _convert(column, value)
+        index, count = self.indexes[column], self.present[column]
+        if operator == "~":  # substring, not indexed
+            values = np.char.lower(self.columns[column].astype(str))
+            return np.flatnonzero(np.char.find(values, str(value).lower()) >= 0)
+        values = self.sorted[column][:count]
+        left, right = np.searchsorted(values, value, "left"), np.searchsorted(values, value, "right")
+        if operator == "!=":
+            return np.concatenate((index[:left], index[right:count]))
+        start, end = {"==": (left, right), ">": (right, count), ">=": (left, count),
+                      "<": (0, left), "<=": (0, right)}[operator]
+        return index[start:end]
+
+    def filter(self, conditions=()):
+        """
+        Returns the rows matching all conditions.
+
+        Args:
+            conditions (iterable[tuple]): (column, operator, value) with an operator of OPERATORS, e.g.
+                                          ("energy", ">", 0.7); "~" matches a substring (case-insensitive).
+
+        Returns:
+            numpy.ndarray: Row numbers in table order.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for column, operator, value in conditions:
+            matching = np.zeros(self.size, dtype=bool)
+            matching[self._matches(column, operator, value)] = True
+            mask &= matching
+        return np.flatnonzero(mask)
+
+    def sort(self, rows, column, descending=False):
+        """Returns rows ordered by a column (ties keep their order, missing values come last)."""
+        if column not in self.columns:
+            raise ValueError(f"Unknown column '{column}', expected one of: {', '.join(COLUMNS)}")
+        count = self.present[column]
+        values = self.sorted[column][:count]
+        row_values = self.columns[column][rows]
+        present = ~np.isnan(row_values) if column in NUMERIC_COLUMNS else np.ones(len(rows), dtype=bool)
+        if descending:
+            keys = count - np.searchsorted(values, row_values, "right")
+        else:
+            keys = np.searchsorted(values, row_values, "left")
+        keys = np.where(present, keys, count + 1)
+        return rows[np.argsort(keys, kind="stable")]
+
+    def records(self, rows):
+        """Returns the tracks of rows as dicts (missing tags as None)."""
+        values = {column: self.columns[column][rows].tolist() for column in COLUMNS}
+        for column in NUMERIC_COLUMNS:
+            values[column] = [None if value != value else value for value in values[column]]  # NaN
+        values["stars"] = [None if value is None else int(value) for value in values["stars"]]
+        return [dict(zip(COLUMNS, row)) for row in zip(*(values[column] for column in COLUMNS))]
+
+    def query(self, conditions=(), sort=None, descending=False, limit=None):
+        """
+        Returns the tracks matching all conditions, e.g. export-flagged tracks with energy above
+        0.7, most popular first: query([("export", "==", True), ("energy", ">", 0.7)], "pop", True).
+
+        Args:
+            conditions (iterable[tuple]): See filter().
+            sort (str, optional): Column to order by; table order if None.
+            descending (bool): Order from the highest value.
+            limit (int, optional): Maximum number of tracks returned.
+
+        Returns:
+            list[dict]: The tracks (see records()).
+        """
+        rows = self.filter(conditions)
+        if sort is not None:
+            rows = self.sort(rows, sort, descending)
+        return self.records(rows[:limit] if limit is not None else rows)
+
+    def aggregate(self, column, conditions=(), by=None):
+        """
+        Returns statistics of a numeric column over the tracks matching the conditions.
+
+        Args:
+            column (str): Column of NUMERIC_COLUMNS.
+            conditions (iterable[tuple]): See filter().
+            by (str, optional): Column to group by (e.g. "stars" or "export"); one result per value.
+
+        Returns:
+            dict: count, missing, sum, mean, min, median, max (None without values); with `by`, value -> that dict.
+        """
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot aggregate '{column}', expected one of: {', '.join(NUMERIC_COLUMNS)}")
+        rows = self.filter(conditions)
+        if by is None:
+            return self._statistics(self.columns[column][rows])
+        if by not in self.columns:
+            raise ValueError(f"Unknown column '{by}', expected one of: {', '.join(COLUMNS)}")
+        groups, inverse = np.unique(self.columns[by][rows], return_inverse=True)
+        return {group.item(): self._statistics(self.columns[column][rows[inverse == number]])
+                for number, group in enumerate(groups)}
+
+    @staticmethod
+    def _statistics(values):
+        present = values[~np.isnan(values)]
+        statistics = {"count": len(present), "missing": len(values) - len(present)}
+        if not len(present):
+            return dict(statistics, sum=None, mean=None, min=None, median=None, max=None)
+        return dict(statistics, sum=float(present.sum()), mean=float(present.mean()), min=float(present.min()),
+                    median=float(np.median(present)), max=float(present.max()))
+
+    def histogram(self, column, conditions=(), bins=10, value_range=None):
+        """
+        Returns the distribution of a column over the tracks matching the conditions.
+
+        Args:
+            column (str): Column of NUMERIC_COLUMNS or BOOL_COLUMNS.
+            conditions (iterable[tuple]): See filter().
+            bins (int): Number of equal-width bins; DISCRETE_COLUMNS get one bin per value instead.
+            value_range (tuple[float, float], optional): Range of the bins. Defaults to the column's range in the table.
+
+        Returns:
+            list[tuple]: (low, high, count) per bin; (value, value, count) for discrete columns. Missing values are left out.
+        """
+        if column not in NUMERIC_COLUMNS + BOOL_COLUMNS:
+            raise ValueError(f"No histogram of '{column}', expected one of: {', '.join(NUMERIC_COLUMNS + BOOL_COLUMNS)}")
+        values = self.columns[column][self.filter(conditions)]
+        if column in NUMERIC_COLUMNS:
+            values = values[~np.isnan(values)]
+        if column in DISCRETE_COLUMNS:
+            groups, counts = np.unique(values, return_counts=True)
+            return [(group.item(), group.item(), int(count)) for group, count in zip(groups, counts)]
+        if value_range is None:
+            present = self.sorted[column][:self.present[column]]
+            value_range = (float(present[0]), float(present[-1])) if len(present) else (0.0, 1.0)
+        counts, edges = np.histogram(values, bins=bins, range=value_range)
+        return [(float(edges[i]), float(edges[i + 1]), int(count)) for i, count in enumerate(counts)]
+
+
+def main(argv=None):
+    """
+    Command line: queries the table AnalyzeTrackDB saved, e.g.
+
+        python ScriptUtils/Core/Udio/TrackTable.py query --where export --where "energy>0.7" --sort pop --descending
+        python ScriptUtils/Core/Udio/TrackTable.py stats energy --by stars
+        python ScriptUtils/Core/Udio/TrackTable.py hist mood --bins 5 --where "stars>=4"
+        python ScriptUtils/Core/Udio/TrackTable.py --scan Tracks --scan Lib query --limit 10
+    """
+    parser = argparse.ArgumentParser(prog="TrackTable", description="Queries the track table saved by AnalyzeTrackDB.")
+    parser.add_argument("--scan", action="append", metavar="FOLDER",
+                        help="run AnalyzeTrackDB on this folder (relative to the project root, repeatable) first")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="list matching tracks")
+    query.add_argument("--sort", choices=COLUMNS, help="column to order by")
+    query.add_argument("--descending", action="store_true", help="order from the highest value")
+    query.add_argument("--limit", type=int)
+    stats = commands.add_parser("stats", help="statistics of a numeric column")
+    stats.add_argument("column", choices=NUMERIC_COLUMNS)
+    stats.add_argument("--by", choices=COLUMNS)
+    hist = commands.add_parser("hist", help="histogram of a column")
+    hist.add_argument("column", choices=NUMERIC_COLUMNS + BOOL_COLUMNS)
+    hist.add_argument("--bins", type=int, default=10)
+    hist.add_argument("--range", type=float, nargs=2, metavar=("LOW", "HIGH"))
+    for command in (query, stats, hist):
+        command.add_argument("--where", action="append", default=[], metavar="CONDITION",
+                             help="e.g. 'energy>0.7', 'stars>=4', 'name~night', 'export', '!export' (all must match)")
+    args = parser.parse_args(argv)
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+    path = table_path(project_root, ConfigManager().load_config())
+    if args.scan:
+        from Core.Udio.AnalyzeTrackDB import AnalyzeTrackDB
+        AnalyzeTrackDB(args.scan, []).run()
+        print()
+    start_time = time.perf_counter()
+    table = TrackTable.load(path)
+    if table is None:
+        print(f"⚠️ No track table at {path}, run AnalyzeTrackDB (or --scan <folder>) first")
+        return 1
+    loaded_time = time.perf_counter()
+    try:
+        conditions = [parse_condition(condition) for condition in args.where]
+        if args.command == "query":
+            result = table.query(conditions, args.sort, args.descending, args.limit)
+        elif args.command == "stats":
+            result = table.aggregate(args.column, conditions, args.by)
+        else:
+            result = table.histogram(args.column, conditions, args.bins, args.range)
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        return 1
+    end_time = time.perf_counter()
+
+    print(f"🗃️ Track table: {table.size} tracks from {', '.join(table.folders)}, "
+          f"built {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(table.built))}")
+    if args.command == "query":
+        for record in result:
+            print(format_track(record))
+        print(f"\n🎼 {len(result)} tracks")
+    elif args.command == "stats":
+        groups = result.items() if args.by else [(None, result)]
+        for group, statistics in groups:
+            if args.by is None:
+                label = ""
+            elif isinstance(group, float):
+                label = f"{args.by}={group:g}: "
+            else:  # text and flag columns
+                label = f"{args.by}={group}: "
+            if statistics["count"]:
+                print(f"📊 {label}{statistics['count']} tracks ({statistics['missing']} without {args.column}), "
+                      f"mean {statistics['mean']:.2f}, median {statistics['median']:.2f}, "
+                      f"min {statistics['min']:.2f}, max {statistics['max']:.2f}, sum {statistics['sum']:.2f}")
+            else:
+                print(f"📊 {label}no tracks with {args.column} ({statistics['missing']} without)")
+    else:
+        width = max([count for _, _, count in result] + [1])
+        for low, high, count in result:
+            label = f"{low:g}" if low == high else f"{low:.2f}-{high:.2f}"
+            print(f"{label:>11} | {'█' * round(count * 40 / width):<40} {count}")
+    print(f"⚡ Loaded in {(loaded_time - start_time) * 1000:.1f} ms, answered in {(end_time - loaded_time) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+from Core.Udio.TrackCatalog import is_track_json
+
+DEFAULT_POLL_INTERVAL = 1.0  # seconds between two scans of the look folders
+DEFAULT_DEBOUNCE = 0.5  # seconds without further changes before a track is re-mixed
+WATCHED_EXTENSIONS = (".json", ".zip")
+
+
+class TrackWatcher:
+    """
+    Long-running watch mode of MixTracks. Polls the look folders (and the Effects folder)
+    and re-mixes only the tracks whose JSON or source ZIP changed. Bursts of saves are
+    debounced: a track is mixed once its files have been quiet for `debounce` seconds.
+    The MixTracks instance stays alive between mixes, so config, effect modules, the
+    mix manifest and the stem cache are loaded only once. Editing an effect module
+    reloads the effects; the changed effect hash then re-mixes every track.
+    Polling (no inotify) keeps it dependency-free and working the same on every OS.
+    """
+    def __init__(self, mix_tracks, poll_interval=None, debounce=None):
+        """
+        Initializes the watcher.
+
+        Args:
+            mix_tracks (MixTracks): The processor used to mix changed tracks.
+            poll_interval (float, optional): Seconds between scans. Defaults to the
+                                             "watch_poll_interval" config value or 1.0.
+            debounce (float, optional): Quiet time in seconds before a changed track is mixed.
+                                        Defaults to the "watch_debounce" config value or 0.5.
+        """
+        self.mix_tracks = mix_tracks
+        self.log_manager = mix_tracks.log_manager
+        config = mix_tracks.config
+        self.poll_interval = poll_interval or config.get("watch_poll_interval", DEFAULT_POLL_INTERVAL)
+        self.debounce = debounce if debounce is not None else config.get("watch_debounce", DEFAULT_DEBOUNCE)
+        self.running = False
+        self.pending = {}  # track JSON path -> time of its last change
+        self.effects_changed_at = None
+        self.track_files = {}  # watched path -> (size, mtime)
+        self.effect_files = {}
+
+    def _scan_tracks(self):
+        """Returns {path: (size, mtime)} of every track JSON and ZIP in the look folders, from the refreshed track catalog."""
+        catalog = self.mix_tracks.catalog
+        catalog.refresh(self.mix_tracks.look_folders)
+        snapshot = {}
+        for extension in WATCHED_EXTENSIONS:
+            for file in catalog.files(self.mix_tracks.look_folders, extension):
+                snapshot[file.path] = (file.size, file.mtime_ns)
+        return snapshot
+
+    def _scan_effects(self):
+        """Returns {file name: (size, mtime)} of every effect module."""
+        snapshot = {}
+        effects_path = self.mix_tracks.effects_path
+        if os.path.isdir(effects_path):
+            for file in os.listdir(effects_path):
+                if file.lower().endswith(".py"):
+                    stat = os.stat(os.path.join(effects_path, file))
+                    snapshot[file] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _tracks_using_zip(self, zip_path):
+        """Returns the track JSON files next to a ZIP whose 'mix.source_path' points to it."""
+        folder = os.path.dirname(zip_path)
+        tracks = []
+        for file in os.listdir(folder):
+            if not is_track_json(file):
+                continue
+            json_path = os.path.join(folder, file)
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    source_path = json.load(f).get("mix", {}).get("source_path")
+            except Exception:
+                continue  # unreadable JSON, e.g. half-saved; its own change is picked up separately
+            if source_path and os.path.normcase(os.path.abspath(os.path.join(folder, source_path))) \
+                    == os.path.normcase(os.path.abspath(zip_path)):
+                tracks.append(json_path)
+        return tracks
+
+    def poll(self):
+        """Scans once and queues the tracks affected by changes since the previous scan."""
+        now = time.monotonic()
+        snapshot = self._scan_tracks()
+        changed = [path for path, state in snapshot.items() if self.track_files.get(path) != state]
+        self.track_files = snapshot
+
+        for path in changed:
+            if is_track_json(path):
+                affected = [path]
+            elif path.lower().endswith(".json"):
+                continue  # sidecar files written by the mix itself
+            else:
+                affected = self._tracks_using_zip(path)
+            for json_path in affected:
+                if json_path not in self.pending:
+                    self.log_manager.log("verbose", f"👀 Change detected: {os.path.basename(path)}")
+                self.pending[json_path] = now
+
+        effect_files = self._scan_effects()
+        if effect_files != self.effect_files:
+            self.log_manager.log("verbose", "👀 Change detected in effect modules")
+            self.effect_files = effect_files
+            self.effects_changed_at = now
+
+    def process_ready(self):
+        """Mixes every queued track whose files have been quiet for the debounce time. Returns the results."""
+        now = time.monotonic()
+        if self.effects_changed_at is not None and now - self.effects_changed_at >= self.debounce:
+            self.effects_changed_at = None
+            self.log_manager.log("important", "🔁 Effect modules changed, reloading effects")
+            self.mix_tracks.reload_effects()
+            for json_path in self.mix_tracks._find_track_json_files():
+                self.pending.setdefault(json_path, now - self.debounce)
+
+        ready = [path for path, changed_at in self.pending.items() if now - changed_at >= self.debounce]
+        results = []
+        for json_path in sorted(ready):
+            del self.pending[json_path]
+            if not os.path.exists(json_path):
+                continue  # deleted (or renamed) track
+            try:
+                results.append(self.mix_tracks.process_track(json_path))
+            except Exception as e:
+                self.log_manager.log("important", f"❌ Unexpected error processing {json_path}: {e}")
+                results.append(False)
+            # The mix may have written its analysis into the JSON; that is not a change to react to
+            try:
+                stat = os.stat(json_path)
+                self.track_files[json_path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+        if ready:
+            self.mix_tracks.manifest.save()
+        return results
+
+    def run(self, initial_run=True):
+        """
+        Watches until stop() is called or the user presses Ctrl+C.
+
+        Args:
+            initial_run (bool): If True, every track is checked once at start, so tracks
+                                changed while the watcher wasn't running are mixed too
+                                (up-to-date tracks are skipped by the mix manifest).
+        """
+        self.log_manager.log("important", "=" * 40)
+        self.log_manager.log("important", "👀 Watching for track changes (Ctrl+C to stop)")
+        self.log_manager.log("important", f"Searching Folders: {self.mix_tracks.look_folders}")
+        self.log_manager.log("important", f"Poll interval: {self.poll_interval} s, debounce: {self.debounce} s")
+        self.log_manager.log("important", "=" * 40)
+
+        self.track_files = self._scan_tracks()
+        self.effect_files = self._scan_effects()
+        if initial_run:
+            for json_path in self.mix_tracks._find_track_json_files():
+                self.pending[json_path] = time.monotonic() - self.debounce
+
+        self.running = True
+        try:
+            while self.running:
+                self.poll()
+                self.process_ready()  # a failed mix is retried on the next change of its files
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            self.log_manager.log("important", "⏹️ Watch mode stopped")
+        finally:
+            self.running = False
+            self.mix_tracks.manifest.save()
+
+    def stop(self):
+        """Stops run() after the current poll (e.g. from another thread)."""
+        self.running = False
@@ -0,0 +1,289 @@
+import io
+import mmap
+import struct
+import zipfile
+from collections import namedtuple
+from pydub import AudioSegment
+try:
+    import audioop
+except ImportError:  # Python 3.13+, same fallback pydub uses
+    import pyaudioop as audioop
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+ZIP_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+ZIP_LOCAL_HEADER_SIGNATURE = 0x04034B50
+
+# channels, sample_rate, sample_width (bytes per sample)
+WavFormat = namedtuple("WavFormat", ["channels", "sample_rate", "sample_width"])
+
+
+class UnsupportedWavError(Exception):
+    """Raised when a WAV can't be decoded natively (e.g. float samples); callers fall back to pydub."""
+
+
+def parse_wav(buffer):
+    """
+    Parses the RIFF/WAVE chunks of an in-memory WAV file without copying it.
+
+    Args:
+        buffer (bytes | memoryview): The complete WAV file.
+
+    Returns:
+        tuple[WavFormat, int, int]: The format, the offset of the PCM data and its size in bytes.
+
+    Raises:
+        UnsupportedWavError: If the data is not integer PCM WAV.
+    """
+    if len(buffer) < 12 or bytes(buffer[0:4]) != b"RIFF" or bytes(buffer[8:12]) != b"WAVE":
+        raise UnsupportedWavError("not a RIFF/WAVE file")
+
+    wav_format = None
+    pos = 12
+    while pos + 8 <= len(buffer):
+        chunk_id = bytes(buffer[pos:pos + 4])
+        chunk_size = struct.unpack_from("<I", buffer, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            wav_format = _parse_fmt_chunk(buffer[body:body + chunk_size])
+        elif chunk_id == b"data":
+            if wav_format is None:
+                raise UnsupportedWavError("'data' chunk before 'fmt ' chunk")
+            # Streamed WAVs may carry a bogus size, never read past the end of the file
+            data_size = min(chunk_size, len(buffer) - body)
+            data_size -= data_size % (wav_format.channels * wav_format.sample_width)
+            return wav_format, body, data_size
+        pos = body + chunk_size + (chunk_size & 1)  # chunks are word aligned
+    raise UnsupportedWavError("no 'data' chunk found")
+
+
+def read_wav_header(stream):
+    """
+    Reads the RIFF/WAVE chunks of a WAV stream up to the start of its PCM data.
+
+    Args:
+        stream: A readable binary stream positioned at the start of the WAV file.
+
+    Returns:
+        tuple[WavFormat, int]: The format and the size of the PCM data in bytes
+                               (the stream is left at the first PCM byte).
+
+    Raises:
+        UnsupportedWavError: If the data is not integer PCM WAV.
+    """
+    header = _read_exactly(stream, 12)
+    if header[0:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise UnsupportedWavError("not a RIFF/WAVE file")
+
+    wav_format = None
+    while True:
+        chunk_header = _read_exactly(stream, 8)
+        chunk_id = chunk_header[0:4]
+        chunk_size = struct.unpack_from("<I", chunk_header, 4)[0]
+        if chunk_id == b"data":
+            if wav_format is None:
+                raise UnsupportedWavError("'data' chunk before 'fmt ' chunk")
+            return wav_format, chunk_size
+        body = _read_exactly(stream, chunk_size + (chunk_size & 1))  # chunks are word aligned
+        if chunk_id == b"fmt ":
+            wav_format = _parse_fmt_chunk(body[:chunk_size])
+
+
+def _read_exactly(stream, size):
+    data = bytes(stream.read(size))
+    if len(data) < size:
+        raise UnsupportedWavError("unexpected end of WAV data")
+    return data
+
+
+def _parse_fmt_chunk(chunk):
+    if len(chunk) < 16:
+        raise UnsupportedWavError("'fmt ' chunk too short")
+    audio_format, channels, sample_rate = struct.unpack_from("<HHI", chunk, 0)
+    bits_per_sample = struct.unpack_from("<H", chunk, 14)[0]
+    if audio_format == WAVE_FORMAT_EXTENSIBLE and len(chunk) >= 26:
+        audio_format = struct.unpack_from("<H", chunk, 24)[0]  # first two bytes of the sub-format GUID
+    if audio_format != WAVE_FORMAT_PCM:
+        raise UnsupportedWavError(f"audio format 0x{audio_format:X} is not integer PCM")
+    if bits_per_sample not in (8, 16, 24, 32) or channels == 0:
+        raise UnsupportedWavError(f"{bits_per_sample}-bit / {channels} channel PCM is not supported")
+    return WavFormat(channels, sample_rate, bits_per_sample // 8)
+
+
+def pcm_to_segment(wav_format, pcm):
+    """
+    Builds an AudioSegment from raw PCM data, with the same sample conventions as AudioSegment.from_wav.
+    The samples are copied once into the segment: AudioSegment needs bytes it owns, and the segment
+    outlives the archive a memoryview points into.
+    """
+    data = bytes(pcm)
+    if wav_format.sample_width == 1:
+        data = audioop.bias(data, 1, -128)  # 8-bit WAV samples are unsigned
+    return AudioSegment(data=data,
+                        sample_width=wav_format.sample_width,
+                        frame_rate=wav_format.sample_rate,
+                        channels=wav_format.channels)
+
+
+def decode_wav(member):
+    """
+    Decodes a complete in-memory WAV file into an AudioSegment. WAV flavours that can't
+    be decoded natively are handed to pydub (and ffmpeg).
+
+    Args:
+        member (bytes | memoryview): The WAV file, e.g. from ZipStemReader.read_member().
+    """
+    try:
+        wav_format, offset, size = parse_wav(memoryview(member))
+        return pcm_to_segment(wav_format, memoryview(member)[offset:offset + size])
+    except UnsupportedWavError:
+        return AudioSegment.from_wav(io.BytesIO(bytes(member)))
+
+
+class PcmStream:
+    """Sequential reader of the PCM frames of a WAV stream, used by the streaming mix."""
+    def __init__(self, stream, wav_format, data_size):
+        """
+        Args:
+            stream: Binary stream positioned at the first PCM byte.
+            wav_format (WavFormat): Format of the PCM data.
+            data_size (int): Size of the PCM data in bytes (as declared in the WAV header).
+        """
+        self.stream = stream
+        self.format = wav_format
+        self.frame_width = wav_format.channels * wav_format.sample_width
+        self.frame_count = data_size // self.frame_width
+        self.position = 0
+
+    def read(self, frames):
+        """Returns up to `frames` frames of raw PCM data (fewer at the end of the stream)."""
+        frames = max(min(frames, self.frame_count - self.position), 0)
+        data = self.stream.read(frames * self.frame_width)
+        data = data[:len(data) - len(data) % self.frame_width]
+        self.position += len(data) // self.frame_width
+        return data
+
+    def skip(self, frames):
+        """Skips `frames` frames."""
+        while frames > 0:
+            data = self.read(min(frames, 1 << 16))
+            if not data:
+                break
+            frames -= len(data) // self.frame_width
+
+    def close(self):
+        self.stream.close()
+
+
+class ZipStemReader:
+    """
+    Reads WAV stems directly from a ZIP archive, without extracting it to disk.
+    read_member() returns members stored without compression as a view into a memory map
+    of the archive (no read buffer); compressed members are inflated into memory. Decoding
+    a member into an AudioSegment copies its samples once (see pcm_to_segment()).
+    Use as a context manager, views returned by read_member() are only valid inside it.
+    """
+    def __init__(self, zip_path):
+        """
+        Args:
+            zip_path (str): Path of the ZIP archive.
+        """
+        self.zip_path = zip_path
+        self._file = None
+        self._zip = None
+        self._mmap = None
+
+    def __enter__(self):
+        self._file = open(self.zip_path, "rb")
+        try:
+            self._zip = zipfile.ZipFile(self._file, "r")
+            if any(info.compress_type == zipfile.ZIP_STORED for info in self._zip.infolist()):
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        """Closes the archive and the memory map."""
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # a caller still holds a view, the map is released once that view is gone
+            self._mmap = None
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def has_member(self, name):
+        """Returns True if the archive contains a member with exactly this name."""
+        try:
+            self._zip.getinfo(name)
+            return True
+        except KeyError:
+            return False
+
+    def is_stored(self, name):
+        """Returns True if the member is stored uncompressed (and can be memory-mapped)."""
+        info = self._zip.getinfo(name)
+        return info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1
+
+    def compressed_size(self, name):
+        """Returns the size of a member inside the archive (the bytes actually read from disk)."""
+        return self._zip.getinfo(name).compress_size
+
+    def member_size(self, name):
+        """Returns the uncompressed size of a member."""
+        return self._zip.getinfo(name).file_size
+
+    def read_member(self, name):
+        """
+        Returns the content of a member. Stored members are returned as a memoryview into
+        the memory-mapped archive (no copy), compressed members as bytes.
+
+        Raises:
+            KeyError: If the member does not exist.
+        """
+        info = self._zip.getinfo(name)
+        if self._mmap is not None and self.is_stored(name):
+            header = ZIP_LOCAL_HEADER.unpack_from(self._mmap, info.header_offset)
+            if header[0] == ZIP_LOCAL_HEADER_SIGNATURE:
+                name_length, extra_length = header[9], header[10]
+                start = info.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length
+                return memoryview(self._mmap)[start:start + info.file_size]
+        return self._zip.read(name)
+
+    def open_pcm_stream(self, name):
+        """
+        Opens a WAV member for sequential reading. Members are read (and inflated) block
+        by block through small buffers, not through the memory map, so memory use
+        doesn't depend on the size of the member.
+
+        Raises:
+            KeyError: If the member does not exist.
+            UnsupportedWavError: If the member is not integer PCM WAV.
+        """
+        stream = self._zip.open(name)
+        try:
+            wav_format, data_size = read_wav_header(stream)
+        except Exception:
+            stream.close()
+            raise
+        return PcmStream(stream, wav_format, data_size)
+
+    def load_segment(self, name):
+        """
+        Decodes a WAV member into an AudioSegment. WAV flavours that can't be decoded
+        natively are handed to pydub (and ffmpeg) from memory.
+
+        Raises:
+            KeyError: If the member does not exist.
+        """
+        return decode_wav(self.read_member(name))